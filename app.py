@@ -2,26 +2,44 @@ from quart import Quart, render_template, request, jsonify
 import os
 import json
 import workflow_manager as wm  # Import the workflow manager
+from request_coalescer import RequestCoalescer
+from session_store import DEFAULT_SESSION_ID, SessionStore, new_puzzle_state
 
 app = Quart(__name__)
 
-# Global variables to store puzzle state
-puzzle_state = {
-    "remaining_words": [],
-    "correct_groups": {
-        "yellow": [],
-        "green": [],
-        "blue": [],
-        "purple": []
-    },
-    "invalid_groups": [],
-    "active_recommender": "default",
-    "status": "Ready"
-}
+# Puzzle state of each session, as copy-on-write snapshots with per-session locks.
+# With several worker processes, set SHARED_STATE_DIR (e.g. /dev/shm/connection-solver)
+# so that every worker serves every session from the same shared store
+SHARED_STATE_DIR = os.environ.get("SHARED_STATE_DIR", "")
+if SHARED_STATE_DIR:
+    from shared_state import SharedSessionStore
+    
+    sessions = SharedSessionStore(SHARED_STATE_DIR)
+else:
+    sessions = SessionStore()
+
+# Concurrent /recommend calls on the same session and state version share one
+# workflow run, whose result is served again until the state changes
+recommendations = RequestCoalescer("recommendation")
+
+@app.before_serving
+async def preload_models():
+    """Import the LLM stack at start-up instead of on the first request (PRELOAD_MODELS=1)"""
+    if os.environ.get("PRELOAD_MODELS") == "1":
+        wm.preload()
+
+def _session_id(data) -> str:
+    """Return the session id sent with a request, or the default session"""
+    return (data or {}).get("session_id") or DEFAULT_SESSION_ID
+
+def _parse_puzzle_words(content: str) -> list:
+    """Parse comma-separated words and convert to lowercase (WEB01a)"""
+    return [word.strip().lower() for word in content.split(",")]
 
 @app.route("/")
 async def index():
     """Render the main page"""
+    puzzle_state = sessions.snapshot(_session_id(request.args))
     return await render_template("index.html", puzzle_state=puzzle_state)
 
 @app.route("/setup", methods=["POST"])
@@ -29,54 +47,169 @@ async def setup_puzzle():
     """Setup the puzzle with words from a text file (WEB01, WEB01a)"""
     form = await request.form
     file_path = form.get("puzzle_file", "")
+    session = sessions.get(_session_id(form))
     
     if not os.path.exists(file_path):
         return jsonify({"error": "File not found"}), 404
     
     try:
         with open(file_path, "r") as file:
-            content = file.read()
-            # Parse comma-separated words and convert to lowercase (WEB01a)
-            words = [word.strip().lower() for word in content.split(",")]
-            puzzle_state["remaining_words"] = words
-            puzzle_state["status"] = "Puzzle loaded"
+            words = _parse_puzzle_words(file.read())
+            puzzle_state = new_puzzle_state(session.session_id, words)
+            puzzle_state.status = "Puzzle loaded"
             
             # Initialize the workflow with the loaded puzzle (US001)
             workflow_state = wm.initialize_state_from_puzzle_state(puzzle_state)
             workflow_state["tool_to_use"] = "setup_puzzle"
             
-            # Run the setup_puzzle function directly
+            # Run the setup_puzzle function directly, outside the session lock
             result_state = await wm.setup_puzzle(workflow_state)
             
-            # Update the puzzle state with the result
+            # Update the puzzle state with the result and publish it
             wm.update_puzzle_state_from_workflow(puzzle_state, result_state)
+            await session.replace(puzzle_state)
             
             return jsonify({
-                "remaining_words": puzzle_state["remaining_words"],
-                "status": puzzle_state["status"]
+                "remaining_words": puzzle_state.remaining_words,
+                "status": puzzle_state.status
+            })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/setup_batch", methods=["POST"])
+async def setup_puzzle_batch():
+    """Setup many puzzles at once, embedding their words in batched requests
+    
+    The JSON body may contain "puzzle_files", a list of puzzle file paths, and
+    "puzzles", a list of word lists or of {"session_id": ..., "words": [...]}
+    objects. Each puzzle is loaded into its own session: the given session_id,
+    the file name without extension, or "batch-<n>". Session ids must be unique
+    within a request, and a derived id never replaces a session that already has
+    a puzzle; only an explicit session_id does.
+    """
+    data = await request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Expected a JSON object"}), 400
+    
+    try:
+        puzzles = _parse_batch(data)
+        
+        session_ids = [session_id for session_id, _, _ in puzzles]
+        duplicates = sorted({
+            session_id for session_id in session_ids if session_ids.count(session_id) > 1
+        })
+        if duplicates:
+            return jsonify({"error": f"Duplicate session ids: {', '.join(duplicates)}"}), 400
+        taken = [
+            session_id for session_id, _, explicit in puzzles
+            if not explicit and sessions.exists(session_id)
+        ]
+        if taken:
+            return jsonify({
+                "error": f"Sessions already exist: {', '.join(taken)}; "
+                "pass a session_id to replace them"
+            }), 409
+        
+        workflow_states = []
+        for session_id, words, _ in puzzles:
+            puzzle_state = new_puzzle_state(session_id, words)
+            workflow_state = wm.initialize_state_from_puzzle_state(puzzle_state)
+            workflow_state["tool_to_use"] = "setup_puzzle"
+            workflow_states.append((puzzle_state, workflow_state))
+        
+        stats = await wm.setup_puzzles_batch([state for _, state in workflow_states])
+        
+        # Fan the results out to each puzzle's session
+        results = []
+        for puzzle_state, workflow_state in workflow_states:
+            wm.update_puzzle_state_from_workflow(puzzle_state, workflow_state)
+            await sessions.get(puzzle_state.session_id).replace(puzzle_state)
+            results.append({
+                "session_id": puzzle_state.session_id,
+                "remaining_words": puzzle_state.remaining_words,
+                "status": puzzle_state.status
             })
+        
+        return jsonify({"sessions": results, "stats": stats})
+    except FileNotFoundError as e:
+        return jsonify({"error": f"File not found: {e.filename}"}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def _parse_batch(data: dict) -> list:
+    """Return (session id, words, explicit id) for each puzzle of a /setup_batch body"""
+    puzzle_files = data.get("puzzle_files", [])
+    puzzle_list = data.get("puzzles", [])
+    if not isinstance(puzzle_files, list) or not isinstance(puzzle_list, list):
+        raise ValueError('"puzzle_files" and "puzzles" must be lists')
+    puzzles = []
+    
+    for file_path in puzzle_files:
+        if not isinstance(file_path, str):
+            raise ValueError("Puzzle file paths must be strings")
+        with open(file_path, "r") as file:
+            session_id = os.path.splitext(os.path.basename(file_path))[0]
+            puzzles.append((session_id, _parse_puzzle_words(file.read()), False))
+    
+    for puzzle in puzzle_list:
+        session_id = puzzle.get("session_id") if isinstance(puzzle, dict) else None
+        words = puzzle.get("words", []) if isinstance(puzzle, dict) else puzzle
+        if not isinstance(words, list) or not all(isinstance(word, str) for word in words):
+            raise ValueError("Puzzle words must be lists of strings")
+        if session_id is not None and not isinstance(session_id, str):
+            raise ValueError("Session ids must be strings")
+        puzzles.append((
+            session_id or f"batch-{len(puzzles)}",
+            [word.strip().lower() for word in words],
+            bool(session_id)
+        ))
+    return puzzles
+
+async def _recommend(session, version: int) -> dict:
+    """Run the workflow on a session's state and record the recommender used"""
+    # Get recommendation using the workflow manager (US003, US005)
+    # from the current snapshot, without waiting on in-flight feedback
+    recommendation = await wm.get_recommendation_from_workflow(session.snapshot)
+    
+    # Update the active recommender in the puzzle state. If nothing else changed
+    # the state meanwhile, the recommendation stays valid at the new version
+    async with session.update() as puzzle_state:
+        own_update = session.version == version
+        puzzle_state.active_recommender = recommendation.get("source", "unknown")
+    if own_update:
+        recommendations.advance(session.session_id, version, session.version)
+    return recommendation
+
 @app.route("/recommend", methods=["GET"])
 async def get_recommendation():
-    """Get the next recommendation (WEB03)"""
+    """Get the next recommendation (WEB03)
+    
+    Calls made while the same puzzle state is being solved wait for that run, and
+    later calls get its result until feedback or an override changes the state.
+    """
+    session = sessions.get(_session_id(request.args))
     try:
-        # Get recommendation using the workflow manager (US003, US005)
-        recommendation = await wm.get_recommendation_from_workflow(puzzle_state)
+        # Read the version before the snapshot, so a result is never filed under a
+        # newer version than the state it was computed from
+        version = session.version
+        recommendation = await recommendations.run(
+            session.session_id, version, lambda: _recommend(session, version)
+        )
         
         # Extract the recommendation details
         recommended_group = recommendation.get("group", [])
         connection_reason = recommendation.get("reason", "")
         source = recommendation.get("source", "unknown")
-        
-        # Update the active recommender in the puzzle state
-        puzzle_state["active_recommender"] = source
+        if not recommended_group:
+            # Let the next call try again instead of repeating an empty answer
+            recommendations.invalidate(session.session_id)
         
         return jsonify({
             "recommended_group": recommended_group,
             "connection_reason": connection_reason,
-            "recommender": puzzle_state["active_recommender"]
+            "recommender": source
         })
     except Exception as e:
         return jsonify({
@@ -92,66 +225,33 @@ async def process_feedback():
     color = data.get("color", "")
     response = data.get("response", "")
     group = data.get("group", [])
+    session = sessions.get(_session_id(data))
     
-    # Initialize workflow state from current puzzle state
-    workflow_state = wm.initialize_state_from_puzzle_state(puzzle_state)
+    try:
+        async with session.update() as puzzle_state:
+            wm.apply_feedback(puzzle_state, group, color, response, data.get("reason", ""))
+            feedback_version = session.version + 1
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
-    if color in ["yellow", "green", "blue", "purple"]:
-        # Handle correct group
-        puzzle_state["correct_groups"][color].append({
-            "words": group,
-            "reason": data.get("reason", "")
-        })
-        # Remove words from remaining words
-        for word in group:
-            if word in puzzle_state["remaining_words"]:
-                puzzle_state["remaining_words"].remove(word)
-                
-        # Update workflow state
-        workflow_state = wm.initialize_state_from_puzzle_state(puzzle_state)
-        workflow_state["puzzle_status"] = "continue"
-        
-    elif response == "one-away":
-        # Handle one-away error
-        puzzle_state["invalid_groups"].append({
-            "words": group,
-            "reason": data.get("reason", ""),
-            "error_type": "one-away"
-        })
-        
-        # Trigger one-away analysis in workflow
-        one_away_result = await wm.analyze_one_away(puzzle_state)
+    if response == "one-away":
+        # Trigger one-away analysis in workflow on the published snapshot, so the
+        # LLM call holds neither readers nor other writers of this session
+        one_away_result = await wm.analyze_one_away(session.snapshot)
         
-        # If we got a recommendation, update the puzzle state
+        # If we got a recommendation and no other feedback arrived meanwhile,
+        # update the puzzle state
         if one_away_result.get("group"):
-            puzzle_state["active_recommender"] = "one_away_analyzer"
-        
-    elif response == "not-correct":
-        # Handle invalid group
-        puzzle_state["invalid_groups"].append({
-            "words": group,
-            "reason": data.get("reason", ""),
-            "error_type": "not-correct"
-        })
-        
-        # Update workflow state
-        workflow_state = wm.initialize_state_from_puzzle_state(puzzle_state)
-        workflow_state["mistake_count"] = workflow_state.get("mistake_count", 0) + 1
-        
-        # Check if we've reached the error limit
-        if workflow_state["mistake_count"] >= wm.MAX_ERRORS:
-            workflow_state["puzzle_status"] = "max_errors"
-    
-    # Apply the workflow state to update the puzzle state
-    wm.update_puzzle_state_from_workflow(puzzle_state, workflow_state)
-    
-    puzzle_state["status"] = f"Feedback processed: {response if response else color}"
+            async with session.update() as puzzle_state:
+                if session.version == feedback_version:
+                    puzzle_state.active_recommender = "one_away_analyzer"
     
+    puzzle_state = session.snapshot
     return jsonify({
-        "remaining_words": puzzle_state["remaining_words"],
-        "correct_groups": puzzle_state["correct_groups"],
-        "invalid_groups": puzzle_state["invalid_groups"],
-        "status": puzzle_state["status"]
+        "remaining_words": puzzle_state.remaining_words,
+        "correct_groups": puzzle_state.correct_groups,
+        "invalid_groups": puzzle_state.invalid_groups,
+        "status": puzzle_state.status
     })
 
 @app.route("/override", methods=["POST"])
@@ -160,18 +260,20 @@ async def manual_override():
     data = await request.get_json()
     group = data.get("group", [])
     reason = data.get("reason", "")
+    session = sessions.get(_session_id(data))
     
-    # Update the workflow state with the manual recommendation
-    workflow_state = wm.initialize_state_from_puzzle_state(puzzle_state)
-    workflow_state["recommendations"] = {
-        "group": group,
-        "reason": reason,
-        "source": "manual"
-    }
-    workflow_state["active_recommender"] = "manual"
-    
-    # Apply the workflow state
-    wm.update_puzzle_state_from_workflow(puzzle_state, workflow_state)
+    async with session.update() as puzzle_state:
+        # Update the workflow state with the manual recommendation
+        workflow_state = wm.initialize_state_from_puzzle_state(puzzle_state)
+        workflow_state["recommendations"] = {
+            "group": group,
+            "reason": reason,
+            "source": "manual"
+        }
+        workflow_state["active_recommender"] = "manual"
+        
+        # Apply the workflow state
+        wm.update_puzzle_state_from_workflow(puzzle_state, workflow_state)
     
     return jsonify({
         "recommended_group": group,
@@ -182,13 +284,17 @@ async def manual_override():
 @app.route("/terminate", methods=["POST"])
 async def terminate():
     """Terminate the puzzle-solving process (WEB08)"""
-    # Update the workflow state to end
-    workflow_state = wm.initialize_state_from_puzzle_state(puzzle_state)
-    workflow_state["puzzle_status"] = "terminated"
-    workflow_state["tool_to_use"] = "END"
+    data = await request.get_json(silent=True)
+    session = sessions.get(_session_id(data))
     
-    # Apply the workflow state
-    wm.update_puzzle_state_from_workflow(puzzle_state, workflow_state)
+    async with session.update() as puzzle_state:
+        # Update the workflow state to end
+        workflow_state = wm.initialize_state_from_puzzle_state(puzzle_state)
+        workflow_state["puzzle_status"] = "terminated"
+        workflow_state["tool_to_use"] = "END"
+        
+        # Apply the workflow state
+        wm.update_puzzle_state_from_workflow(puzzle_state, workflow_state)
     
     return jsonify({
         "status": "Terminated",
@@ -0,0 +1,169 @@
+"""
+Embedding Quantization Benchmark for Connection Puzzle Solver
+
+This script measures the accuracy cost and memory savings of compact embedding
+storage. The words of puzzles with answer keys (the format of evaluate_solver.py)
+are embedded once with EMBEDDING_MODEL. Every combination of storage type and
+truncated dimension count is then compared with full float32 vectors on:
+
+- bytes per word, next to the size of the same vector as a list of Python floats;
+- mean and largest error of the cosine similarity matrix;
+- how often the top candidate group is the same as with float32 vectors;
+- how often the top candidate group is an answer group, and how many answer groups
+  are among the first CANDIDATES candidates.
+
+Vectors can be cached in a JSON file so that later runs make no API call.
+
+Usage:
+    python benchmark_quantization.py answers/*.json [--cache embeddings.json]
+        [--storage float32,float16,int8] [--dimensions 0,1024,512,256] [--output report.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+import workflow_manager as wm
+from candidate_index import CandidateIndex
+from embedding_codec import QuantizedEmbeddings
+from evaluate_solver import load_answer_key
+
+# Candidate groups searched for answer groups
+CANDIDATES = 10
+
+
+def python_list_bytes(vector: Sequence[float]) -> int:
+    """Memory held by a vector stored as a list of Python floats."""
+    values = [float(value) for value in vector]
+    return sys.getsizeof(values) + sum(sys.getsizeof(value) for value in values)
+
+
+async def load_embeddings(words: List[str], cache_path: str = "") -> Dict[str, List[float]]:
+    """Return the vectors of the given words, fetching the ones missing from the cache."""
+    cached: Dict[str, List[float]] = {}
+    if cache_path and os.path.exists(cache_path):
+        with open(cache_path, "r") as file:
+            cached = json.load(file)
+
+    missing = [word for word in words if word not in cached]
+    if missing:
+        vectors = await wm._embeddings_model().aembed_documents(missing)
+        cached.update(zip(missing, vectors))
+        if cache_path:
+            with open(cache_path, "w") as file:
+                json.dump(cached, file)
+    return {word: cached[word] for word in words}
+
+
+def top_groups(words: List[str], embeddings: QuantizedEmbeddings) -> List[frozenset]:
+    """The first CANDIDATES candidate groups of a puzzle, as word sets."""
+    index = CandidateIndex.from_embeddings(words, embeddings)
+    return [frozenset(group["words"]) for group in index.ranked_groups(limit=CANDIDATES)]
+
+
+def benchmark_config(
+    puzzles: List[Dict[str, Any]], vectors: Dict[str, List[float]], storage: str, dimensions: int
+) -> Dict[str, Any]:
+    """Compare one storage configuration with full float32 vectors on every puzzle."""
+    errors: List[float] = []
+    max_error = 0.0
+    same_top = top_correct = answer_hits = 0
+    total_bytes = total_words = kept_dimensions = 0
+
+    for puzzle in puzzles:
+        words = [word for group in puzzle["groups"] for word in group["words"]]
+        answers = {frozenset(group["words"]) for group in puzzle["groups"]}
+        puzzle_vectors = {word: vectors[word] for word in words}
+
+        baseline = QuantizedEmbeddings.encode(puzzle_vectors, "float32")
+        compact = QuantizedEmbeddings.encode(puzzle_vectors, storage, dimensions)
+        total_bytes += compact.nbytes
+        total_words += len(compact)
+        kept_dimensions = compact.dimensions
+
+        difference = np.abs(compact.similarity(words) - baseline.similarity(words))
+        off_diagonal = difference[~np.eye(len(words), dtype=bool)]
+        errors.append(float(off_diagonal.mean()))
+        max_error = max(max_error, float(off_diagonal.max()))
+
+        expected, groups = top_groups(words, baseline), top_groups(words, compact)
+        same_top += bool(groups) and bool(expected) and groups[0] == expected[0]
+        top_correct += bool(groups) and groups[0] in answers
+        answer_hits += len(answers & set(groups))
+
+    return {
+        "storage": storage,
+        "dimensions": kept_dimensions,
+        "bytes_per_word": total_bytes / max(total_words, 1),
+        "mean_similarity_error": float(np.mean(errors)) if errors else 0.0,
+        "max_similarity_error": max_error,
+        "same_top_group": same_top / max(len(puzzles), 1),
+        "top_group_correct": top_correct / max(len(puzzles), 1),
+        "answer_groups_in_candidates": answer_hits / max(len(puzzles), 1),
+    }
+
+
+def format_report(results: List[Dict[str, Any]], list_bytes: float) -> str:
+    """Format the configurations as a table, smallest storage last."""
+    lines = [
+        f"Python list of floats: {list_bytes:,.0f} bytes per word",
+        "",
+        f"{'storage':<8} {'dims':>5} {'bytes/word':>11} {'saving':>7} "
+        f"{'mean err':>9} {'max err':>8} {'same top':>9} {'top ok':>7} {'answers':>8}",
+    ]
+    for result in sorted(results, key=lambda result: -result["bytes_per_word"]):
+        lines.append(
+            f"{result['storage']:<8} {result['dimensions']:>5} "
+            f"{result['bytes_per_word']:>11,.0f} {list_bytes / result['bytes_per_word']:>6.0f}x "
+            f"{result['mean_similarity_error']:>9.5f} {result['max_similarity_error']:>8.4f} "
+            f"{result['same_top_group']:>9.0%} "
+            f"{result['top_group_correct']:>7.0%} {result['answer_groups_in_candidates']:>8.2f}"
+        )
+    return "\n".join(lines)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare compact embedding storage with float32 vectors"
+    )
+    parser.add_argument("answer_keys", nargs="+", help="answer key JSON files")
+    parser.add_argument("--cache", default="", help="JSON file caching the fetched vectors")
+    parser.add_argument(
+        "--storage", default="float32,float16,int8", help="storage types to compare"
+    )
+    parser.add_argument(
+        "--dimensions", default="0,1024,512,256", help="dimension counts (0 keeps all)"
+    )
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    puzzles = [load_answer_key(path) for path in args.answer_keys]
+    words = list(
+        dict.fromkeys(
+            word for puzzle in puzzles for group in puzzle["groups"] for word in group["words"]
+        )
+    )
+    vectors = await load_embeddings(words, args.cache)
+    list_bytes = float(np.mean([python_list_bytes(vector) for vector in vectors.values()]))
+
+    results = [
+        benchmark_config(puzzles, vectors, storage, int(dimensions))
+        for storage in args.storage.split(",")
+        for dimensions in args.dimensions.split(",")
+    ]
+
+    print(format_report(results, list_bytes))
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(
+                {"python_list_bytes_per_word": list_bytes, "results": results}, file, indent=2
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,208 @@
+"""
+Incremental Candidate Index for Connection Puzzle Solver
+
+This module keeps the word similarity matrix and the ranked candidate groups for a
+puzzle session, so feedback only updates the parts of the structure it affects
+instead of rebuilding everything on every recommendation.
+"""
+
+import heapq
+import logging
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from embedding_codec import QuantizedEmbeddings
+
+logger = logging.getLogger(__name__)
+
+# Number of neighbours added to an anchor word to form a candidate group
+GROUP_NEIGHBORS = 3
+
+
+def group_id_for(words: Iterable[str]) -> str:
+    """Return the unique identifier of a group (its sorted words joined by "_")."""
+    return "_".join(sorted(words))
+
+
+def cosine_similarity_matrix(vectors: np.ndarray) -> np.ndarray:
+    """
+    Compute the pairwise cosine similarity of the rows of a matrix.
+
+    Rows with zero norm get a similarity of zero with every other row.
+    """
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    normalized = vectors / norms
+    return normalized @ normalized.T
+
+
+class CandidateIndex:
+    """
+    Similarity matrix and ranked candidate heap for the words of one puzzle.
+
+    Each remaining word anchors one candidate group made of the word and its
+    GROUP_NEIGHBORS most similar remaining words. Removing solved words only
+    recomputes the anchors whose group contained them, and invalidating a group
+    only marks its id; stale heap entries are skipped lazily.
+    """
+
+    def __init__(self, words: List[str], similarity: np.ndarray):
+        self.words = list(words)
+        self.positions = {word: i for i, word in enumerate(self.words)}
+        self.similarity = np.array(similarity, dtype=np.float32)
+        np.fill_diagonal(self.similarity, -np.inf)
+        self.alive = np.ones(len(self.words), dtype=bool)
+        self.invalid_ids: Set[str] = set()
+
+        # anchor position -> (group id, metric, member positions)
+        self._anchor_groups: Dict[int, Tuple[str, float, Tuple[int, ...]]] = {}
+        # word position -> anchors whose group contains the word
+        self._anchors_using: Dict[int, Set[int]] = {i: set() for i in range(len(self.words))}
+        # heap of (-metric, group id, anchor, anchor version)
+        self._heap: List[Tuple[float, str, int, int]] = []
+        self._versions: Dict[int, int] = {}
+
+        for anchor in range(len(self.words)):
+            self._update_anchor(anchor)
+
+    @classmethod
+    def from_embeddings(
+        cls, words: List[str], embeddings: Mapping[str, Sequence[float]]
+    ) -> "CandidateIndex":
+        """
+        Build an index for the words that have an embedding.
+
+        Quantized embeddings are scored on their compact codes without decoding them.
+        """
+        indexed_words = [word for word in words if len(embeddings.get(word, ())) > 0]
+        if not indexed_words:
+            return cls([], np.zeros((0, 0), dtype=np.float32))
+        if isinstance(embeddings, QuantizedEmbeddings):
+            return cls(indexed_words, embeddings.similarity(indexed_words))
+        vectors = np.asarray([embeddings[word] for word in indexed_words], dtype=np.float32)
+        return cls(indexed_words, cosine_similarity_matrix(vectors))
+
+    def _update_anchor(self, anchor: int) -> None:
+        """Recompute the candidate group anchored on one word and push it on the heap."""
+        previous = self._anchor_groups.pop(anchor, None)
+        if previous is not None:
+            for member in previous[2]:
+                self._anchors_using[member].discard(anchor)
+        self._versions[anchor] = self._versions.get(anchor, 0) + 1
+
+        if not self.alive[anchor]:
+            return
+
+        row = self.similarity[anchor]
+        candidates = np.flatnonzero(self.alive & np.isfinite(row))
+        if len(candidates) == 0:
+            return
+        if len(candidates) > GROUP_NEIGHBORS:
+            top = np.argpartition(-row[candidates], GROUP_NEIGHBORS - 1)[:GROUP_NEIGHBORS]
+            candidates = candidates[top]
+        neighbors = candidates[np.argsort(-row[candidates], kind="stable")]
+
+        members = (anchor,) + tuple(int(i) for i in neighbors)
+        pairs = self.similarity[np.ix_(members, members)]
+        metric = float(pairs[np.triu_indices(len(members), k=1)].mean())
+        group_id = group_id_for(self.words[i] for i in members)
+
+        self._anchor_groups[anchor] = (group_id, metric, members)
+        for member in members:
+            self._anchors_using[member].add(anchor)
+        heapq.heappush(self._heap, (-metric, group_id, anchor, self._versions[anchor]))
+
+    def remove_words(self, words: Iterable[str]) -> None:
+        """
+        Delete solved words from the index.
+
+        Their rows and columns are dropped from the similarity matrix and only the
+        anchors whose group included one of them are recomputed.
+        """
+        removed = [
+            self.positions[word]
+            for word in words
+            if word in self.positions and self.alive[self.positions[word]]
+        ]
+        if not removed:
+            return
+
+        affected: Set[int] = set()
+        for position in removed:
+            self.alive[position] = False
+            self.similarity[position, :] = -np.inf
+            self.similarity[:, position] = -np.inf
+            affected |= self._anchors_using[position]
+            affected.add(position)
+
+        for anchor in affected:
+            self._update_anchor(anchor)
+
+        logger.info(f"Removed {len(removed)} words, recomputed {len(affected)} candidate groups")
+
+    def invalidate_groups(self, invalid_groups: List[Dict[str, Any]]) -> None:
+        """Mark groups as invalid; matching candidates are skipped when ranking."""
+        for invalid_group in invalid_groups:
+            self.invalid_ids.add(group_id_for(invalid_group.get("words", [])))
+
+    def sync(self, words: List[str], invalid_groups: List[Dict[str, Any]]) -> bool:
+        """
+        Bring the index up to date with the remaining words and invalid groups.
+
+        Returns False when the words contain entries the index has never seen or
+        has already removed (e.g. the same puzzle set up again), in which case the
+        caller should rebuild the index.
+        """
+        remaining = set(words)
+        if any(
+            word not in self.positions or not self.alive[self.positions[word]] for word in remaining
+        ):
+            return False
+
+        alive_words = {self.words[i] for i in np.flatnonzero(self.alive)}
+        self.remove_words(alive_words - remaining)
+        self.invalidate_groups(invalid_groups)
+        return True
+
+    def _compact_heap(self) -> None:
+        """Drop stale heap entries once they outnumber the live ones."""
+        if len(self._heap) <= 2 * max(len(self._anchor_groups), 1):
+            return
+        self._heap = [
+            (-metric, group_id, anchor, self._versions[anchor])
+            for anchor, (group_id, metric, _) in self._anchor_groups.items()
+        ]
+        heapq.heapify(self._heap)
+
+    def ranked_groups(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Return the valid candidate groups, best metric first and without duplicates."""
+        self._compact_heap()
+
+        groups: List[Dict[str, Any]] = []
+        seen: Set[str] = set()
+        for neg_metric, group_id, anchor, version in heapq.nsmallest(len(self._heap), self._heap):
+            if version != self._versions.get(anchor) or group_id in seen:
+                continue
+            seen.add(group_id)
+            if group_id in self.invalid_ids:
+                continue
+            members = self._anchor_groups[anchor][2]
+            groups.append(
+                {"words": [self.words[i] for i in members], "metric": -neg_metric, "id": group_id}
+            )
+            if limit is not None and len(groups) >= limit:
+                break
+        return groups
+
+    def score_groups(self, groups: List[List[str]]) -> List[Dict[str, Any]]:
+        """Rank arbitrary groups of indexed words by their mean pairwise similarity."""
+        scored: List[Dict[str, Any]] = []
+        for words in groups:
+            if any(word not in self.positions for word in words):
+                continue
+            members = [self.positions[word] for word in words]
+            pairs = self.similarity[np.ix_(members, members)]
+            metric = float(pairs[np.triu_indices(len(members), k=1)].mean())
+            scored.append({"words": list(words), "metric": metric, "id": group_id_for(words)})
+        return sorted(scored, key=lambda group: group["metric"], reverse=True)
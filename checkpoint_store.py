@@ -0,0 +1,569 @@
+"""
+SQLite Checkpoint Store for Connection Puzzle Solver
+
+This module implements a durable LangGraph checkpointer backed by a local SQLite
+database, so workflow runs survive a worker restart and can be resumed without
+re-embedding the puzzle or re-asking the LLM.
+
+Channel values are stored with the serializer's compact msgpack encoding, except
+word embeddings, which are written once per session as a single quantized matrix
+(see embedding_codec) and only referenced from the checkpoints. Writes are batched
+in memory and flushed on the next read, when the batch is full or at the end of a
+run; old checkpoints are trimmed to a per-thread retention limit when they are
+flushed. Idle threads, and embeddings no live thread refers to, are dropped in a
+background thread started by the first flush and then once a day.
+"""
+
+import asyncio
+import logging
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+from embedding_codec import QuantizedEmbeddings
+
+logger = logging.getLogger(__name__)
+
+# Channel whose values are stored in the embedding_matrices table instead of as blobs
+EMBEDDINGS_CHANNEL = "word_embeddings"
+EMBEDDINGS_REF_TYPE = "embeddings_ref"
+
+# Threads whose last saved embeddings are remembered, so unchanged ones are not rewritten
+SAVED_EMBEDDINGS_CACHE_SIZE = 256
+
+# Number of buffered statements that triggers a flush
+WRITE_BATCH_SIZE = 32
+
+# Checkpoints kept per thread and namespace, and idle time before a thread is dropped
+MAX_CHECKPOINTS_PER_THREAD = 20
+MAX_THREAD_AGE_SECONDS = 7 * 24 * 3600
+COMPACT_INTERVAL_SECONDS = 24 * 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    parent_id TEXT,
+    type TEXT NOT NULL,
+    checkpoint BLOB NOT NULL,
+    metadata_type TEXT NOT NULL,
+    metadata BLOB NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    type TEXT NOT NULL,
+    value BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT NOT NULL,
+    value BLOB,
+    task_path TEXT NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+CREATE TABLE IF NOT EXISTS embedding_matrices (
+    thread_id TEXT PRIMARY KEY,
+    matrix BLOB NOT NULL,
+    saved_at REAL NOT NULL DEFAULT 0
+);
+"""
+
+
+class SQLiteCheckpointSaver(BaseCheckpointSaver[str]):
+    """LangGraph checkpointer persisting checkpoints to a local SQLite database."""
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        batch_size: int = WRITE_BATCH_SIZE,
+        max_checkpoints: int = MAX_CHECKPOINTS_PER_THREAD,
+    ):
+        super().__init__()
+        self.path = path
+        self.batch_size = batch_size
+        self.max_checkpoints = max_checkpoints
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(embedding_matrices)")]
+        if "saved_at" not in columns:
+            self._conn.execute(
+                "ALTER TABLE embedding_matrices ADD COLUMN saved_at REAL NOT NULL DEFAULT 0"
+            )
+        self._lock = threading.RLock()
+        self._pending: List[Tuple[str, tuple]] = []
+        self._touched: set = set()
+        # thread id -> embeddings last queued for it
+        self._saved_embeddings: "OrderedDict[str, QuantizedEmbeddings]" = OrderedDict()
+        self._next_compact = time.monotonic()
+        self._compaction: Optional[threading.Thread] = None
+
+    # Batching
+
+    def _queue(self, sql: str, params: tuple) -> None:
+        with self._lock:
+            self._pending.append((sql, params))
+            if len(self._pending) >= self.batch_size:
+                self.flush()
+
+    def flush(self) -> None:
+        """Write all buffered statements in one transaction and apply retention."""
+        with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, []
+            touched, self._touched = self._touched, set()
+            with self._conn:
+                for sql, params in pending:
+                    self._conn.execute(sql, params)
+                for thread_id, checkpoint_ns in touched:
+                    self._trim(thread_id, checkpoint_ns)
+            if time.monotonic() >= self._next_compact:
+                # Compaction ends with a VACUUM, so it never runs on the caller's thread,
+                # which is usually the event loop
+                self._next_compact = time.monotonic() + COMPACT_INTERVAL_SECONDS
+                self._compaction = threading.Thread(
+                    target=self.compact, name="checkpoint-compaction", daemon=True
+                )
+                self._compaction.start()
+
+    def close(self) -> None:
+        self.flush()
+        if self._compaction is not None:
+            self._compaction.join()
+        self._conn.close()
+
+    # Embeddings
+
+    def save_embeddings(self, thread_id: str, embeddings: Mapping) -> None:
+        """
+        Store a session's word embeddings as one quantized matrix, replacing earlier ones.
+
+        Every node writes the whole state, so the same embeddings arrive once per
+        step; they are only queued when they differ from the ones last saved.
+        """
+        if not isinstance(embeddings, QuantizedEmbeddings):
+            embeddings = QuantizedEmbeddings.encode(embeddings, "float32")
+        with self._lock:
+            saved = self._saved_embeddings.get(thread_id)
+            if saved is not None and (saved is embeddings or saved == embeddings):
+                self._saved_embeddings.move_to_end(thread_id)
+                return
+            self._saved_embeddings[thread_id] = embeddings
+            self._saved_embeddings.move_to_end(thread_id)
+            if len(self._saved_embeddings) > SAVED_EMBEDDINGS_CACHE_SIZE:
+                self._saved_embeddings.popitem(last=False)
+        self._queue(
+            "INSERT OR REPLACE INTO embedding_matrices (thread_id, matrix, saved_at) "
+            "VALUES (?, ?, ?)",
+            (thread_id, embeddings.to_bytes(), time.time()),
+        )
+
+    def load_embeddings(
+        self, thread_id: str, words: Optional[Sequence[str]] = None
+    ) -> QuantizedEmbeddings:
+        """Return a session's stored word embeddings, optionally limited to some words."""
+        with self._lock:
+            self.flush()
+            row = self._conn.execute(
+                "SELECT matrix FROM embedding_matrices WHERE thread_id = ?", (thread_id,)
+            ).fetchone()
+        if row is None:
+            return QuantizedEmbeddings.encode({}, "float32")
+        embeddings = QuantizedEmbeddings.from_bytes(row[0])
+        return embeddings if words is None else embeddings.subset(words)
+
+    def _dump_channel(self, thread_id: str, channel: str, value: Any) -> Tuple[str, bytes]:
+        if channel == EMBEDDINGS_CHANNEL and isinstance(value, Mapping):
+            if value:
+                self.save_embeddings(thread_id, value)
+            return EMBEDDINGS_REF_TYPE, self.serde.dumps_typed(list(value))[1]
+        return self.serde.dumps_typed(value)
+
+    def _load_channel(self, thread_id: str, type_: str, value: bytes) -> Any:
+        if type_ == EMBEDDINGS_REF_TYPE:
+            words = self.serde.loads_typed(("msgpack", value))
+            return self.load_embeddings(thread_id, words)
+        return self.serde.loads_typed((type_, value))
+
+    # Reads
+
+    def _load_blobs(
+        self, thread_id: str, checkpoint_ns: str, versions: ChannelVersions
+    ) -> Dict[str, Any]:
+        values: Dict[str, Any] = {}
+        for channel, version in versions.items():
+            row = self._conn.execute(
+                "SELECT type, value FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? "
+                "AND channel = ? AND version = ?",
+                (thread_id, checkpoint_ns, channel, str(version)),
+            ).fetchone()
+            if row is None or row[0] == "empty":
+                continue
+            values[channel] = self._load_channel(thread_id, row[0], row[1])
+        return values
+
+    def _row_to_tuple(self, row: tuple) -> CheckpointTuple:
+        (
+            thread_id,
+            checkpoint_ns,
+            checkpoint_id,
+            parent_id,
+            type_,
+            checkpoint_b,
+            metadata_type,
+            metadata_b,
+        ) = row
+        checkpoint = self.serde.loads_typed((type_, checkpoint_b))
+        writes = self._conn.execute(
+            "SELECT task_id, channel, type, value FROM writes WHERE thread_id = ? "
+            "AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_path, task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint={
+                **checkpoint,
+                "channel_values": self._load_blobs(
+                    thread_id, checkpoint_ns, checkpoint["channel_versions"]
+                ),
+            },
+            metadata=self.serde.loads_typed((metadata_type, metadata_b)),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_id,
+                    }
+                }
+                if parent_id
+                else None
+            ),
+            pending_writes=[
+                (task_id, channel, self._load_channel(thread_id, type_, value))
+                for task_id, channel, type_, value in writes
+            ],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        with self._lock:
+            self.flush()
+            query = (
+                "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_id, type, checkpoint, "
+                "metadata_type, metadata FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?"
+            )
+            params: tuple = (thread_id, checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                query += " AND checkpoint_id = ?"
+                params += (checkpoint_id,)
+            else:
+                query += " ORDER BY checkpoint_id DESC LIMIT 1"
+            row = self._conn.execute(query, params).fetchone()
+            return self._row_to_tuple(row) if row else None
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_id, type, checkpoint, "
+            "metadata_type, metadata FROM checkpoints WHERE 1 = 1"
+        )
+        params: tuple = ()
+        if config:
+            query += " AND thread_id = ?"
+            params += (config["configurable"]["thread_id"],)
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                query += " AND checkpoint_ns = ?"
+                params += (checkpoint_ns,)
+            if checkpoint_id := get_checkpoint_id(config):
+                query += " AND checkpoint_id = ?"
+                params += (checkpoint_id,)
+        if before and (before_id := get_checkpoint_id(before)):
+            query += " AND checkpoint_id < ?"
+            params += (before_id,)
+        query += " ORDER BY checkpoint_id DESC"
+
+        with self._lock:
+            self.flush()
+            rows = self._conn.execute(query, params).fetchall()
+            results = []
+            for row in rows:
+                if limit is not None and len(results) >= limit:
+                    break
+                item = self._row_to_tuple(row)
+                if filter and not all(item.metadata.get(k) == v for k, v in filter.items()):
+                    continue
+                results.append(item)
+        yield from results
+
+    # Writes
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        stored = checkpoint.copy()
+        values = stored.pop("channel_values")
+
+        for channel, version in new_versions.items():
+            type_, value = (
+                self._dump_channel(thread_id, channel, values[channel])
+                if channel in values
+                else ("empty", b"")
+            )
+            self._queue(
+                "INSERT OR REPLACE INTO blobs (thread_id, checkpoint_ns, channel, version, "
+                "type, value) VALUES (?, ?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, channel, str(version), type_, value),
+            )
+
+        type_, checkpoint_b = self.serde.dumps_typed(stored)
+        metadata_type, metadata_b = self.serde.dumps_typed(
+            get_checkpoint_metadata(config, metadata)
+        )
+        with self._lock:
+            self._touched.add((thread_id, checkpoint_ns))
+        self._queue(
+            "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, "
+            "parent_id, type, checkpoint, metadata_type, metadata, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                thread_id,
+                checkpoint_ns,
+                checkpoint["id"],
+                config["configurable"].get("checkpoint_id"),
+                type_,
+                checkpoint_b,
+                metadata_type,
+                metadata_b,
+                time.time(),
+            ),
+        )
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        for idx, (channel, value) in enumerate(writes):
+            write_idx = WRITES_IDX_MAP.get(channel, idx)
+            type_, value_b = self._dump_channel(thread_id, channel, value)
+            # Regular writes are idempotent; special writes (errors, interrupts) overwrite
+            verb = "INSERT OR IGNORE" if write_idx >= 0 else "INSERT OR REPLACE"
+            self._queue(
+                f"{verb} INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, "
+                "channel, type, value, task_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    thread_id,
+                    checkpoint_ns,
+                    checkpoint_id,
+                    task_id,
+                    write_idx,
+                    channel,
+                    type_,
+                    value_b,
+                    task_path,
+                ),
+            )
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self.flush()
+            with self._conn:
+                for table in ("checkpoints", "blobs", "writes", "embedding_matrices"):
+                    self._conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+            self._saved_embeddings.pop(thread_id, None)
+
+    # Retention
+
+    def _trim(self, thread_id: str, checkpoint_ns: str) -> None:
+        """Drop checkpoints beyond the retention limit, with their writes and unused blobs."""
+        stale = self._conn.execute(
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?",
+            (thread_id, checkpoint_ns, self.max_checkpoints),
+        ).fetchall()
+        if not stale:
+            return
+        for (checkpoint_id,) in stale:
+            for table in ("checkpoints", "writes"):
+                self._conn.execute(
+                    f"DELETE FROM {table} "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                )
+
+        # Keep only the blob versions still referenced by a retained checkpoint
+        referenced = set()
+        for type_, checkpoint_b in self._conn.execute(
+            "SELECT type, checkpoint FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?",
+            (thread_id, checkpoint_ns),
+        ):
+            versions = self.serde.loads_typed((type_, checkpoint_b))["channel_versions"]
+            referenced.update((channel, str(version)) for channel, version in versions.items())
+        for channel, version in self._conn.execute(
+            "SELECT channel, version FROM blobs WHERE thread_id = ? AND checkpoint_ns = ?",
+            (thread_id, checkpoint_ns),
+        ).fetchall():
+            if (channel, version) not in referenced:
+                self._conn.execute(
+                    "DELETE FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? "
+                    "AND version = ?",
+                    (thread_id, checkpoint_ns, channel, version),
+                )
+
+    def compact(self, max_age_seconds: float = MAX_THREAD_AGE_SECONDS) -> None:
+        """
+        Delete threads idle for longer than max_age_seconds and reclaim their disk space.
+
+        Embeddings are also stored per session (e.g. "s") while the session's runs
+        use derived thread ids ("s:webui", "s:one_away"); a matrix older than the
+        cutoff is dropped once no thread with its id or with its id as prefix is
+        left. Runs in a background thread on the first flush and then every
+        COMPACT_INTERVAL_SECONDS.
+        """
+        with self._lock:
+            self.flush()
+            cutoff = time.time() - max_age_seconds
+            idle = self._conn.execute(
+                "SELECT thread_id FROM checkpoints GROUP BY thread_id HAVING MAX(created_at) < ?",
+                (cutoff,),
+            ).fetchall()
+            for (thread_id,) in idle:
+                self.delete_thread(thread_id)
+            with self._conn:
+                orphans = self._conn.execute(
+                    "DELETE FROM embedding_matrices AS e WHERE saved_at < ? AND NOT EXISTS ("
+                    "SELECT 1 FROM checkpoints AS c WHERE c.thread_id = e.thread_id "
+                    "OR substr(c.thread_id, 1, length(e.thread_id) + 1) = e.thread_id || ':')",
+                    (cutoff,),
+                ).rowcount
+            self._saved_embeddings.clear()
+        logger.info(
+            f"Compacted checkpoint store, dropped {len(idle)} idle threads "
+            f"and {orphans} unreferenced embedding matrices"
+        )
+        if idle or orphans:
+            self._vacuum()
+
+    def _vacuum(self) -> None:
+        """Reclaim disk space on a separate connection, so writers are not locked out."""
+        if self.path == ":memory:":
+            return
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("VACUUM")
+        except sqlite3.OperationalError as e:
+            logger.warning(f"Could not vacuum the checkpoint store: {e}")
+        finally:
+            conn.close()
+
+    # Async API
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        self.put_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
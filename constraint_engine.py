@@ -0,0 +1,183 @@
+"""
+Constraint Engine for Connection Puzzle Solver
+
+This module turns the feedback of a puzzle into set constraints over the remaining
+words and keeps only the groups of four that can still be part of the answer.
+Words are bits and groups are bitmasks:
+
+- a rejected guess is never a group;
+- a "not-correct" guess shares at most 2 words with any group;
+- a "one-away" guess shares exactly 3 words with one group, so no group shares
+  exactly 2 of its words. When only 3 of its words remain unsolved, those 3 must
+  be in the same group.
+
+Propagation then drops every group that cannot be completed into a full split: a
+group survives only if each word outside it still belongs to some surviving group
+disjoint from it. The loop repeats until nothing changes.
+"""
+
+import logging
+from itertools import combinations
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, Set, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def popcount(mask: int) -> int:
+    return bin(mask).count("1")
+
+
+class ConstraintEngine:
+    """Feasible groups of the remaining words of a puzzle, given its feedback."""
+
+    def __init__(
+        self,
+        remaining_words: Sequence[str],
+        solved_groups: List[List[str]],
+        invalid_groups: List[Dict[str, Any]],
+    ):
+        self.words = list(dict.fromkeys(remaining_words))
+        self.bits = {word: 1 << i for i, word in enumerate(self.words)}
+        self.full_mask = (1 << len(self.words)) - 1
+
+        self.rejected: Set[int] = set()
+        self.at_most_two: List[int] = []
+        self.exactly_three: List[int] = []
+        self.together: List[int] = []
+
+        solved = [set(group) for group in solved_groups]
+        for invalid_group in invalid_groups:
+            guess = invalid_group.get("words", [])
+            mask = self.mask(guess)
+            self.rejected.add(mask)
+            if invalid_group.get("error_type") == "one-away":
+                if any(len(set(guess) & group) == 3 for group in solved):
+                    continue
+                if popcount(mask) == 3:
+                    self.together.append(mask)
+                self.exactly_three.append(mask)
+            elif invalid_group.get("error_type") == "not-correct" and popcount(mask) >= 3:
+                self.at_most_two.append(mask)
+
+        self.groups = self._propagate(
+            [
+                mask
+                for mask in (self.mask(group) for group in combinations(self.words, 4))
+                if self._allowed(mask)
+            ]
+        )
+        self.feasible = set(self.groups)
+        self.contradictory = bool(self.words) and not self.groups
+        if self.contradictory:
+            logger.warning("Feedback constraints leave no feasible group")
+
+    def mask(self, words: Iterable[str]) -> int:
+        """Bitmask of the remaining words among the given words."""
+        mask = 0
+        for word in words:
+            mask |= self.bits.get(word, 0)
+        return mask
+
+    def unmask(self, mask: int) -> List[str]:
+        return [word for word, bit in self.bits.items() if mask & bit]
+
+    def _allowed(self, mask: int) -> bool:
+        """Check a group against the constraints that involve it alone."""
+        if mask in self.rejected:
+            return False
+        if any(popcount(mask & guess) > 2 for guess in self.at_most_two):
+            return False
+        # The group holding 3 words of a one-away guess leaves at most 1 for any other
+        if any(popcount(mask & guess) == 2 for guess in self.exactly_three):
+            return False
+        # Words that must share a group are either all in it or all outside it
+        return all(mask & required in (0, required) for required in self.together)
+
+    def _propagate(self, groups: List[int]) -> List[int]:
+        """Drop groups that cannot be completed into a split of all remaining words."""
+        if len(self.words) <= 4 or not groups:
+            return groups
+        if not self.rejected and len(self.words) % 4 == 0:
+            # Without feedback every group is part of some split
+            return groups
+        # float32 so the products run on BLAS; the counts stay exact at these sizes
+        masks = np.array(groups, dtype=np.int64)
+        positions = np.arange(len(self.words), dtype=np.int64)
+        members = ((masks[:, None] >> positions) & 1).astype(np.float32)
+        disjoint = ((members @ members.T) == 0).astype(np.float32)
+        alive = np.ones(len(groups), dtype=bool)
+        while True:
+            # coverage[g, w]: live groups disjoint from g that contain w
+            coverage = disjoint @ (members * alive[:, None])
+            supported = alive & np.all((coverage > 0) | (members > 0), axis=1)
+            if supported.sum() == alive.sum():
+                break
+            alive = supported
+        pruned = [group for group, keep in zip(groups, alive) if keep]
+        logger.info(f"Constraint propagation kept {len(pruned)} of {len(groups)} groups")
+        return pruned
+
+    def is_feasible(self, words: Iterable[str]) -> bool:
+        """Check whether a group of four remaining words can still be correct."""
+        words = list(words)
+        if len(words) != 4 or any(word not in self.bits for word in words):
+            return False
+        return self.mask(words) in self.feasible
+
+    def partitions(self) -> Iterator[Tuple[int, ...]]:
+        """Yield every split of the remaining words into feasible groups that fits the feedback."""
+
+        def extend(used: int) -> Iterator[Tuple[int, ...]]:
+            free = self.full_mask & ~used
+            if not free:
+                yield ()
+                return
+            lowest = free & -free
+            for group in self.groups:
+                if group & lowest and not group & used:
+                    for rest in extend(used | group):
+                        yield (group,) + rest
+
+        for partition in extend(0):
+            if all(
+                any(popcount(group & guess) == 3 for group in partition)
+                for guess in self.exactly_three
+            ):
+                yield partition
+
+    def groups_sharing(self, words: Iterable[str], count: int) -> List[List[str]]:
+        """Feasible groups sharing exactly count words with the given words."""
+        mask = self.mask(words)
+        return [self.unmask(group) for group in self.groups if popcount(group & mask) == count]
+
+    def must_share(self) -> List[Tuple[str, str]]:
+        """Pairs of words (a, b) such that every feasible group containing a also contains b."""
+        pairs = []
+        for a, b in combinations(self.words, 2):
+            bit_a, bit_b = self.bits[a], self.bits[b]
+            with_a = [group for group in self.groups if group & bit_a]
+            if with_a and all(group & bit_b for group in with_a):
+                pairs.append((a, b))
+        return pairs
+
+    def describe(self, max_groups: int = 0) -> str:
+        """
+        Describe the constraints as prompt text.
+
+        When at most max_groups groups remain feasible they are listed explicitly.
+        """
+        lines = []
+        for guess in self.at_most_two:
+            lines.append(f"- At most 2 of {', '.join(self.unmask(guess))} belong to the same group")
+        for guess in self.exactly_three:
+            if popcount(guess) == 3:
+                continue  # reported below as words that must share a group
+            lines.append(f"- Exactly 3 of {', '.join(self.unmask(guess))} belong to the same group")
+        for a, b in self.must_share():
+            lines.append(f"- {a} and {b} must be in the same group")
+        if self.groups and len(self.groups) <= max_groups:
+            lines.append("- The group must be one of:")
+            lines.extend(f"  - {', '.join(self.unmask(group))}" for group in self.groups)
+        return "\n".join(lines)
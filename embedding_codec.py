@@ -0,0 +1,171 @@
+"""
+Compact Embedding Storage for Connection Puzzle Solver
+
+This module keeps word embeddings as compact arrays instead of lists of Python
+floats. Vectors can first be truncated to their leading dimensions and scaled back
+to unit length, which text-embedding-3 models are trained to support (Matryoshka
+representation learning). They are then stored as float16, or as int8 codes with
+one float32 scale per vector.
+
+Similarity is computed on the codes directly. Every vector has unit length before
+quantization, so its scale cancels out of the cosine similarity and the matrix is
+never decoded.
+"""
+
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, Optional, Sequence
+
+import numpy as np
+
+STORAGE_DTYPES: Dict[str, Any] = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+
+# Largest int8 code; a vector's largest component maps to it
+INT8_LEVELS = 127
+
+
+class QuantizedEmbeddings(Mapping):
+    """
+    Word embeddings of one puzzle as a matrix of compact codes.
+
+    Behaves as a read-only mapping from word to float32 vector, decoded on access,
+    so code written for dicts of vectors keeps working. Scoring should use
+    similarity(), which works on the codes.
+    """
+
+    __slots__ = ("words", "positions", "codes", "scales")
+
+    def __init__(
+        self, words: Sequence[str], codes: np.ndarray, scales: Optional[np.ndarray] = None
+    ):
+        self.words = tuple(words)
+        self.positions = {word: i for i, word in enumerate(self.words)}
+        self.codes = codes
+        # float32 scale of each row for int8 codes, None for float codes
+        self.scales = scales
+
+    @classmethod
+    def encode(
+        cls, embeddings: Mapping, storage: str = "float16", dimensions: int = 0
+    ) -> "QuantizedEmbeddings":
+        """
+        Quantize a mapping of word vectors.
+
+        Vectors are truncated to their first dimensions values (0 keeps them whole)
+        and normalized before being stored with the given storage type. Words with
+        an empty vector are left out.
+        """
+        if storage not in STORAGE_DTYPES:
+            raise ValueError(f"Unknown embedding storage: {storage}")
+        words = [word for word, vector in embeddings.items() if vector is not None and len(vector)]
+        if not words:
+            return cls([], np.zeros((0, 0), dtype=STORAGE_DTYPES[storage]))
+        vectors = np.asarray([embeddings[word] for word in words], dtype=np.float32)
+        if dimensions:
+            vectors = vectors[:, :dimensions]
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        vectors = vectors / norms
+
+        if storage != "int8":
+            return cls(words, vectors.astype(STORAGE_DTYPES[storage]))
+        peaks = np.abs(vectors).max(axis=1)
+        scales = np.where(peaks > 0, peaks / INT8_LEVELS, 1.0).astype(np.float32)
+        codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+        return cls(words, codes, scales)
+
+    @property
+    def storage(self) -> str:
+        return self.codes.dtype.name
+
+    @property
+    def dimensions(self) -> int:
+        return self.codes.shape[1]
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the codes and scales."""
+        return self.codes.nbytes + (0 if self.scales is None else self.scales.nbytes)
+
+    def __getitem__(self, word: str) -> np.ndarray:
+        row = self.positions[word]
+        vector = self.codes[row].astype(np.float32)
+        if self.scales is not None:
+            vector *= self.scales[row]
+        return vector
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.words)
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def __contains__(self, word: object) -> bool:
+        return word in self.positions
+
+    def __repr__(self) -> str:
+        return f"QuantizedEmbeddings({len(self.words)} words, {self.storage} x {self.dimensions})"
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, QuantizedEmbeddings):
+            return NotImplemented
+        if self.words != other.words or self.codes.dtype != other.codes.dtype:
+            return False
+        if self.codes.shape != other.codes.shape or not bool((self.codes == other.codes).all()):
+            return False
+        if self.scales is None or other.scales is None:
+            return self.scales is other.scales
+        return bool((self.scales == other.scales).all())
+
+    def subset(self, words: Sequence[str]) -> "QuantizedEmbeddings":
+        """Return the embeddings of the given words that are stored, in their order."""
+        rows = [self.positions[word] for word in dict.fromkeys(words) if word in self.positions]
+        return QuantizedEmbeddings(
+            [self.words[row] for row in rows],
+            self.codes[rows],
+            None if self.scales is None else self.scales[rows],
+        )
+
+    def similarity(self, words: Optional[Sequence[str]] = None) -> np.ndarray:
+        """
+        Return the cosine similarity matrix of the given words (all words by default).
+
+        int8 codes are multiplied as int32 and float16 codes as float32; rows with a
+        zero norm get a similarity of zero with every other row.
+        """
+        codes = (
+            self.codes if words is None else self.codes[[self.positions[word] for word in words]]
+        )
+        if codes.dtype == np.int8:
+            wide = codes.astype(np.int32)
+        else:
+            wide = codes.astype(np.float32)
+        products = (wide @ wide.T).astype(np.float64)
+        norms = np.sqrt(np.diag(products))
+        norms[norms == 0] = 1.0
+        return (products / np.outer(norms, norms)).astype(np.float32)
+
+    def to_bytes(self, include_codes: bool = True) -> bytes:
+        """Serialize with msgpack; codes are left out when they are stored elsewhere."""
+        import ormsgpack
+
+        return ormsgpack.packb(
+            [
+                1,
+                list(self.words),
+                self.codes.dtype.str,
+                self.dimensions,
+                self.codes.tobytes() if include_codes else None,
+                None if self.scales is None else self.scales.tobytes(),
+            ]
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes, codes: Optional[np.ndarray] = None) -> "QuantizedEmbeddings":
+        """Rebuild embeddings serialized by to_bytes, with separately stored codes if given."""
+        import ormsgpack
+
+        _, words, dtype, dimensions, code_bytes, scale_bytes = ormsgpack.unpackb(data)
+        if codes is None:
+            codes = np.frombuffer(code_bytes, dtype=np.dtype(dtype)).reshape(len(words), dimensions)
+        scales = None if scale_bytes is None else np.frombuffer(scale_bytes, dtype=np.float32)
+        return cls(words, codes, scales)
@@ -0,0 +1,294 @@
+"""
+Embedding Sources for Connection Puzzle Solver
+
+This module provides the embedding sources that can be combined into an ensemble
+similarity score: cached OpenAI embedding models, local word vector files and
+cheap lexical feature vectors (character n-grams, prefixes/suffixes and anagram
+signatures) that catch wordplay a semantic embedding misses.
+
+Run as a script, it fits ensemble weights on puzzles with answer keys (the format
+of evaluate_solver.py) and prints them as an EMBEDDING_ENSEMBLE value:
+
+    python embedding_sources.py answers/*.json [--sources openai:text-embedding-3-small,anagram]
+"""
+
+import argparse
+import asyncio
+import logging
+import zlib
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_openai.embeddings import OpenAIEmbeddings
+
+from workflow_trace import traced_model
+
+logger = logging.getLogger(__name__)
+
+# Dimensions of the hashed lexical feature vectors
+CHAR_NGRAM_DIM = 512
+AFFIX_DIM = 256
+ANAGRAM_DIM = 1024
+
+# Number of per-source similarity matrices kept in memory
+MATRIX_CACHE_SIZE = 64
+
+# Number of word vectors kept in memory per source, least recently used dropped first
+VECTOR_CACHE_SIZE = 50000
+
+# Word vectors fetched or computed so far, keyed by source name then word
+_vector_cache: Dict[str, "OrderedDict[str, np.ndarray]"] = {}
+
+DEFAULT_FIT_SOURCES = "openai:text-embedding-3-small,char_ngrams,affixes,anagram"
+
+
+def parse_ensemble_spec(spec: str) -> Dict[str, float]:
+    """
+    Parse an ensemble specification such as "openai:text-embedding-3-small=0.6,anagram=0.4".
+
+    Sources without an explicit weight get a weight of 1.0.
+    """
+    weights: Dict[str, float] = {}
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, weight = item.partition("=")
+        weights[name.strip()] = float(weight) if weight else 1.0
+    return weights
+
+
+def format_ensemble_spec(weights: Dict[str, float]) -> str:
+    """Format source weights as an ensemble specification (the inverse of parse_ensemble_spec)."""
+    return ",".join(f"{source}={weight:.3g}" for source, weight in weights.items())
+
+
+def _source_cache(source: str) -> "OrderedDict[str, np.ndarray]":
+    return _vector_cache.setdefault(source, OrderedDict())
+
+
+def _cache_vector(cache: "OrderedDict[str, np.ndarray]", word: str, vector: np.ndarray) -> None:
+    """Add a vector to a source's cache, dropping the least recently used beyond the limit."""
+    cache[word] = vector
+    cache.move_to_end(word)
+    while len(cache) > VECTOR_CACHE_SIZE:
+        cache.popitem(last=False)
+
+
+def _hashed_vector(features: Iterable[str], dim: int) -> np.ndarray:
+    """Project a bag of string features into a fixed-size count vector."""
+    vector = np.zeros(dim, dtype=np.float32)
+    for feature in features:
+        vector[zlib.crc32(feature.encode("utf-8")) % dim] += 1.0
+    return vector
+
+
+def char_ngram_vector(word: str) -> np.ndarray:
+    """Hashed bag of character 2- to 4-grams of the word, with boundary markers."""
+    marked = f"^{word}$"
+    ngrams = [
+        marked[start:end]
+        for n in (2, 3, 4)
+        for start, end in zip(range(len(marked)), range(n, len(marked) + 1))
+    ]
+    return _hashed_vector(ngrams, CHAR_NGRAM_DIM)
+
+
+def affix_vector(word: str) -> np.ndarray:
+    """Hashed one-hot vector of the word's 2- to 4-letter prefixes and suffixes."""
+    affixes = [f"p:{word[:n]}" for n in (2, 3, 4) if len(word) > n]
+    affixes += [f"s:{word[-n:]}" for n in (2, 3, 4) if len(word) > n]
+    return _hashed_vector(affixes, AFFIX_DIM)
+
+
+def anagram_vector(word: str) -> np.ndarray:
+    """One-hot vector of the word's sorted letters, so anagrams have similarity 1."""
+    return _hashed_vector(["".join(sorted(word.replace(" ", "")))], ANAGRAM_DIM)
+
+
+LEXICAL_SOURCES = {
+    "char_ngrams": char_ngram_vector,
+    "affixes": affix_vector,
+    "anagram": anagram_vector,
+}
+
+
+def _load_local_vectors(path: str, words: Iterable[str]) -> Dict[str, np.ndarray]:
+    """
+    Read the vectors of the requested words from a text vector file.
+
+    Each line holds a word followed by its components, as in GloVe or fastText
+    ".vec" files. Only the requested words are kept in memory.
+    """
+    wanted = set(words)
+    vectors: Dict[str, np.ndarray] = {}
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            word, _, values = line.rstrip().partition(" ")
+            if word in wanted:
+                vectors[word] = np.asarray(values.split(), dtype=np.float32)
+                if len(vectors) == len(wanted):
+                    break
+    return vectors
+
+
+def _normalized_rows(vectors: np.ndarray) -> np.ndarray:
+    """Scale the rows of a matrix to unit length, leaving zero rows at zero."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class EmbeddingEnsemble:
+    """
+    Weighted combination of several embedding sources.
+
+    Word vectors are cached per source across puzzles (up to VECTOR_CACHE_SIZE
+    words each), and the similarity matrix of each source is cached per word list,
+    so changing the weights or re-scoring a puzzle never re-fetches or re-computes
+    a source.
+    """
+
+    def __init__(self, weights: Dict[str, float]):
+        self.weights = dict(weights)
+        self._matrix_cache: "OrderedDict[Tuple[str, Tuple[str, ...]], np.ndarray]" = OrderedDict()
+
+    @property
+    def sources(self) -> List[str]:
+        return list(self.weights)
+
+    def seed(self, source: str, embeddings: Dict[str, List[float]]) -> None:
+        """Add vectors that were already fetched elsewhere to a source's cache."""
+        cache = _source_cache(source)
+        for word, embedding in embeddings.items():
+            if word not in cache and len(embedding):
+                _cache_vector(cache, word, np.asarray(embedding, dtype=np.float32))
+
+    async def prepare(self, words: List[str]) -> None:
+        """Fetch or compute the vectors missing from each source's cache."""
+        for source in self.sources:
+            cache = _source_cache(source)
+            missing = []
+            for word in dict.fromkeys(words):
+                if word in cache:
+                    cache.move_to_end(word)
+                else:
+                    missing.append(word)
+            if not missing:
+                continue
+
+            if source in LEXICAL_SOURCES:
+                feature = LEXICAL_SOURCES[source]
+                for word in missing:
+                    _cache_vector(cache, word, feature(word))
+            elif source.startswith("openai:"):
+                logger.info(f"Fetching {len(missing)} embeddings from {source}")
+                name = source.split(":", 1)[1]
+                model = traced_model(f"embeddings:{name}", lambda: OpenAIEmbeddings(model=name))
+                vectors = await model.aembed_documents(missing)
+                for word, vector in zip(missing, vectors):
+                    _cache_vector(cache, word, np.asarray(vector, dtype=np.float32))
+            elif source.startswith("vectors:"):
+                found = _load_local_vectors(source.split(":", 1)[1], missing)
+                logger.info(f"Loaded {len(found)} of {len(missing)} vectors from {source}")
+                for word, vector in found.items():
+                    _cache_vector(cache, word, vector)
+            else:
+                raise ValueError(f"Unknown embedding source: {source}")
+
+    def source_similarity(self, source: str, words: List[str]) -> np.ndarray:
+        """
+        Return the cosine similarity matrix of one source for a word list.
+
+        Words the source has no vector for get a similarity of zero.
+        """
+        key = (source, tuple(words))
+        if key in self._matrix_cache:
+            self._matrix_cache.move_to_end(key)
+            return self._matrix_cache[key]
+
+        cache = _vector_cache.get(source, {})
+        dim = next((len(v) for v in cache.values()), 1)
+        vectors = np.zeros((len(words), dim), dtype=np.float32)
+        for i, word in enumerate(words):
+            if word in cache:
+                vectors[i] = cache[word]
+        normalized = _normalized_rows(vectors)
+        matrix = normalized @ normalized.T
+
+        self._matrix_cache[key] = matrix
+        if len(self._matrix_cache) > MATRIX_CACHE_SIZE:
+            self._matrix_cache.popitem(last=False)
+        return matrix
+
+    def similarity(
+        self, words: List[str], weights: Optional[Dict[str, float]] = None
+    ) -> np.ndarray:
+        """
+        Combine the per-source similarity matrices with the ensemble weights.
+
+        The weights are normalized to sum to one, so weights that sum to zero or less
+        (e.g. a negative weight cancelling a positive one) raise ValueError.
+        """
+        weights = weights if weights is not None else self.weights
+        sources = [source for source, weight in weights.items() if weight]
+        if not sources:
+            return np.zeros((len(words), len(words)), dtype=np.float32)
+
+        weight_vector = np.asarray([weights[source] for source in sources], dtype=np.float32)
+        total = weight_vector.sum()
+        if total <= 0:
+            raise ValueError(f"Ensemble weights must sum to more than zero: {weights}")
+        stacked = np.stack([self.source_similarity(source, words) for source in sources])
+        return np.tensordot(weight_vector / total, stacked, axes=1)
+
+    async def fit_weights(self, puzzles: List[List[List[str]]]) -> Dict[str, float]:
+        """
+        Learn source weights from solved puzzles.
+
+        Each puzzle is a list of its answer groups. A source is weighted by how much
+        higher its mean within-group similarity is than its mean between-group
+        similarity; sources that do not separate the groups get a weight of zero.
+        """
+        separations = {source: [] for source in self.sources}
+        for groups in puzzles:
+            words = [word for group in groups for word in group]
+            labels = np.repeat(np.arange(len(groups)), [len(group) for group in groups])
+            same_group = labels[:, None] == labels[None, :]
+            off_diagonal = ~np.eye(len(words), dtype=bool)
+
+            await self.prepare(words)
+            for source in self.sources:
+                matrix = self.source_similarity(source, words)
+                within = matrix[same_group & off_diagonal].mean()
+                between = matrix[~same_group].mean()
+                separations[source].append(within - between)
+
+        scores = {
+            source: max(float(np.mean(values)), 0.0) for source, values in separations.items()
+        }
+        total = sum(scores.values())
+        if total > 0:
+            self.weights = {source: score / total for source, score in scores.items()}
+        logger.info(f"Fitted ensemble weights: {self.weights}")
+        return self.weights
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Fit embedding ensemble weights on answer keys")
+    parser.add_argument("answer_keys", nargs="+", help="answer key JSON files")
+    parser.add_argument("--sources", default=DEFAULT_FIT_SOURCES, help="comma-separated sources")
+    args = parser.parse_args()
+
+    from evaluate_solver import load_answer_key
+
+    puzzles = [
+        [group["words"] for group in load_answer_key(path)["groups"]] for path in args.answer_keys
+    ]
+    ensemble = EmbeddingEnsemble(parse_ensemble_spec(args.sources))
+    print(format_ensemble_spec(await ensemble.fit_weights(puzzles)))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
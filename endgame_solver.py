@@ -0,0 +1,78 @@
+"""
+Endgame Solver for Connection Puzzle Solver
+
+This module solves the last rounds of a puzzle locally. With few words left the
+possible splits into groups of four are few enough to enumerate (35 for 8 words,
+5775 for 12). Splits are built from the groups the constraint engine still
+considers feasible, so every split inconsistent with the feedback is skipped. A
+forced group is returned directly; otherwise the remaining splits are ranked by
+how cohesive their groups are in embedding space.
+"""
+
+import logging
+from itertools import combinations
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from constraint_engine import ConstraintEngine
+
+logger = logging.getLogger(__name__)
+
+
+def group_cohesion(group: Sequence[str], similarity: Callable[[str, str], float]) -> float:
+    """Mean pairwise similarity of the words of a group."""
+    pairs = list(combinations(group, 2))
+    return sum(similarity(a, b) for a, b in pairs) / len(pairs)
+
+
+def solve_endgame(
+    remaining_words: List[str],
+    solved_groups: List[List[str]],
+    invalid_groups: List[Dict[str, Any]],
+    similarity: Optional[Callable[[str, str], float]] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Recommend a group from the splits of the remaining words consistent with the feedback.
+
+    Returns None when no split is consistent (or the word count is not a multiple of
+    four). Otherwise the result holds the recommended group, a reason, the number of
+    consistent splits and whether the group is forced. Without a similarity function
+    only a forced group is recommended; there is nothing to rank the other splits by,
+    so None is returned and the caller falls back to its other recommenders.
+    """
+    if not remaining_words or len(remaining_words) % 4:
+        return None
+
+    engine = ConstraintEngine(remaining_words, solved_groups, invalid_groups)
+    consistent = [
+        tuple(engine.unmask(group) for group in partition) for partition in engine.partitions()
+    ]
+    if not consistent:
+        logger.warning(f"No split of {len(remaining_words)} words is consistent with the feedback")
+        return None
+
+    if similarity is None:
+        forced_groups = [
+            group for group in consistent[0] if all(group in split for split in consistent[1:])
+        ]
+        if not forced_groups:
+            logger.info(f"Endgame: {len(consistent)} consistent splits and no similarity to rank")
+            return None
+        group, forced = forced_groups[0], True
+    else:
+
+        def cohesion(group: Sequence[str]) -> float:
+            return group_cohesion(group, similarity)
+
+        best = max(consistent, key=lambda partition: sum(cohesion(group) for group in partition))
+        group = max(best, key=cohesion)
+        forced = all(group in partition for partition in consistent)
+
+    if len(consistent) == 1:
+        reason = "The only grouping of the remaining words consistent with the feedback"
+    elif forced:
+        reason = f"In every one of the {len(consistent)} groupings consistent with the feedback"
+    else:
+        reason = f"Most cohesive of {len(consistent)} groupings consistent with the feedback"
+
+    logger.info(f"Endgame: {len(consistent)} consistent splits, recommending {list(group)}")
+    return {"group": list(group), "reason": reason, "partitions": len(consistent), "forced": forced}
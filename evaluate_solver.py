@@ -0,0 +1,404 @@
+"""
+Self-Play Evaluation Harness for Connection Puzzle Solver
+
+This script replays puzzles with known answers through the workflow manager. The
+feedback a human would give in the web UI (correct color, one-away, not-correct)
+is generated from the answer key, and every recommendation is measured: solve
+rate, mistakes and guesses per puzzle, chat model calls, tokens and wall time,
+broken down per recommender and per workflow node. Calls and tokens count chat
+model (LLM) requests only; embedding requests go through no LangChain callback
+and are not included.
+
+Answer keys are JSON files of the form:
+
+    {"groups": [{"color": "yellow", "words": ["a", "b", "c", "d"], "reason": "..."}, ...]}
+
+Colors default to yellow, green, blue, purple in order. Configurations compared
+in one run are given as a JSON list:
+
+    [{"name": "planner", "active_recommender": "default"},
+     {"name": "wordplay", "active_recommender": "wordplay",
+      "settings": {"WORDPLAY_MIN_SCORE": 0.4}}]
+
+"settings" override workflow_manager constants for that configuration.
+
+Usage:
+    python evaluate_solver.py answers/*.json [--configs configs.json] [--parallel 4]
+        [--output report.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional
+
+import workflow_manager as wm
+from session_store import new_puzzle_state
+
+COLORS = ["yellow", "green", "blue", "purple"]
+
+DEFAULT_CONFIGS = [{"name": "default", "active_recommender": "default"}]
+
+_active_tracker: ContextVar[Optional[Any]] = ContextVar("usage_tracker", default=None)
+_hook_registered = False
+
+
+@lru_cache(maxsize=1)
+def _usage_tracker_class():
+    """Define the callback handler, importing LangChain on first use."""
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class _UsageTracker(BaseCallbackHandler):
+        """
+        LangChain callback handler counting model calls, tokens and node time.
+
+        Installed through a context variable, it sees every run started in the
+        current task, including the runs of the graph nodes and the models they call.
+        """
+
+        def __init__(self):
+            self.node_seconds: Dict[str, float] = defaultdict(float)
+            self.node_runs: Dict[str, int] = defaultdict(int)
+            self.calls: Dict[str, int] = defaultdict(int)
+            self.tokens: Dict[str, int] = defaultdict(int)
+            self._node_starts: Dict[Any, tuple] = {}
+            self._call_nodes: Dict[Any, str] = {}
+
+        def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+            node = (metadata or {}).get("langgraph_node")
+            if node is not None and kwargs.get("name") == node and not node.startswith("__"):
+                self._node_starts[run_id] = (node, time.perf_counter())
+
+        def on_chain_end(self, outputs, *, run_id, **kwargs):
+            if run_id in self._node_starts:
+                node, started = self._node_starts.pop(run_id)
+                self.node_seconds[node] += time.perf_counter() - started
+                self.node_runs[node] += 1
+
+        on_chain_error = on_chain_end
+
+        def _start_call(self, run_id, metadata):
+            node = (metadata or {}).get("langgraph_node", "outside_graph")
+            self._call_nodes[run_id] = node
+            self.calls[node] += 1
+
+        def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+            self._start_call(run_id, metadata)
+
+        def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs):
+            self._start_call(run_id, metadata)
+
+        def on_llm_end(self, response, *, run_id, **kwargs):
+            node = self._call_nodes.pop(run_id, "outside_graph")
+            tokens = 0
+            for generations in response.generations:
+                for generation in generations:
+                    usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                    if usage:
+                        tokens += usage.get("total_tokens", 0)
+            if not tokens and response.llm_output:
+                tokens = response.llm_output.get("token_usage", {}).get("total_tokens", 0)
+            self.tokens[node] += tokens
+
+        def totals(self) -> Dict[str, int]:
+            return {"calls": sum(self.calls.values()), "tokens": sum(self.tokens.values())}
+
+    return _UsageTracker
+
+
+def new_usage_tracker():
+    """Create a usage tracker and make sure LangChain hands it every run."""
+    global _hook_registered
+    if not _hook_registered:
+        from langchain_core.tracers.context import register_configure_hook
+
+        register_configure_hook(_active_tracker, inheritable=True)
+        _hook_registered = True
+    return _usage_tracker_class()()
+
+
+def load_answer_key(path: str) -> Dict[str, Any]:
+    """Load an answer key and fill in default colors."""
+    with open(path, "r") as file:
+        key = json.load(file)
+    groups = []
+    for color, group in zip(COLORS, key["groups"]):
+        groups.append(
+            {
+                "color": group.get("color", color),
+                "words": [word.strip().lower() for word in group["words"]],
+                "reason": group.get("reason", ""),
+            }
+        )
+    return {"name": os.path.splitext(os.path.basename(path))[0], "groups": groups}
+
+
+def judge(group: List[str], answer_groups: List[Dict[str, Any]]) -> Dict[str, str]:
+    """Return the feedback a human would give for a guessed group."""
+    guess = set(group)
+    best_overlap = 0
+    for answer in answer_groups:
+        overlap = len(guess & set(answer["words"]))
+        if overlap == 4 and len(guess) == 4:
+            return {"color": answer["color"], "response": "", "reason": answer["reason"]}
+        best_overlap = max(best_overlap, overlap)
+    return {
+        "color": "",
+        "response": "one-away" if best_overlap == 3 else "not-correct",
+        "reason": "",
+    }
+
+
+# workflow_manager state derived from its constants
+CACHED_STATE = (
+    "_router",
+    "_embedding_ensemble",
+    "_candidate_indexes",
+    "_wordplay_indexes",
+    "_constraint_engines",
+)
+
+
+@contextmanager
+def applied_settings(settings: Dict[str, Any]) -> Iterator[None]:
+    """
+    Temporarily override workflow_manager constants.
+
+    The router, the embedding ensemble and the per-session caches are built from those
+    constants, so they start empty under the overrides and are restored afterwards.
+    """
+    previous = {name: getattr(wm, name) for name in settings}
+    cached = {name: getattr(wm, name) for name in CACHED_STATE}
+    for name, value in settings.items():
+        setattr(wm, name, value)
+    wm._router = wm._embedding_ensemble = None
+    wm._candidate_indexes, wm._wordplay_indexes, wm._constraint_engines = {}, {}, {}
+    try:
+        yield
+    finally:
+        for name, value in {**previous, **cached}.items():
+            setattr(wm, name, value)
+
+
+async def play_puzzle(
+    answer_key: Dict[str, Any], config: Dict[str, Any], seed: int = 0
+) -> Dict[str, Any]:
+    """Solve one puzzle with auto-generated feedback and return its measurements."""
+    tracker = new_usage_tracker()
+    _active_tracker.set(tracker)
+    started = time.perf_counter()
+
+    words = [word for group in answer_key["groups"] for word in group["words"]]
+    random.Random(seed).shuffle(words)
+    session_id = f"eval:{config['name']}:{answer_key['name']}"
+
+    puzzle_state = new_puzzle_state(session_id, words)
+    workflow_state = wm.initialize_state_from_puzzle_state(puzzle_state)
+    setup_started = time.perf_counter()
+    result_state = await wm.setup_puzzle(workflow_state)
+    setup_seconds = time.perf_counter() - setup_started
+    wm.update_puzzle_state_from_workflow(puzzle_state, result_state)
+    puzzle_state.active_recommender = config.get("active_recommender", "default")
+
+    guesses: List[Dict[str, Any]] = []
+    pending: Optional[Dict[str, Any]] = None
+
+    # Usage snapshot and start time of the one-away analysis that produced pending
+    pending_started = None
+
+    while puzzle_state.remaining and puzzle_state.mistake_count < wm.MAX_ERRORS:
+        before, guess_started = pending_started or (tracker.totals(), time.perf_counter())
+        recommendation = pending or await wm.get_recommendation_from_workflow(puzzle_state)
+        pending = pending_started = None
+        seconds = time.perf_counter() - guess_started
+
+        group = recommendation.get("group", [])
+        source = recommendation.get("source", "unknown")
+        after = tracker.totals()
+        guess = {
+            "source": source,
+            "group": group,
+            "seconds": seconds,
+            "calls": after["calls"] - before["calls"],
+            "tokens": after["tokens"] - before["tokens"],
+        }
+        guesses.append(guess)
+        if len(group) != 4:
+            guess["outcome"] = "no_recommendation"
+            break
+        if not set(group) <= set(puzzle_state.remaining_words):
+            guess["outcome"] = "invalid_group"
+            break
+
+        feedback = judge(group, answer_key["groups"])
+        outcome = guess["outcome"] = feedback["color"] and "correct" or feedback["response"]
+
+        wm.apply_feedback(
+            puzzle_state, group, feedback["color"], feedback["response"], feedback["reason"], source
+        )
+        if outcome == "one-away":
+            # The analyzer's suggestion becomes the next guess, as a human would try it,
+            # and that guess is charged with the analysis; an analysis without a
+            # suggestion is charged to the guess that triggered it
+            analysis_started = (tracker.totals(), time.perf_counter())
+            one_away_result = await wm.analyze_one_away(puzzle_state)
+            if len(one_away_result.get("group", [])) == 4:
+                pending, pending_started = one_away_result, analysis_started
+            else:
+                after = tracker.totals()
+                guess["seconds"] += time.perf_counter() - analysis_started[1]
+                guess["calls"] += after["calls"] - analysis_started[0]["calls"]
+                guess["tokens"] += after["tokens"] - analysis_started[0]["tokens"]
+        elif outcome == "correct" and len(puzzle_state.remaining_words) == 4:
+            # The last group is forced once three are solved
+            solved_colors = {color for color, _ in puzzle_state.correct}
+            last_color = next(
+                a["color"] for a in answer_key["groups"] if a["color"] not in solved_colors
+            )
+            # A revealed group is no recommender's outcome, so the router does not learn from it
+            wm.apply_feedback(
+                puzzle_state, puzzle_state.remaining_words, last_color, record_outcome=False
+            )
+
+    return {
+        "puzzle": answer_key["name"],
+        "solved": not puzzle_state.remaining,
+        "mistakes": puzzle_state.mistake_count,
+        "guesses": guesses,
+        "setup_seconds": setup_seconds,
+        "seconds": time.perf_counter() - started,
+        "calls": dict(tracker.calls),
+        "tokens": dict(tracker.tokens),
+        "node_seconds": dict(tracker.node_seconds),
+        "node_runs": dict(tracker.node_runs),
+    }
+
+
+async def evaluate_config(
+    answer_keys: List[Dict[str, Any]], config: Dict[str, Any], parallel: int = 4
+) -> Dict[str, Any]:
+    """Play every puzzle under one configuration, several at a time, and summarize."""
+    semaphore = asyncio.Semaphore(parallel)
+
+    async def play(index: int, answer_key: Dict[str, Any]) -> Dict[str, Any]:
+        async with semaphore:
+            return await play_puzzle(answer_key, config, seed=index)
+
+    with applied_settings(config.get("settings", {})):
+        started = time.perf_counter()
+        results = await asyncio.gather(*(play(i, key) for i, key in enumerate(answer_keys)))
+        elapsed = time.perf_counter() - started
+
+    return {"config": config, "seconds": elapsed, "summary": summarize(results), "puzzles": results}
+
+
+def summarize(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Aggregate puzzle results overall, per recommender and per node."""
+    count = max(len(results), 1)
+    recommenders: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    nodes: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+
+    for result in results:
+        for guess in result["guesses"]:
+            stats = recommenders[guess["source"]]
+            stats["guesses"] += 1
+            stats[guess["outcome"]] += 1
+            stats["seconds"] += guess["seconds"]
+            stats["calls"] += guess["calls"]
+            stats["tokens"] += guess["tokens"]
+        for node, seconds in result["node_seconds"].items():
+            nodes[node]["seconds"] += seconds
+            nodes[node]["runs"] += result["node_runs"].get(node, 0)
+        for node, calls in result["calls"].items():
+            nodes[node]["calls"] += calls
+            nodes[node]["tokens"] += result["tokens"].get(node, 0)
+
+    for stats in recommenders.values():
+        stats["accuracy"] = stats["correct"] / stats["guesses"]
+        stats["mean_seconds"] = stats["seconds"] / stats["guesses"]
+
+    return {
+        "puzzles": len(results),
+        "solve_rate": sum(result["solved"] for result in results) / count,
+        "mean_mistakes": sum(result["mistakes"] for result in results) / count,
+        "mean_guesses": sum(len(result["guesses"]) for result in results) / count,
+        "mean_calls": sum(sum(result["calls"].values()) for result in results) / count,
+        "mean_tokens": sum(sum(result["tokens"].values()) for result in results) / count,
+        "mean_seconds": sum(result["seconds"] for result in results) / count,
+        "recommenders": {name: dict(stats) for name, stats in recommenders.items()},
+        "nodes": {name: dict(stats) for name, stats in nodes.items()},
+    }
+
+
+def format_report(evaluations: List[Dict[str, Any]]) -> str:
+    """Format a side-by-side comparison of configurations as text."""
+    lines = [
+        f"{'config':<20} {'solved':>7} {'mistakes':>9} {'guesses':>8} {'calls':>7} "
+        f"{'tokens':>8} {'seconds':>8}"
+    ]
+    for evaluation in evaluations:
+        summary = evaluation["summary"]
+        lines.append(
+            f"{evaluation['config']['name']:<20} {summary['solve_rate']:>7.0%} "
+            f"{summary['mean_mistakes']:>9.2f} {summary['mean_guesses']:>8.2f} "
+            f"{summary['mean_calls']:>7.1f} {summary['mean_tokens']:>8.0f} "
+            f"{summary['mean_seconds']:>8.2f}"
+        )
+
+    for evaluation in evaluations:
+        summary = evaluation["summary"]
+        lines.append("")
+        lines.append(f"[{evaluation['config']['name']}] per recommender")
+        for name, stats in sorted(summary["recommenders"].items()):
+            lines.append(
+                f"  {name:<22} guesses {stats['guesses']:>4.0f}  "
+                f"accuracy {stats['accuracy']:>5.0%}  latency {stats['mean_seconds']:>6.2f}s  "
+                f"calls {stats['calls']:>4.0f}  tokens {stats['tokens']:>7.0f}"
+            )
+        lines.append(f"[{evaluation['config']['name']}] per node")
+        for name, stats in sorted(
+            summary["nodes"].items(), key=lambda item: -item[1].get("seconds", 0)
+        ):
+            lines.append(
+                f"  {name:<30} runs {stats.get('runs', 0):>4.0f}  "
+                f"time {stats.get('seconds', 0):>7.2f}s  "
+                f"calls {stats.get('calls', 0):>4.0f}  tokens {stats.get('tokens', 0):>7.0f}"
+            )
+    return "\n".join(lines)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Replay puzzles with answer keys through the solver"
+    )
+    parser.add_argument("answer_keys", nargs="+", help="answer key JSON files")
+    parser.add_argument("--configs", help="JSON file with the configurations to compare")
+    parser.add_argument("--parallel", type=int, default=4, help="puzzles played at once")
+    parser.add_argument("--output", help="write the full results as JSON to this file")
+    args = parser.parse_args()
+
+    answer_keys = [load_answer_key(path) for path in args.answer_keys]
+    configs = DEFAULT_CONFIGS
+    if args.configs:
+        with open(args.configs, "r") as file:
+            configs = json.load(file)
+
+    evaluations = []
+    for config in configs:
+        evaluations.append(await evaluate_config(answer_keys, config, args.parallel))
+
+    print(format_report(evaluations))
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(evaluations, file, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
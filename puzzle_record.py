@@ -0,0 +1,317 @@
+"""
+Compact Puzzle Records for Connection Puzzle Solver
+
+This module stores the web UI puzzle state of a session compactly. The words of a
+puzzle are interned once into a shared WordIndex; the remaining words and every
+group are bitmasks over that index, and embeddings are a single quantized matrix
+with one row per word (see embedding_codec). All fields of a PuzzleRecord are immutable values or
+shared read-only objects, so a snapshot is a shallow copy of a few slots and two
+records can be diffed field by field.
+
+The LangGraph workflow still runs on plain dict states; to_workflow_state and
+update_from_workflow convert at that boundary.
+"""
+
+import sys
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+COLORS = ("yellow", "green", "blue", "purple")
+
+# Version of the serialized layout written by PuzzleRecord.to_bytes
+RECORD_VERSION = 3
+
+
+class WordIndex:
+    """Interned words of one puzzle and their bit positions."""
+
+    __slots__ = ("words", "bits")
+
+    def __init__(self, words: Sequence[str]):
+        self.words: Tuple[str, ...] = tuple(sys.intern(word) for word in dict.fromkeys(words))
+        self.bits: Dict[str, int] = {word: 1 << i for i, word in enumerate(self.words)}
+
+    def mask(self, words: Iterable[str]) -> int:
+        """Bitmask of the given words; words outside the puzzle are ignored."""
+        mask = 0
+        for word in words:
+            mask |= self.bits.get(word, 0)
+        return mask
+
+    def group_mask(self, words: Iterable[str]) -> int:
+        """Bitmask of the words of a group, which must all be words of the puzzle."""
+        words = list(words)
+        unknown = [word for word in words if word not in self.bits]
+        if unknown:
+            raise ValueError(f"Words not in the puzzle: {', '.join(unknown)}")
+        return self.mask(words)
+
+    def unmask(self, mask: int) -> List[str]:
+        """Words of a bitmask, in puzzle order."""
+        return [word for i, word in enumerate(self.words) if mask >> i & 1]
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, WordIndex) and self.words == other.words
+
+    def __hash__(self) -> int:
+        return hash(self.words)
+
+
+def mask_to_bytes(mask: int) -> bytes:
+    """Encode a word mask for msgpack, whose integers are limited to 64 bits."""
+    return mask.to_bytes((mask.bit_length() + 7) // 8, "little")
+
+
+def mask_from_bytes(data: bytes) -> int:
+    return int.from_bytes(data, "little")
+
+
+class GroupRecord:
+    """A solved or rejected group: its word mask, reason and error type."""
+
+    __slots__ = ("mask", "reason", "error_type")
+
+    def __init__(self, mask: int, reason: str = "", error_type: str = ""):
+        self.mask = mask
+        self.reason = reason
+        self.error_type = error_type
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, GroupRecord) and (
+            (self.mask, self.reason, self.error_type)
+            == (other.mask, other.reason, other.error_type)
+        )
+
+    def __hash__(self) -> int:
+        return hash((self.mask, self.reason, self.error_type))
+
+
+class PuzzleRecord:
+    """
+    Puzzle state of one web UI session.
+
+    Solved groups are kept as (color, GroupRecord) pairs and rejected groups as
+    GroupRecords, both in tuples; updates replace fields instead of mutating them.
+    """
+
+    __slots__ = (
+        "session_id",
+        "index",
+        "remaining",
+        "correct",
+        "invalid",
+        "active_recommender",
+        "status",
+        "mistake_count",
+        "embeddings",
+    )
+
+    def __init__(self, session_id: str, words: Sequence[str] = (), status: str = "Ready"):
+        self.session_id = session_id
+        self.index = WordIndex(words)
+        self.remaining = (1 << len(self.index.words)) - 1
+        self.correct: Tuple[Tuple[str, GroupRecord], ...] = ()
+        self.invalid: Tuple[GroupRecord, ...] = ()
+        self.active_recommender = "default"
+        self.status = status
+        self.mistake_count = 0
+        # QuantizedEmbeddings of the words of the index, or None
+        self.embeddings: Optional[Any] = None
+
+    def copy(self) -> "PuzzleRecord":
+        """Return a snapshot sharing the index, groups and embeddings."""
+        record = PuzzleRecord.__new__(PuzzleRecord)
+        for name in self.__slots__:
+            setattr(record, name, getattr(self, name))
+        return record
+
+    def diff(self, other: "PuzzleRecord") -> Dict[str, Any]:
+        """Return the fields whose value differs in other, with other's values."""
+        changes = {}
+        for name in self.__slots__:
+            mine, theirs = getattr(self, name), getattr(other, name)
+            if mine is not theirs and mine != theirs:
+                changes[name] = theirs
+        return changes
+
+    @property
+    def remaining_words(self) -> List[str]:
+        return self.index.unmask(self.remaining)
+
+    @property
+    def correct_groups(self) -> Dict[str, List[Dict[str, Any]]]:
+        groups: Dict[str, List[Dict[str, Any]]] = {color: [] for color in COLORS}
+        for color, group in self.correct:
+            groups.setdefault(color, []).append(
+                {"words": self.index.unmask(group.mask), "reason": group.reason}
+            )
+        return groups
+
+    @property
+    def invalid_groups(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "words": self.index.unmask(group.mask),
+                "reason": group.reason,
+                "error_type": group.error_type,
+            }
+            for group in self.invalid
+        ]
+
+    def solve_group(self, color: str, words: Iterable[str], reason: str = "") -> None:
+        """Record a correct group and remove its words from the remaining words."""
+        mask = self.index.group_mask(words)
+        self.correct = self.correct + ((color, GroupRecord(mask, reason)),)
+        self.remaining &= ~mask
+
+    def reject_group(
+        self, words: Iterable[str], reason: str = "", error_type: str = "not-correct"
+    ) -> None:
+        """Record a group that was not correct. Words outside the puzzle raise ValueError."""
+        self.invalid = self.invalid + (
+            GroupRecord(self.index.group_mask(words), reason, error_type),
+        )
+
+    def set_embeddings(self, embeddings: Mapping[str, Sequence[float]]) -> None:
+        """
+        Store the embeddings of the puzzle's words as one matrix.
+
+        Quantized embeddings keep their storage; plain vectors are stored as float32.
+        """
+        from embedding_codec import QuantizedEmbeddings
+
+        if not embeddings or any(word not in embeddings for word in self.index.words):
+            self.embeddings = None
+            return
+        if not isinstance(embeddings, QuantizedEmbeddings):
+            embeddings = QuantizedEmbeddings.encode(embeddings, "float32")
+        self.embeddings = embeddings.subset(self.index.words)
+
+    def to_workflow_state(self) -> Dict[str, Any]:
+        """Build the dict state the workflow graph runs on."""
+        return {
+            "puzzle_status": self.status,
+            "tool_status": "ready",
+            "mistake_count": self.mistake_count,
+            "retry_count": 0,
+            "remaining_words": self.remaining_words,
+            "correct_groups": self.correct_groups,
+            "invalid_groups": self.invalid_groups,
+            "active_recommender": self.active_recommender,
+            "tool_to_use": "setup_puzzle",
+            "recommendations": {},
+            "word_embeddings": {},
+            "session_id": self.session_id,
+        }
+
+    def update_from_workflow(self, workflow_state: Dict[str, Any]) -> None:
+        """Apply the fields of a workflow state that the web UI keeps."""
+        if "remaining_words" in workflow_state:
+            words = workflow_state["remaining_words"]
+            if any(word not in self.index.bits for word in words):
+                # A new puzzle: re-intern its words
+                self.index = WordIndex(words)
+                self.embeddings = None
+            self.remaining = self.index.mask(words)
+        if "correct_groups" in workflow_state:
+            self.correct = tuple(
+                (
+                    color,
+                    GroupRecord(
+                        self.index.group_mask(group.get("words", [])), group.get("reason", "")
+                    ),
+                )
+                for color, groups in workflow_state["correct_groups"].items()
+                for group in groups
+            )
+        if "invalid_groups" in workflow_state:
+            self.invalid = tuple(
+                GroupRecord(
+                    self.index.group_mask(group.get("words", [])),
+                    group.get("reason", ""),
+                    group.get("error_type", ""),
+                )
+                for group in workflow_state["invalid_groups"]
+            )
+        self.active_recommender = workflow_state.get("active_recommender", self.active_recommender)
+        self.status = workflow_state.get("puzzle_status", self.status)
+        self.mistake_count = workflow_state.get("mistake_count", self.mistake_count)
+        if workflow_state.get("word_embeddings"):
+            self.set_embeddings(workflow_state["word_embeddings"])
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the state in the web API's JSON shape."""
+        return {
+            "remaining_words": self.remaining_words,
+            "correct_groups": self.correct_groups,
+            "invalid_groups": self.invalid_groups,
+            "active_recommender": self.active_recommender,
+            "status": self.status,
+            "session_id": self.session_id,
+        }
+
+    def to_bytes(self, include_embeddings: bool = True) -> bytes:
+        """
+        Serialize the record with msgpack.
+
+        Without include_embeddings the embedding codes are left out, for callers that
+        store them separately; their words and scales are still written.
+        """
+        import ormsgpack
+
+        return ormsgpack.packb(
+            [
+                RECORD_VERSION,
+                self.session_id,
+                list(self.index.words),
+                mask_to_bytes(self.remaining),
+                [[color, mask_to_bytes(group.mask), group.reason] for color, group in self.correct],
+                [
+                    [mask_to_bytes(group.mask), group.reason, group.error_type]
+                    for group in self.invalid
+                ],
+                self.active_recommender,
+                self.status,
+                self.mistake_count,
+                (
+                    None
+                    if self.embeddings is None
+                    else self.embeddings.to_bytes(include_codes=include_embeddings)
+                ),
+            ]
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes, embedding_codes: Optional[Any] = None) -> "PuzzleRecord":
+        """Rebuild a record serialized by to_bytes, with embedding codes stored apart if given."""
+        import ormsgpack
+
+        (
+            version,
+            session_id,
+            words,
+            remaining,
+            correct,
+            invalid,
+            active_recommender,
+            status,
+            mistake_count,
+            embeddings,
+        ) = ormsgpack.unpackb(data)
+        if version != RECORD_VERSION:
+            raise ValueError(f"Unsupported puzzle record version: {version}")
+        record = cls(session_id, words, status)
+        record.remaining = mask_from_bytes(remaining)
+        record.correct = tuple(
+            (color, GroupRecord(mask_from_bytes(mask), reason)) for color, mask, reason in correct
+        )
+        record.invalid = tuple(
+            GroupRecord(mask_from_bytes(mask), reason, error_type)
+            for mask, reason, error_type in invalid
+        )
+        record.active_recommender = active_recommender
+        record.mistake_count = mistake_count
+        if embeddings is not None:
+            from embedding_codec import QuantizedEmbeddings
+
+            record.embeddings = QuantizedEmbeddings.from_bytes(embeddings, embedding_codes)
+        return record
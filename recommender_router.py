@@ -0,0 +1,218 @@
+"""
+Recommender Router for Connection Puzzle Solver
+
+This module decides whether a recommendation should come from the embedding
+candidates alone or be escalated to the LLM. The decision uses cheap local signals
+(the margin between the best candidate group and its best competitor, the
+number of remaining words
+and the mistakes made so far) together with running per-recommender latency and
+accuracy statistics, and picks the path with the lowest expected cost: its
+latency plus the price of a likely mistake.
+"""
+
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Prior accuracy and latency (seconds) of each recommender, used until enough
+# outcomes have been observed; PRIOR_WEIGHT is their weight in observations
+PRIORS = {
+    "embedding": {"accuracy": 0.5, "seconds": 1.5},
+    "llm": {"accuracy": 0.6, "seconds": 4.0},
+}
+PRIOR_WEIGHT = 5.0
+
+
+def candidate_margin(candidates: List[Dict[str, Any]]) -> Optional[float]:
+    """
+    Metric difference between the best candidate group and its best competitor.
+
+    Candidates are ranked best first. A competitor shares at least one word with the
+    best group: a disjoint group can be correct as well, so a close score there is
+    no sign of ambiguity. Returns None when no candidate competes with the best.
+    """
+    if not candidates:
+        return None
+    best = candidates[0]
+    words = set(best["words"])
+    for candidate in candidates[1:]:
+        if words & set(candidate["words"]):
+            return best["metric"] - candidate["metric"]
+    return None
+
+
+class RoutingPolicy:
+    """
+    Tunable thresholds of the router.
+
+    skip_llm_margin: candidate margin above which the embedding group is used as is
+    escalate_margin: candidate margin below which embeddings count as ambiguous
+    mistake_cost: cost of a wrong guess in seconds, multiplied by 1 + mistakes made
+    ambiguity_penalty: fraction of embedding accuracy lost at the ambiguous end of
+        the margin band
+    """
+
+    DEFAULTS = {
+        "skip_llm_margin": 0.04,
+        "escalate_margin": 0.01,
+        "mistake_cost": 10.0,
+        "ambiguity_penalty": 0.5,
+    }
+
+    def __init__(self, **overrides: float):
+        unknown = set(overrides) - set(self.DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown routing policy settings: {', '.join(sorted(unknown))}")
+        for name, value in {**self.DEFAULTS, **overrides}.items():
+            setattr(self, name, float(value))
+
+    def as_dict(self) -> Dict[str, float]:
+        return {name: getattr(self, name) for name in self.DEFAULTS}
+
+
+def parse_policy_spec(spec: str) -> RoutingPolicy:
+    """Parse a policy specification such as "skip_llm_margin=0.05,mistake_cost=20"."""
+    overrides: Dict[str, float] = {}
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, value = item.partition("=")
+        overrides[name.strip()] = float(value)
+    return RoutingPolicy(**overrides)
+
+
+class RecommenderStats:
+    """Running latency and accuracy of each recommender, blended with the priors."""
+
+    def __init__(self):
+        self.runs: Dict[str, int] = {}
+        self.seconds: Dict[str, float] = {}
+        self.guesses: Dict[str, int] = {}
+        self.correct: Dict[str, int] = {}
+
+    def record_latency(self, recommender: str, seconds: float) -> None:
+        self.runs[recommender] = self.runs.get(recommender, 0) + 1
+        self.seconds[recommender] = self.seconds.get(recommender, 0.0) + seconds
+
+    def record_outcome(self, recommender: str, correct: bool) -> None:
+        self.guesses[recommender] = self.guesses.get(recommender, 0) + 1
+        self.correct[recommender] = self.correct.get(recommender, 0) + int(correct)
+
+    def accuracy(self, recommender: str) -> float:
+        prior = PRIORS.get(recommender, {"accuracy": 0.5})["accuracy"]
+        guesses = self.guesses.get(recommender, 0)
+        return (prior * PRIOR_WEIGHT + self.correct.get(recommender, 0)) / (PRIOR_WEIGHT + guesses)
+
+    def latency(self, recommender: str) -> float:
+        prior = PRIORS.get(recommender, {"seconds": 1.0})["seconds"]
+        runs = self.runs.get(recommender, 0)
+        return (prior * PRIOR_WEIGHT + self.seconds.get(recommender, 0.0)) / (PRIOR_WEIGHT + runs)
+
+    def load_report(self, path: str) -> None:
+        """
+        Seed the statistics from an evaluate_solver.py report.
+
+        Every configuration in the report contributes its per-recommender guesses,
+        correct guesses and latency.
+        """
+        with open(path, "r") as file:
+            evaluations = json.load(file)
+        for evaluation in evaluations:
+            for recommender, stats in evaluation["summary"]["recommenders"].items():
+                guesses = int(stats.get("guesses", 0))
+                self.guesses[recommender] = self.guesses.get(recommender, 0) + guesses
+                self.correct[recommender] = self.correct.get(recommender, 0) + int(
+                    stats.get("correct", 0)
+                )
+                self.runs[recommender] = self.runs.get(recommender, 0) + guesses
+                self.seconds[recommender] = self.seconds.get(recommender, 0.0) + stats.get(
+                    "seconds", 0.0
+                )
+        logger.info(f"Loaded recommender statistics from {path}")
+
+    def to_dict(self) -> Dict[str, Dict[str, float]]:
+        """Return the raw counters, e.g. to record them with a workflow trace."""
+        return {
+            "runs": dict(self.runs),
+            "seconds": dict(self.seconds),
+            "guesses": dict(self.guesses),
+            "correct": dict(self.correct),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Dict[str, float]]) -> "RecommenderStats":
+        """Rebuild statistics from the counters returned by to_dict."""
+        stats = cls()
+        stats.runs = {name: int(value) for name, value in data.get("runs", {}).items()}
+        stats.seconds = {name: float(value) for name, value in data.get("seconds", {}).items()}
+        stats.guesses = {name: int(value) for name, value in data.get("guesses", {}).items()}
+        stats.correct = {name: int(value) for name, value in data.get("correct", {}).items()}
+        return stats
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        names = set(PRIORS) | set(self.runs) | set(self.guesses)
+        return {
+            name: {
+                "accuracy": round(self.accuracy(name), 3),
+                "seconds": round(self.latency(name), 3),
+            }
+            for name in sorted(names)
+        }
+
+
+class RecommenderRouter:
+    """Pick the cheapest recommender likely to produce a correct group."""
+
+    def __init__(
+        self, policy: Optional[RoutingPolicy] = None, stats: Optional[RecommenderStats] = None
+    ):
+        self.policy = policy or RoutingPolicy()
+        self.stats = stats or RecommenderStats()
+
+    def route(self, margin: Optional[float], remaining_words: int, mistakes: int) -> Dict[str, Any]:
+        """
+        Choose between "embedding" and "llm" for the next recommendation.
+
+        margin is the metric difference between the best candidate group and the
+        best one sharing a word with it (see candidate_margin), or None when no
+        candidate competes with the best. The returned decision
+        holds the chosen recommender, a reason, the signals and the expected costs.
+        """
+        policy = self.policy
+        signals = {"margin": margin, "remaining_words": remaining_words, "mistakes": mistakes}
+        costs: Dict[str, float] = {}
+
+        if margin is None or remaining_words <= 4:
+            recommender, reason = "embedding", "no competing candidate group"
+        elif margin >= policy.skip_llm_margin:
+            recommender, reason = "embedding", "local margin is large"
+        elif margin < policy.escalate_margin:
+            recommender, reason = "llm", "embedding candidates are ambiguous"
+        else:
+            # Inside the band, embedding accuracy shrinks as the margin narrows
+            band = policy.skip_llm_margin - policy.escalate_margin
+            confidence = (margin - policy.escalate_margin) / band if band > 0 else 1.0
+            mistake_price = policy.mistake_cost * (1 + mistakes)
+            accuracy = {
+                "embedding": self.stats.accuracy("embedding")
+                * (1 - policy.ambiguity_penalty * (1 - confidence)),
+                "llm": self.stats.accuracy("llm"),
+            }
+            for name, name_accuracy in accuracy.items():
+                costs[name] = round(
+                    self.stats.latency(name) + (1 - name_accuracy) * mistake_price, 3
+                )
+            recommender = min(costs, key=costs.get)
+            reason = "lowest expected cost"
+
+        decision = {
+            "recommender": recommender,
+            "reason": reason,
+            "signals": signals,
+            "expected_costs": costs,
+        }
+        logger.info(f"Routing decision: {decision}")
+        return decision
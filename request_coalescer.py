@@ -0,0 +1,73 @@
+"""
+Request Coalescing for Connection Puzzle Solver
+
+This module shares one computation between concurrent requests for the same
+state. Results are keyed by a session id and the version of the session's state:
+a request arriving while a computation for that version is in flight awaits the
+same future, and a request arriving after it finished gets the finished result
+at once. A newer version replaces the entry, so a result is reused only until
+the state changes.
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class RequestCoalescer:
+    """In-flight and finished results, one per key, tagged with a state version."""
+
+    def __init__(self, name: str = "request"):
+        self.name = name
+        # key -> (state version, task computing the result)
+        self._entries: Dict[str, Tuple[int, "asyncio.Task[Any]"]] = {}
+        self.computed = 0
+        self.joined = 0
+        self.reused = 0
+
+    async def run(self, key: str, version: int, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Return the result for a key and state version, computing it at most once.
+
+        The computation runs as its own task, so a caller that is cancelled (e.g. a
+        client that disconnected) does not cancel it for the other callers. A failed
+        computation is not kept; every caller waiting on it gets the exception.
+        """
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            task = entry[1]
+            if task.done():
+                self.reused += 1
+                logger.info(f"Reusing {self.name} result for {key} at version {version}")
+            else:
+                self.joined += 1
+                logger.info(f"Joining in-flight {self.name} for {key} at version {version}")
+            return await asyncio.shield(task)
+
+        task = asyncio.ensure_future(compute())
+        self._entries[key] = (version, task)
+        self.computed += 1
+        task.add_done_callback(lambda done: self._drop_failed(key, done))
+        return await asyncio.shield(task)
+
+    def _drop_failed(self, key: str, task: "asyncio.Task[Any]") -> None:
+        if task.cancelled() or task.exception() is not None:
+            if self._entries.get(key, (None, None))[1] is task:
+                del self._entries[key]
+
+    def advance(self, key: str, version: int, new_version: int) -> None:
+        """
+        Keep the result of a version valid at a newer one.
+
+        For state changes made by the computation itself, which do not make its
+        result stale.
+        """
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            self._entries[key] = (new_version, entry[1])
+
+    def invalidate(self, key: str) -> None:
+        """Forget the result of a key, so the next request computes it again."""
+        self._entries.pop(key, None)
@@ -0,0 +1,91 @@
+"""
+Session Store for Connection Puzzle Solver
+
+This module keeps the web UI puzzle state of each session as a copy-on-write
+snapshot guarded by a per-session asyncio lock. Readers take the current snapshot
+without locking; writers mutate a private copy under the lock and publish it
+atomically, so a slow write never blocks a read and readers never see a
+half-applied update. States are compact PuzzleRecords, so the private copy is a
+shallow copy of a few slots.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, Sequence
+
+from puzzle_record import PuzzleRecord
+
+DEFAULT_SESSION_ID = "default"
+
+
+def new_puzzle_state(
+    session_id: str = DEFAULT_SESSION_ID, words: Sequence[str] = ()
+) -> PuzzleRecord:
+    """Return the initial web UI puzzle state of a session."""
+    return PuzzleRecord(session_id, words)
+
+
+class PuzzleSession:
+    """
+    Puzzle state of one session.
+
+    The published snapshot is never mutated in place; every update works on a copy
+    and replaces the snapshot when it completes. The version increases with every
+    published update that changed the state.
+    """
+
+    def __init__(self, session_id: str, state: PuzzleRecord):
+        self.session_id = session_id
+        self.lock = asyncio.Lock()
+        self.version = 0
+        self._snapshot = state
+
+    @property
+    def snapshot(self) -> PuzzleRecord:
+        """Return the current state; callers must treat it as read-only."""
+        return self._snapshot
+
+    @asynccontextmanager
+    async def update(self) -> AsyncIterator[PuzzleRecord]:
+        """
+        Yield a private copy of the state and publish it when the block exits.
+
+        Updates of the same session are serialized by the session lock; if the block
+        raises, the copy is discarded and the snapshot is left unchanged. A block
+        that changes nothing publishes nothing.
+        """
+        async with self.lock:
+            draft = self._snapshot.copy()
+            yield draft
+            if self._snapshot.diff(draft):
+                self._snapshot = draft
+                self.version += 1
+
+    async def replace(self, state: PuzzleRecord) -> None:
+        """Publish a new state, e.g. a freshly loaded puzzle."""
+        async with self.lock:
+            self._snapshot = state
+            self.version += 1
+
+
+class SessionStore:
+    """Registry of puzzle sessions, created on first use."""
+
+    def __init__(self, state_factory: Callable[[str], PuzzleRecord] = new_puzzle_state):
+        self._state_factory = state_factory
+        self._sessions: Dict[str, PuzzleSession] = {}
+
+    def get(self, session_id: str = DEFAULT_SESSION_ID) -> PuzzleSession:
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = PuzzleSession(session_id, self._state_factory(session_id))
+            self._sessions[session_id] = session
+        return session
+
+    def exists(self, session_id: str) -> bool:
+        """Check whether a state has been published for a session."""
+        session = self._sessions.get(session_id)
+        return session is not None and session.version > 0
+
+    def snapshot(self, session_id: str = DEFAULT_SESSION_ID) -> PuzzleRecord:
+        return self.get(session_id).snapshot
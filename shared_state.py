@@ -0,0 +1,275 @@
+"""
+Shared Session State for Multi-Worker Deployments
+
+This module lets several ASGI worker processes serve the same sessions. Session
+records live in a SQLite database in a shared directory (ideally on tmpfs, e.g.
+/dev/shm), and the codes of each puzzle's quantized embedding matrix are a .npy
+file in the same directory that every worker memory-maps read-only, so all workers
+read the same page-cache buffers instead of holding private copies. A matrix file
+is named after the record version that wrote it and never changes afterwards; the
+record names its file, and the file it replaces is deleted once the new record is
+published.
+
+Updates are serialized across processes with a per-session file lock: a writer
+takes the lock, reloads the latest record, applies its change and publishes it
+with the next version number. Any worker can therefore serve any request. The
+lock file is removed by the writer that releases it.
+"""
+
+import asyncio
+import fcntl
+import hashlib
+import logging
+import os
+import sqlite3
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from embedding_codec import QuantizedEmbeddings
+from puzzle_record import PuzzleRecord
+from session_store import DEFAULT_SESSION_ID, new_puzzle_state
+
+logger = logging.getLogger(__name__)
+
+# Seconds between attempts to take a session's file lock
+LOCK_POLL_INTERVAL = 0.005
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    record BLOB NOT NULL,
+    embeddings_version INTEGER
+);
+"""
+
+
+def _file_key(session_id: str) -> str:
+    return hashlib.sha1(session_id.encode("utf-8")).hexdigest()
+
+
+class SharedEmbeddingStore:
+    """
+    Per-session embedding code matrices stored as memory-mapped .npy files.
+
+    Each matrix is written once to a file named after the session and the record
+    version that wrote it, so a mapped file is never rewritten under its readers.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        # session id -> (version of the file, read-only mapping)
+        self._mapped: Dict[str, Tuple[int, np.ndarray]] = {}
+
+    def _path(self, session_id: str, version: int) -> str:
+        return os.path.join(self.directory, f"{_file_key(session_id)}.{version}.npy")
+
+    def save(self, session_id: str, version: int, matrix: np.ndarray) -> None:
+        """Write a matrix; it is read only once a record naming its version is published."""
+        with open(self._path(session_id, version), "wb") as file:
+            np.save(file, np.ascontiguousarray(matrix))
+
+    def load(self, session_id: str, version: int) -> Optional[np.ndarray]:
+        """Return a read-only mapping of a session's matrix, or None if the file is gone."""
+        cached = self._mapped.get(session_id)
+        if cached is None or cached[0] != version:
+            try:
+                cached = (version, np.load(self._path(session_id, version), mmap_mode="r"))
+            except FileNotFoundError:
+                return None
+            self._mapped[session_id] = cached
+        return cached[1]
+
+    def delete(self, session_id: str, version: int) -> None:
+        """Remove a matrix file; workers that mapped it keep their mapping."""
+        cached = self._mapped.get(session_id)
+        if cached is not None and cached[0] == version:
+            del self._mapped[session_id]
+        try:
+            os.remove(self._path(session_id, version))
+        except FileNotFoundError:
+            pass
+
+
+class SharedPuzzleSession:
+    """
+    Puzzle state of one session, shared by every worker process.
+
+    Offers the same interface as session_store.PuzzleSession: a snapshot that is
+    reloaded only when another worker published a newer version, and an update()
+    block that publishes a changed copy.
+    """
+
+    def __init__(self, session_id: str, store: "SharedSessionStore"):
+        self.session_id = session_id
+        self.store = store
+        self.lock = asyncio.Lock()
+        self._cached: Tuple[int, Optional[PuzzleRecord]] = (-1, None)
+        self._lock_path = os.path.join(store.directory, f"{_file_key(session_id)}.lock")
+
+    def _row(self) -> Optional[Tuple[int, bytes, Optional[int]]]:
+        return self.store._conn.execute(
+            "SELECT version, record, embeddings_version FROM sessions WHERE session_id = ?",
+            (self.session_id,),
+        ).fetchone()
+
+    @property
+    def version(self) -> int:
+        row = self.store._conn.execute(
+            "SELECT version FROM sessions WHERE session_id = ?", (self.session_id,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    @property
+    def snapshot(self) -> PuzzleRecord:
+        """Return the latest published state; callers must treat it as read-only."""
+        row = self._row()
+        if row is None:
+            if self._cached[0] != 0 or self._cached[1] is None:
+                self._cached = (0, self.store.state_factory(self.session_id))
+            return self._cached[1]
+        if self._cached[0] == row[0] and self._cached[1] is not None:
+            return self._cached[1]
+        codes = None
+        while row[2] is not None:
+            codes = self.store.embeddings.load(self.session_id, row[2])
+            if codes is not None:
+                break
+            # A writer replaced the matrix after the row was read: read the new row
+            latest = self._row()
+            if latest[2] == row[2]:
+                raise FileNotFoundError(f"Embedding matrix of session {self.session_id} is missing")
+            row = latest
+        record = PuzzleRecord.from_bytes(row[1], codes)
+        self._cached = (row[0], record)
+        return record
+
+    @asynccontextmanager
+    async def _process_lock(self) -> AsyncIterator[None]:
+        """
+        Hold the session's file lock, polling so the event loop is never blocked.
+
+        The holder removes the lock file when it is done. A waiter that then gets the
+        lock on the removed file notices that the path no longer leads to it and
+        locks the current file instead.
+        """
+        while True:
+            lock_file = open(self._lock_path, "a")
+            try:
+                while True:
+                    try:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        break
+                    except BlockingIOError:
+                        await asyncio.sleep(LOCK_POLL_INTERVAL)
+                try:
+                    current = os.stat(self._lock_path).st_ino
+                except FileNotFoundError:
+                    current = None
+                if current == os.fstat(lock_file.fileno()).st_ino:
+                    try:
+                        yield
+                    finally:
+                        os.remove(self._lock_path)
+                    return
+            finally:
+                lock_file.close()
+
+    def _publish(self, record: PuzzleRecord, version: int, embeddings_changed: bool) -> None:
+        row = self._row()
+        previous = row[2] if row else None
+        embeddings_version = previous
+        if embeddings_changed:
+            embeddings_version = None
+            if record.embeddings is not None:
+                embeddings = record.embeddings
+                embeddings_version = version
+                self.store.embeddings.save(self.session_id, version, embeddings.codes)
+                record.embeddings = QuantizedEmbeddings(
+                    embeddings.words,
+                    self.store.embeddings.load(self.session_id, version),
+                    embeddings.scales,
+                )
+        with self.store._conn:
+            self.store._conn.execute(
+                "INSERT INTO sessions (session_id, version, record, embeddings_version) "
+                "VALUES (?, ?, ?, ?) ON CONFLICT(session_id) DO UPDATE SET "
+                "version = excluded.version, record = excluded.record, "
+                "embeddings_version = excluded.embeddings_version",
+                (
+                    self.session_id,
+                    version,
+                    record.to_bytes(include_embeddings=False),
+                    embeddings_version,
+                ),
+            )
+        if previous is not None and previous != embeddings_version:
+            self.store.embeddings.delete(self.session_id, previous)
+        self._cached = (version, record)
+
+    @asynccontextmanager
+    async def update(self) -> AsyncIterator[PuzzleRecord]:
+        """
+        Yield a private copy of the latest state and publish it when the block exits.
+
+        Updates of the same session are serialized across workers by the file lock;
+        if the block raises or changes nothing, nothing is published.
+        """
+        async with self.lock, self._process_lock():
+            current = self.snapshot
+            version = self.version
+            draft = current.copy()
+            yield draft
+            changes = current.diff(draft)
+            if changes:
+                self._publish(draft, version + 1, "embeddings" in changes)
+
+    async def replace(self, state: PuzzleRecord) -> None:
+        """Publish a new state, e.g. a freshly loaded puzzle."""
+        async with self.lock, self._process_lock():
+            self._publish(state, self.version + 1, True)
+
+
+class SharedSessionStore:
+    """Registry of puzzle sessions stored in a directory shared by all workers."""
+
+    def __init__(
+        self, directory: str, state_factory: Callable[[str], PuzzleRecord] = new_puzzle_state
+    ):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.state_factory = state_factory
+        self.embeddings = SharedEmbeddingStore(os.path.join(directory, "embeddings"))
+        self._conn = sqlite3.connect(
+            os.path.join(directory, "sessions.sqlite"), check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(sessions)")]
+        if columns and "embeddings_version" not in columns:
+            # Records of the old layout point at unversioned matrix files
+            logger.info("Dropping shared sessions stored in the old layout")
+            self._conn.execute("DROP TABLE sessions")
+        self._conn.executescript(_SCHEMA)
+        self._sessions: Dict[str, SharedPuzzleSession] = {}
+        logger.info(f"Sharing session state through {directory}")
+
+    def get(self, session_id: str = DEFAULT_SESSION_ID) -> SharedPuzzleSession:
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = SharedPuzzleSession(session_id, self)
+            self._sessions[session_id] = session
+        return session
+
+    def exists(self, session_id: str) -> bool:
+        """Check whether a state has been published for a session."""
+        row = self._conn.execute(
+            "SELECT 1 FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        return row is not None
+
+    def snapshot(self, session_id: str = DEFAULT_SESSION_ID) -> PuzzleRecord:
+        return self.get(session_id).snapshot
@@ -0,0 +1,70 @@
+"""
+Startup Profile for Connection Puzzle Solver
+
+This script reports where worker start-up time goes. It imports the given modules
+in a fresh interpreter with "python -X importtime" and prints the total import time
+together with a breakdown by top-level package.
+
+Usage:
+    python startup_profile.py [module ...] [--top N]
+
+With no module, the web application ("app") is profiled; e.g.
+"app langchain_openai" compares the cold start with the cost of the LLM stack
+that is now loaded on first use.
+"""
+
+import argparse
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+
+def profile_imports(module: str) -> Tuple[float, Dict[str, float]]:
+    """
+    Import a module in a fresh interpreter and measure the import time.
+
+    Returns the total time in seconds and the self time of each top-level package.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    packages: Dict[str, float] = defaultdict(float)
+    total_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        packages[name.strip().split(".")[0]] += int(self_us) / 1e6
+        # Top-level entries are not indented; their cumulative times add up to the total
+        if not name[1:].startswith(" "):
+            total_us += int(cumulative_us)
+    return total_us / 1e6, dict(packages)
+
+
+def format_report(module: str, total: float, packages: Dict[str, float], top: int) -> List[str]:
+    """Format the import-time breakdown of one module as report lines."""
+    lines = [f"{module}: {total * 1000:.1f} ms total import time"]
+    for package, seconds in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]:
+        lines.append(f"  {package:<30} {seconds * 1000:8.1f} ms  {seconds / total:6.1%}")
+    return lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Report import-time breakdown of worker start-up")
+    parser.add_argument("modules", nargs="*", default=["app"], help="modules to import")
+    parser.add_argument("--top", type=int, default=15, help="number of packages to list")
+    args = parser.parse_args()
+
+    for module in args.modules:
+        total, packages = profile_imports(module)
+        print("\n".join(format_report(module, total, packages, args.top)))
+        print()
+
+
+if __name__ == "__main__":
+    main()
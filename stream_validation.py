@@ -0,0 +1,131 @@
+"""
+Streaming Validation for Connection Puzzle Solver
+
+This module checks an LLM answer while it is being generated. The "words" array
+of the JSON answer is parsed incrementally from the token stream, and every word
+is validated as soon as its closing quote arrives. An unknown word, a duplicate or
+a partial group that no feasible group extends aborts the stream at once, so the
+tail latency and tokens of an answer that was going to fail are never spent.
+"""
+
+import json
+import logging
+import re
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional
+
+if TYPE_CHECKING:
+    from constraint_engine import ConstraintEngine
+
+logger = logging.getLogger(__name__)
+
+_WORDS_KEY = re.compile(r'"words"\s*:\s*\[')
+
+
+class EarlyRejection(Exception):
+    """Raised when a streamed answer is found invalid before it is complete."""
+
+    def __init__(self, reason: str, words: List[str], characters: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.words = words
+        self.characters = characters
+
+
+class IncrementalWordsParser:
+    """Extract the strings of the "words" array from JSON text arriving in chunks."""
+
+    def __init__(self):
+        self.text = ""
+        self.words: List[str] = []
+        self.complete = False
+        self._position: Optional[int] = None
+        self._string_start: Optional[int] = None
+        self._escaped = False
+
+    def feed(self, chunk: str) -> List[str]:
+        """Add a chunk of text and return the words completed by it."""
+        self.text += chunk
+        new_words: List[str] = []
+
+        if self._position is None:
+            match = _WORDS_KEY.search(self.text)
+            if match is None:
+                return new_words
+            self._position = match.end()
+
+        while not self.complete and self._position < len(self.text):
+            char = self.text[self._position]
+            if self._string_start is not None:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    start, end = self._string_start, self._position + 1
+                    word = json.loads(self.text[start:end])
+                    self.words.append(word)
+                    new_words.append(word)
+                    self._string_start = None
+            elif char == '"':
+                self._string_start = self._position
+            elif char == "]":
+                self.complete = True
+            self._position += 1
+
+        return new_words
+
+
+class StreamValidator:
+    """Validate the words of a recommended group one at a time."""
+
+    def __init__(
+        self,
+        remaining_words: Iterable[str],
+        invalid_groups: List[Dict[str, Any]],
+        constraints: Optional["ConstraintEngine"] = None,
+    ):
+        self.remaining = set(remaining_words)
+        self.rejected = {frozenset(group.get("words", [])) for group in invalid_groups}
+        self.constraints = (
+            constraints if constraints is not None and not constraints.contradictory else None
+        )
+        self.words: List[str] = []
+
+    def check(self, word: str) -> Optional[str]:
+        """Add a word and return why the answer is already invalid, or None."""
+        if word not in self.remaining:
+            return f'"{word}" is not one of the remaining words'
+        if word in self.words:
+            return f'"{word}" appears twice'
+        self.words.append(word)
+        if len(self.words) > 4:
+            return "the group has more than 4 words"
+        if len(self.words) == 4 and frozenset(self.words) in self.rejected:
+            return f"{', '.join(self.words)} was already rejected"
+        if self.constraints is not None:
+            mask = self.constraints.mask(self.words)
+            if not any(group & mask == mask for group in self.constraints.groups):
+                words = ", ".join(self.words)
+                return f"no group containing {words} is consistent with earlier feedback"
+        return None
+
+
+async def stream_validated(llm: Any, messages: List[Any], validator: StreamValidator) -> str:
+    """
+    Stream a completion, validating its words as they arrive.
+
+    Returns the full text of an answer whose words all passed validation. Raises
+    EarlyRejection as soon as a word fails; leaving the stream closes the request.
+    """
+    parser = IncrementalWordsParser()
+    stream = llm.astream(messages)
+    try:
+        async for chunk in stream:
+            for word in parser.feed(chunk.content if isinstance(chunk.content, str) else ""):
+                reason = validator.check(word)
+                if reason is not None:
+                    logger.info(f"Aborted LLM answer after {len(parser.text)} characters: {reason}")
+                    raise EarlyRejection(reason, list(validator.words), len(parser.text))
+    finally:
+        await stream.aclose()
+    return parser.text
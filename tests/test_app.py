@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+import app
+from session_store import new_puzzle_state
+
+
+def test_parse_batch(tmp_path):
+    puzzle_file = tmp_path / "monday.txt"
+    puzzle_file.write_text("Bass, Pike ,carp,sole")
+    data = {
+        "puzzle_files": [str(puzzle_file)],
+        "puzzles": [["Red", " blue"], {"session_id": "mine", "words": ["a", "b"]}],
+    }
+    assert app._parse_batch(data) == [
+        ("monday", ["bass", "pike", "carp", "sole"], False),
+        ("batch-1", ["red", "blue"], False),
+        ("mine", ["a", "b"], True),
+    ]
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        {"puzzles": "red, blue"},
+        {"puzzle_files": [1]},
+        {"puzzles": [["red", 2]]},
+        {"puzzles": [{"session_id": 3, "words": ["red"]}]},
+    ],
+)
+def test_parse_batch_rejects_malformed_bodies(data):
+    with pytest.raises(ValueError):
+        app._parse_batch(data)
+
+
+def test_setup_batch_errors(tmp_path):
+    taken = tmp_path / "taken.txt"
+    taken.write_text("a,b,c,d")
+
+    async def post(body):
+        response = await app.app.test_client().post("/setup_batch", json=body)
+        return response.status_code, (await response.get_json())["error"]
+
+    async def run():
+        await app.sessions.get("taken").replace(new_puzzle_state("taken", ["a", "b", "c", "d"]))
+        assert (await post(["a", "b"]))[0] == 400
+        assert (await post({"puzzles": [{"words": ["a"], "session_id": "x"}] * 2})) == (
+            400,
+            "Duplicate session ids: x",
+        )
+        status, error = await post({"puzzle_files": [str(tmp_path / "missing.txt")]})
+        assert status == 404 and "missing.txt" in error
+        status, error = await post({"puzzle_files": [str(taken)]})
+        assert status == 409 and "taken" in error
+
+    asyncio.run(run())
@@ -0,0 +1,50 @@
+import numpy as np
+
+from candidate_index import CandidateIndex, group_id_for
+
+# Two tight clusters of four words each
+WORDS = ["bass", "pike", "carp", "sole", "red", "blue", "green", "pink"]
+
+
+def make_index() -> CandidateIndex:
+    vectors = {}
+    for i, word in enumerate(WORDS):
+        vector = np.zeros(8, dtype=np.float32)
+        vector[0 if i < 4 else 1] = 1.0
+        vector[2 + i % 4] = 0.1
+        vectors[word] = vector
+    return CandidateIndex.from_embeddings(WORDS, vectors)
+
+
+def candidate_words(index: CandidateIndex) -> set:
+    return {word for group in index.ranked_groups() for word in group["words"]}
+
+
+def test_groups_come_from_clusters():
+    groups = make_index().ranked_groups()
+    assert {frozenset(group["words"]) for group in groups} == {
+        frozenset(WORDS[:4]),
+        frozenset(WORDS[4:]),
+    }
+
+
+def test_sync_removes_solved_words():
+    index = make_index()
+    assert index.sync(WORDS[4:], [])
+    assert candidate_words(index) == set(WORDS[4:])
+
+
+def test_sync_skips_invalid_groups():
+    index = make_index()
+    assert index.sync(WORDS, [{"words": WORDS[:4]}])
+    assert group_id_for(WORDS[:4]) not in {group["id"] for group in index.ranked_groups()}
+
+
+def test_sync_rejects_unknown_words():
+    assert not make_index().sync(WORDS[:7] + ["trout"], [])
+
+
+def test_sync_rejects_removed_words():
+    index = make_index()
+    index.remove_words(WORDS[:4])
+    assert not index.sync(WORDS, [])
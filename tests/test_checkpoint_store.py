@@ -0,0 +1,96 @@
+import sqlite3
+import time
+
+from checkpoint_store import SQLiteCheckpointSaver
+from embedding_codec import QuantizedEmbeddings
+
+VECTORS = {"bass": [1.0, 0.0, 0.0], "pike": [0.8, 0.6, 0.0], "red": [0.0, 0.0, 1.0]}
+
+
+def matrix_rows(path: str) -> int:
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM embedding_matrices").fetchone()[0]
+
+
+def test_embeddings_round_trip(tmp_path):
+    store = SQLiteCheckpointSaver(str(tmp_path / "checkpoints.sqlite"))
+    embeddings = QuantizedEmbeddings.encode(VECTORS, "int8")
+    store.save_embeddings("session", embeddings)
+    assert store.load_embeddings("session") == embeddings
+    assert list(store.load_embeddings("session", ["red", "bass", "trout"])) == ["red", "bass"]
+    assert len(store.load_embeddings("other")) == 0
+
+
+def test_unchanged_embeddings_are_queued_once(tmp_path):
+    store = SQLiteCheckpointSaver(str(tmp_path / "checkpoints.sqlite"), batch_size=100)
+    store.save_embeddings("session", QuantizedEmbeddings.encode(VECTORS, "float16"))
+    store.save_embeddings("session", QuantizedEmbeddings.encode(VECTORS, "float16"))
+    assert len(store._pending) == 1
+    store.save_embeddings("session", QuantizedEmbeddings.encode(VECTORS, "int8"))
+    assert len(store._pending) == 2
+
+
+def test_delete_thread_drops_embeddings(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite")
+    store = SQLiteCheckpointSaver(path)
+    store.save_embeddings("session", QuantizedEmbeddings.encode(VECTORS, "float16"))
+    store.flush()
+    store.delete_thread("session")
+    assert matrix_rows(path) == 0
+
+
+def test_compact_drops_idle_threads(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite")
+    store = SQLiteCheckpointSaver(path)
+    store.save_embeddings("session", QuantizedEmbeddings.encode(VECTORS, "float16"))
+    store.flush()
+    with store._conn:
+        store._conn.execute(
+            "INSERT INTO checkpoints VALUES ('session', '', '1', NULL, 'msgpack', x'', "
+            "'msgpack', x'', ?)",
+            (time.time() - 30 * 24 * 3600,),
+        )
+    store.compact()
+    assert matrix_rows(path) == 0
+
+
+def test_compact_drops_embeddings_of_sessions_without_threads(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite")
+    store = SQLiteCheckpointSaver(path)
+    old = time.time() - 30 * 24 * 3600
+    for session in ("idle", "live", "fresh"):
+        store.save_embeddings(session, QuantizedEmbeddings.encode(VECTORS, "float16"))
+    store.flush()
+    with store._conn:
+        store._conn.execute("UPDATE embedding_matrices SET saved_at = ?", (old,))
+        store._conn.execute(
+            "UPDATE embedding_matrices SET saved_at = ? WHERE thread_id = 'fresh'", (time.time(),)
+        )
+        store._conn.execute(
+            "INSERT INTO checkpoints VALUES ('live:webui', '', '1', NULL, 'msgpack', x'', "
+            "'msgpack', x'', ?)",
+            (time.time(),),
+        )
+    store.compact()
+    with sqlite3.connect(path) as conn:
+        rows = conn.execute("SELECT thread_id FROM embedding_matrices ORDER BY thread_id")
+        assert [row[0] for row in rows] == ["fresh", "live"]
+
+
+def test_flush_compacts_in_the_background(tmp_path):
+    store = SQLiteCheckpointSaver(str(tmp_path / "checkpoints.sqlite"))
+    store.save_embeddings("session", QuantizedEmbeddings.encode(VECTORS, "float16"))
+    store.flush()
+    assert store._compaction is not None
+    assert store._compaction.name == "checkpoint-compaction"
+    store.close()
+    assert not store._compaction.is_alive()
+
+
+def test_old_schema_gains_the_saved_at_column(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE embedding_matrices (thread_id TEXT PRIMARY KEY, matrix BLOB)")
+    store = SQLiteCheckpointSaver(path)
+    store.save_embeddings("session", QuantizedEmbeddings.encode(VECTORS, "float16"))
+    assert len(store.load_embeddings("session")) == 3
@@ -0,0 +1,92 @@
+from constraint_engine import ConstraintEngine, popcount
+
+WORDS = [f"{letter}{i}" for letter in "abcd" for i in range(1, 5)]
+
+
+def test_popcount():
+    assert popcount(0) == 0
+    assert popcount(0b1011) == 3
+
+
+def test_without_feedback_every_group_is_feasible():
+    engine = ConstraintEngine(WORDS, [], [])
+    assert len(engine.groups) == 1820
+    assert not engine.contradictory
+
+
+def test_not_correct_allows_at_most_two_shared_words():
+    invalid_groups = [{"words": ["a1", "a2", "b1", "b2"], "error_type": "not-correct"}]
+    engine = ConstraintEngine(WORDS, [], invalid_groups)
+    assert not engine.is_feasible(["a1", "a2", "b1", "b2"])
+    assert not engine.is_feasible(["a1", "a2", "b1", "c1"])
+    assert engine.is_feasible(["a1", "a2", "a3", "a4"])
+
+
+def test_is_feasible_needs_four_remaining_words():
+    engine = ConstraintEngine(WORDS, [], [])
+    assert not engine.is_feasible(["a1", "a2", "a3"])
+    assert not engine.is_feasible(["a1", "a2", "a3", "z9"])
+
+
+def test_one_away_groups():
+    invalid_groups = [{"words": ["a1", "a2", "a3", "b3"], "error_type": "one-away"}]
+    engine = ConstraintEngine(WORDS, [], invalid_groups)
+    assert not engine.is_feasible(["a1", "a2", "a3", "b3"])
+    sharing = engine.groups_sharing(["a1", "a2", "a3", "b3"], 3)
+    assert ["a1", "a2", "a3", "a4"] in sharing
+    assert all(len(set(group) & {"a1", "a2", "a3", "b3"}) == 3 for group in sharing)
+
+
+def test_one_away_with_three_remaining_words_keeps_them_together():
+    invalid_groups = [{"words": ["a1", "a2", "b1", "c4"], "error_type": "one-away"}]
+    engine = ConstraintEngine(WORDS[:8], [WORDS[8:12]], invalid_groups)
+    assert len(engine.groups) == 10
+    assert engine.must_share() == [("a1", "a2"), ("a1", "b1"), ("a2", "b1")]
+    assert "- a1 and a2 must be in the same group" in engine.describe()
+
+
+def test_propagation_drops_groups_that_cannot_complete_a_split():
+    # a1, a2, b1 must share a group, so a3 and a4 can only go together with b words
+    invalid_groups = [{"words": ["a1", "a2", "b1", "c4"], "error_type": "one-away"}]
+    engine = ConstraintEngine(WORDS[:8], [WORDS[8:12]], invalid_groups)
+    assert not engine.is_feasible(["a3", "a4", "b1", "b2"])
+    assert engine.is_feasible(["a3", "a4", "b2", "b3"])
+
+
+def test_partitions_satisfy_one_away_feedback():
+    invalid_groups = [
+        {"words": ["a1", "a2", "a3", "b1"], "error_type": "one-away"},
+        {"words": ["a1", "a2", "a4", "b1"], "error_type": "not-correct"},
+    ]
+    engine = ConstraintEngine(WORDS[:8], [], invalid_groups)
+    partitions = list(engine.partitions())
+    assert partitions
+    for partition in partitions:
+        groups = [set(engine.unmask(group)) for group in partition]
+        assert any(len(group & {"a1", "a2", "a3", "b1"}) == 3 for group in groups)
+
+
+def test_contradictory_feedback():
+    invalid_groups = [{"words": WORDS[:4], "error_type": "not-correct"}]
+    engine = ConstraintEngine(WORDS[:4], [], invalid_groups)
+    assert engine.contradictory
+    assert engine.groups == []
+
+
+def test_describe_lists_few_remaining_groups():
+    invalid_groups = [{"words": ["a1", "a2", "b1", "b2"], "error_type": "not-correct"}]
+    description = ConstraintEngine(WORDS[:8], [], invalid_groups).describe(max_groups=100)
+    assert "- At most 2 of a1, a2, b1, b2 belong to the same group" in description
+    assert "- The group must be one of:" in description
+
+
+def test_one_away_rules_out_groups_sharing_two_words():
+    words = WORDS[:12]
+    invalid_groups = [{"words": ["a1", "a2", "a3", "b1"], "error_type": "one-away"}]
+    engine = ConstraintEngine(words, [], invalid_groups)
+    assert not engine.is_feasible(["a1", "a2", "c1", "c2"])
+    assert not engine.is_feasible(["a3", "b1", "c1", "c2"])
+    assert engine.is_feasible(["a1", "a2", "a3", "c1"])
+    assert engine.is_feasible(["a1", "c1", "c2", "c3"])
+    guess = engine.mask(["a1", "a2", "a3", "b1"])
+    assert all(popcount(group & guess) != 2 for group in engine.groups)
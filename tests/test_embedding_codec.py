@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from embedding_codec import QuantizedEmbeddings
+
+# Largest absolute error of a cosine similarity computed on the codes
+SIMILARITY_TOLERANCE = {"float16": 1e-3, "int8": 2e-2}
+
+
+def random_embeddings(count=20, dimensions=64, seed=0):
+    rng = np.random.default_rng(seed)
+    return {f"w{i}": rng.normal(size=dimensions) for i in range(count)}
+
+
+def unit_rows(embeddings, words):
+    vectors = np.asarray([embeddings[word] for word in words], dtype=np.float64)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.mark.parametrize("storage", ["float16", "int8"])
+def test_round_trip_and_similarity_error(storage):
+    embeddings = random_embeddings()
+    quantized = QuantizedEmbeddings.encode(embeddings, storage)
+    assert quantized.storage == storage
+    assert list(quantized) == list(embeddings)
+
+    exact = unit_rows(embeddings, quantized.words)
+    decoded = np.asarray([quantized[word] for word in quantized.words])
+    assert np.abs(decoded - exact).max() < SIMILARITY_TOLERANCE[storage]
+
+    error = np.abs(quantized.similarity() - exact @ exact.T).max()
+    assert error < SIMILARITY_TOLERANCE[storage]
+
+    restored = QuantizedEmbeddings.from_bytes(quantized.to_bytes())
+    assert restored == quantized
+
+
+def test_truncation_and_empty_vectors():
+    embeddings = random_embeddings(count=4)
+    embeddings["empty"] = []
+    quantized = QuantizedEmbeddings.encode(embeddings, "int8", dimensions=16)
+    assert quantized.dimensions == 16
+    assert "empty" not in quantized
+    assert np.linalg.norm(quantized["w0"]) == pytest.approx(1.0, abs=1e-2)
+
+    subset = quantized.subset(["w2", "w0", "missing"])
+    assert subset.words == ("w2", "w0")
+    assert np.allclose(subset.similarity(), quantized.similarity(["w2", "w0"]))
+
+    with pytest.raises(ValueError):
+        QuantizedEmbeddings.encode(embeddings, "bfloat16")
@@ -0,0 +1,38 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from embedding_sources import EmbeddingEnsemble, parse_ensemble_spec
+
+ANAGRAMS = ["listen", "silent", "enlist", "tinsel"]
+PREFIXES = ["undo", "unfit", "untie", "unzip"]
+
+
+def test_similarity_combines_normalized_weights():
+    ensemble = EmbeddingEnsemble(parse_ensemble_spec("anagram=3,affixes=1"))
+    words = ANAGRAMS[:2] + PREFIXES[:2]
+    asyncio.run(ensemble.prepare(words))
+
+    combined = ensemble.similarity(words)
+    expected = 0.75 * ensemble.source_similarity("anagram", words)
+    expected += 0.25 * ensemble.source_similarity("affixes", words)
+    assert np.allclose(combined, expected)
+    assert combined[0, 1] == pytest.approx(0.75)
+
+    assert not ensemble.similarity(words, {"anagram": 0}).any()
+
+
+def test_weights_summing_to_zero_raise():
+    ensemble = EmbeddingEnsemble({"anagram": 1.0, "affixes": -1.0})
+    asyncio.run(ensemble.prepare(ANAGRAMS))
+    with pytest.raises(ValueError, match="sum"):
+        ensemble.similarity(ANAGRAMS)
+
+
+def test_fit_weights_favours_the_separating_source():
+    ensemble = EmbeddingEnsemble({"anagram": 1.0, "char_ngrams": 1.0})
+    weights = asyncio.run(ensemble.fit_weights([[ANAGRAMS, PREFIXES]]))
+    assert sum(weights.values()) == pytest.approx(1.0)
+    assert weights["anagram"] > weights["char_ngrams"]
+    assert ensemble.weights == weights
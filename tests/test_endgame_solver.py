@@ -0,0 +1,62 @@
+from endgame_solver import group_cohesion, solve_endgame
+
+WORDS = ["a1", "a2", "a3", "a4", "b1", "b2", "b3", "b4"]
+
+
+def same_letter(a: str, b: str) -> float:
+    return 1.0 if a[0] == b[0] else 0.0
+
+
+def test_group_cohesion():
+    assert group_cohesion(["a1", "a2", "a3", "a4"], same_letter) == 1.0
+    assert group_cohesion(["a1", "a2", "b1", "b2"], same_letter) == 2 / 6
+
+
+def test_last_group_is_forced():
+    result = solve_endgame(WORDS[:4], [WORDS[4:]], [])
+    assert result["group"] == WORDS[:4]
+    assert result["partitions"] == 1
+    assert result["forced"]
+
+
+def test_ranks_splits_by_cohesion():
+    result = solve_endgame(WORDS, [], [], same_letter)
+    assert result["partitions"] == 35
+    assert sorted(result["group"]) in (WORDS[:4], WORDS[4:])
+    assert not result["forced"]
+
+
+def test_feedback_limits_the_splits():
+    invalid_groups = [
+        {"words": ["a1", "a2", "a3", "b1"], "error_type": "one-away"},
+        {"words": ["a1", "a2", "a3", "b2"], "error_type": "one-away"},
+        {"words": ["a1", "a2", "a3", "b3"], "error_type": "one-away"},
+        {"words": ["a1", "a2", "a4", "b1"], "error_type": "not-correct"},
+    ]
+    result = solve_endgame(WORDS, [], invalid_groups)
+    assert result["partitions"] == 1
+    assert sorted(result["group"]) in (["a1", "a2", "a3", "b4"], ["a4", "b1", "b2", "b3"])
+    assert result["forced"]
+
+
+def test_without_similarity_only_a_forced_group_is_recommended():
+    assert solve_endgame(WORDS, [], []) is None
+
+    words = WORDS + ["c1", "c2", "c3", "c4"]
+    invalid_groups = [
+        {"words": ["a1", "a2", "a3", word], "error_type": "one-away"} for word in words[4:]
+    ]
+    result = solve_endgame(words, [], invalid_groups)
+    assert result["group"] == ["a1", "a2", "a3", "a4"]
+    assert result["partitions"] == 35
+    assert result["forced"]
+
+
+def test_no_consistent_split():
+    invalid_groups = [{"words": WORDS[:4], "error_type": "not-correct"}]
+    assert solve_endgame(WORDS[:4], [], invalid_groups) is None
+
+
+def test_word_count_must_be_a_multiple_of_four():
+    assert solve_endgame(WORDS[:6], [], []) is None
+    assert solve_endgame([], [], []) is None
@@ -0,0 +1,15 @@
+import evaluate_solver as ev
+import workflow_manager as wm
+
+
+def test_settings_start_from_a_fresh_router_and_caches():
+    router = wm.get_router()
+    wm._constraint_engines["settings"] = ((), None)
+    policy = "skip_llm_margin=0.2"
+    with ev.applied_settings({"ROUTING_POLICY": policy}):
+        assert wm._constraint_engines == {}
+        assert wm.get_router() is not router
+        assert wm.get_router().policy.skip_llm_margin == 0.2
+    assert wm.get_router() is router
+    assert wm.ROUTING_POLICY != policy
+    assert wm._constraint_engines.pop("settings") == ((), None)
@@ -0,0 +1,50 @@
+import ormsgpack
+import pytest
+
+from puzzle_record import PuzzleRecord, mask_from_bytes, mask_to_bytes
+
+WORDS = ["bass", "pike", "carp", "sole", "red", "blue", "green", "pink"]
+
+
+def test_mask_bytes_round_trip():
+    for mask in (0, 1, 0xFF, 1 << 64, (1 << 100) - 1):
+        assert mask_from_bytes(mask_to_bytes(mask)) == mask
+
+
+def test_groups_update_masks():
+    record = PuzzleRecord("s", WORDS)
+    record.solve_group("green", WORDS[:4], "fish")
+    record.reject_group(["red", "blue", "green", "bass"], "colors", "one-away")
+    assert record.remaining_words == WORDS[4:]
+    assert record.correct_groups["green"] == [{"words": WORDS[:4], "reason": "fish"}]
+    assert record.invalid_groups[0]["error_type"] == "one-away"
+
+
+def test_unknown_group_words_raise():
+    record = PuzzleRecord("s", WORDS)
+    with pytest.raises(ValueError, match="trout"):
+        record.solve_group("green", ["bass", "pike", "carp", "trout"])
+    with pytest.raises(ValueError, match="trout"):
+        record.reject_group(["bass", "pike", "carp", "trout"])
+    assert record.remaining_words == WORDS
+    assert record.invalid == ()
+
+
+def test_bytes_round_trip_with_more_than_64_words():
+    words = [f"word{i}" for i in range(80)]
+    record = PuzzleRecord("s", words)
+    record.solve_group("yellow", words[-4:], "last")
+    record.reject_group(words[60:64], "", "not-correct")
+    record.mistake_count = 1
+
+    restored = PuzzleRecord.from_bytes(record.to_bytes())
+    assert not restored.diff(record)
+    assert restored.to_dict() == record.to_dict()
+
+
+def test_unknown_record_version_raises():
+    data = PuzzleRecord("s", WORDS).to_bytes()
+    record = ormsgpack.unpackb(data)
+    record[0] = 1
+    with pytest.raises(ValueError, match="version"):
+        PuzzleRecord.from_bytes(ormsgpack.packb(record))
@@ -0,0 +1,79 @@
+import pytest
+
+from recommender_router import (
+    RecommenderRouter,
+    RecommenderStats,
+    RoutingPolicy,
+    candidate_margin,
+    parse_policy_spec,
+)
+
+
+def candidate(words, metric):
+    return {"words": words, "metric": metric}
+
+
+def test_margin_ignores_disjoint_candidates():
+    candidates = [
+        candidate(["a", "b", "c", "d"], 0.9),
+        candidate(["e", "f", "g", "h"], 0.8999),
+        candidate(["a", "b", "c", "e"], 0.7),
+    ]
+    assert candidate_margin(candidates) == pytest.approx(0.2)
+    assert candidate_margin(candidates[:2]) is None
+    assert candidate_margin([]) is None
+
+
+def test_policy_spec():
+    policy = parse_policy_spec("skip_llm_margin=0.05, mistake_cost=20")
+    assert policy.skip_llm_margin == 0.05
+    assert policy.mistake_cost == 20.0
+    assert policy.escalate_margin == RoutingPolicy.DEFAULTS["escalate_margin"]
+    with pytest.raises(ValueError):
+        parse_policy_spec("skip_margin=0.05")
+
+
+def test_thresholds():
+    router = RecommenderRouter()
+    assert router.route(None, 16, 0)["recommender"] == "embedding"
+    assert router.route(0.0, 4, 0)["recommender"] == "embedding"
+    assert router.route(0.1, 16, 0)["recommender"] == "embedding"
+    decision = router.route(0.001, 16, 0)
+    assert decision["recommender"] == "llm"
+    assert decision["expected_costs"] == {}
+
+
+def test_cost_comparison_inside_the_band():
+    router = RecommenderRouter()
+    # Near the large-margin end the faster embedding path wins
+    decision = router.route(0.039, 16, 0)
+    assert decision["reason"] == "lowest expected cost"
+    assert decision["recommender"] == "embedding"
+    assert decision["expected_costs"]["embedding"] < decision["expected_costs"]["llm"]
+    # Near the ambiguous end, with mistakes raising the price of a wrong guess, the LLM wins
+    decision = router.route(0.011, 16, 3)
+    assert decision["recommender"] == "llm"
+    assert decision["expected_costs"]["llm"] < decision["expected_costs"]["embedding"]
+
+
+def test_outcomes_move_accuracy_away_from_the_prior():
+    stats = RecommenderStats()
+    prior = stats.accuracy("embedding")
+    for _ in range(5):
+        stats.record_outcome("embedding", True)
+    assert stats.accuracy("embedding") > prior
+    for _ in range(20):
+        stats.record_outcome("llm", False)
+    assert stats.accuracy("llm") < 0.2
+
+    # An LLM that is always wrong is never worth escalating to
+    router = RecommenderRouter(stats=stats)
+    assert router.route(0.011, 16, 3)["recommender"] == "embedding"
+
+
+def test_stats_round_trip():
+    stats = RecommenderStats()
+    stats.record_latency("llm", 2.0)
+    stats.record_outcome("llm", True)
+    restored = RecommenderStats.from_dict(stats.to_dict())
+    assert restored.summary() == stats.summary()
@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+from request_coalescer import RequestCoalescer
+
+
+class Counter:
+    """A slow computation that counts its runs."""
+
+    def __init__(self, fail: bool = False):
+        self.calls = 0
+        self.fail = fail
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        if self.fail:
+            raise RuntimeError("failed")
+        return self.calls
+
+
+def test_concurrent_requests_share_one_run():
+    async def run():
+        coalescer, compute = RequestCoalescer(), Counter()
+        results = await asyncio.gather(*(coalescer.run("s", 1, compute) for _ in range(5)))
+        assert results == [1] * 5
+        assert compute.calls == 1
+        assert (coalescer.computed, coalescer.joined) == (1, 4)
+
+        assert await coalescer.run("s", 1, compute) == 1
+        assert coalescer.reused == 1
+
+    asyncio.run(run())
+
+
+def test_new_version_or_key_computes_again():
+    async def run():
+        coalescer, compute = RequestCoalescer(), Counter()
+        assert await coalescer.run("s", 1, compute) == 1
+        assert await coalescer.run("s", 2, compute) == 2
+        assert await coalescer.run("t", 2, compute) == 3
+        assert await coalescer.run("s", 2, compute) == 2
+
+    asyncio.run(run())
+
+
+def test_advance_and_invalidate():
+    async def run():
+        coalescer, compute = RequestCoalescer(), Counter()
+        await coalescer.run("s", 1, compute)
+        coalescer.advance("s", 1, 2)
+        assert await coalescer.run("s", 2, compute) == 1
+        # Only the version the result was computed for is advanced
+        coalescer.advance("s", 1, 3)
+        assert await coalescer.run("s", 3, compute) == 2
+
+        coalescer.invalidate("s")
+        assert await coalescer.run("s", 3, compute) == 3
+
+    asyncio.run(run())
+
+
+def test_failures_reach_every_caller_and_are_not_kept():
+    async def run():
+        coalescer, failing = RequestCoalescer(), Counter(fail=True)
+        results = await asyncio.gather(
+            *(coalescer.run("s", 1, failing) for _ in range(3)), return_exceptions=True
+        )
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert failing.calls == 1
+
+        compute = Counter()
+        assert await coalescer.run("s", 1, compute) == 1
+
+    asyncio.run(run())
+
+
+def test_cancelled_caller_does_not_cancel_the_run():
+    async def run():
+        coalescer, compute = RequestCoalescer(), Counter()
+        first = asyncio.ensure_future(coalescer.run("s", 1, compute))
+        second = asyncio.ensure_future(coalescer.run("s", 1, compute))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        assert await second == 1
+        assert compute.calls == 1
+
+    asyncio.run(run())
@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+
+from session_store import SessionStore, new_puzzle_state
+
+WORDS = ["bass", "pike", "carp", "sole", "red", "blue", "green", "pink"]
+
+
+def test_update_publishes_only_changes():
+    async def run():
+        store = SessionStore(lambda session_id: new_puzzle_state(session_id, WORDS))
+        session = store.get("s")
+        first = session.snapshot
+
+        async with session.update() as draft:
+            draft.active_recommender = first.active_recommender
+        assert session.version == 0
+        assert session.snapshot is first
+        assert not store.exists("s")
+
+        async with session.update() as draft:
+            draft.reject_group(WORDS[:4])
+        assert session.version == 1
+        assert session.snapshot is not first
+        assert first.invalid_groups == []
+        assert store.exists("s")
+
+    asyncio.run(run())
+
+
+def test_failed_update_is_discarded():
+    async def run():
+        session = SessionStore().get("s")
+        await session.replace(new_puzzle_state("s", WORDS))
+        with pytest.raises(ValueError):
+            async with session.update() as draft:
+                draft.reject_group(WORDS[:4])
+                draft.reject_group(["trout"] + WORDS[:3])
+        assert session.version == 1
+        assert session.snapshot.invalid_groups == []
+
+    asyncio.run(run())
@@ -0,0 +1,54 @@
+import asyncio
+import os
+
+import numpy as np
+
+from embedding_codec import QuantizedEmbeddings
+from puzzle_record import PuzzleRecord
+from shared_state import SharedSessionStore
+
+WORDS = [f"w{i}" for i in range(8)]
+
+
+def make_record(seed: int) -> PuzzleRecord:
+    rng = np.random.default_rng(seed)
+    record = PuzzleRecord("s", WORDS)
+    record.set_embeddings(
+        QuantizedEmbeddings.encode({word: rng.random(4) for word in WORDS}, "int8")
+    )
+    return record
+
+
+def test_workers_share_records_and_embeddings(tmp_path):
+    async def run():
+        writer = SharedSessionStore(str(tmp_path))
+        reader = SharedSessionStore(str(tmp_path))
+        await writer.get("s").replace(make_record(0))
+        async with writer.get("s").update() as record:
+            record.reject_group(WORDS[:4])
+
+        snapshot = reader.snapshot("s")
+        assert snapshot.invalid_groups[0]["words"] == WORDS[:4]
+        assert not snapshot.embeddings.codes.flags.writeable
+        expected = writer.snapshot("s").embeddings.codes
+        assert np.array_equal(snapshot.embeddings.codes, expected)
+
+    asyncio.run(run())
+
+
+def test_replaced_matrices_and_lock_files_are_removed(tmp_path):
+    async def run():
+        store = SharedSessionStore(str(tmp_path))
+        reader = SharedSessionStore(str(tmp_path))
+        await store.get("s").replace(make_record(0))
+        first = reader.snapshot("s").embeddings.codes
+        await store.get("s").replace(make_record(1))
+
+        assert len(os.listdir(tmp_path / "embeddings")) == 1
+        assert not [name for name in os.listdir(tmp_path) if name.endswith(".lock")]
+        # A worker that mapped the old matrix keeps it and picks up the new one
+        assert first.shape == (8, 4)
+        latest = reader.snapshot("s").embeddings.codes
+        assert np.array_equal(latest, store.snapshot("s").embeddings.codes)
+
+    asyncio.run(run())
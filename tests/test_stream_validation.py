@@ -0,0 +1,101 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import workflow_manager as wm
+from stream_validation import (
+    EarlyRejection,
+    IncrementalWordsParser,
+    StreamValidator,
+    stream_validated,
+)
+
+WORDS = ["bass", "pike", "carp", "sole", "red", "blue", "green", "pink"]
+
+
+class FakeStreamingModel:
+    """Streams canned answers in small chunks and records the messages it was sent."""
+
+    def __init__(self, *answers: str, chunk_size: int = 3):
+        self.answers = list(answers)
+        self.chunk_size = chunk_size
+        self.prompts = []
+        self.chunks_sent = 0
+
+    async def astream(self, messages):
+        self.prompts.append(messages[-1].content)
+        answer = self.answers.pop(0)
+        for start in range(0, len(answer), self.chunk_size):
+            end = start + self.chunk_size
+            self.chunks_sent += 1
+            yield SimpleNamespace(content=answer[start:end])
+
+
+def feed_in_chunks(text, size):
+    parser = IncrementalWordsParser()
+    words = []
+    for start in range(0, len(text), size):
+        end = start + size
+        words.extend(parser.feed(text[start:end]))
+    return parser, words
+
+
+def test_words_are_parsed_as_their_closing_quote_arrives():
+    parser = IncrementalWordsParser()
+    assert parser.feed('{"connection": "x", "words": ["ba') == []
+    assert parser.feed('ss", "pi') == ["bass"]
+    assert parser.feed('ke"]}') == ["pike"]
+    assert parser.complete
+    # Text after the array is kept but not parsed
+    assert parser.feed(', "words": ["carp"]') == []
+    assert parser.words == ["bass", "pike"]
+
+
+def test_escapes_split_across_chunks():
+    text = r'{"words": ["say \"hi\"", "caf\u00e9", "back\\slash"]}'
+    for size in range(1, 8):
+        parser, words = feed_in_chunks(text, size)
+        assert words == ['say "hi"', "café", "back\\slash"]
+        assert parser.complete
+
+
+def test_validator_reasons():
+    validator = StreamValidator(WORDS, [])
+    assert validator.check("bass") is None
+    assert "twice" in validator.check("bass")
+    assert "not one of the remaining words" in validator.check("trout")
+
+    rejected = [{"words": WORDS[:4], "error_type": "not-correct"}]
+    validator = StreamValidator(WORDS, rejected)
+    reasons = [validator.check(word) for word in WORDS[:4]]
+    assert reasons[:3] == [None] * 3
+    assert "already rejected" in reasons[3]
+
+
+def test_unknown_word_aborts_the_stream_early():
+    answer = '{"words": ["bass", "trout", "carp", "sole"], "connection": "' + "x" * 200 + '"}'
+    llm = FakeStreamingModel(answer)
+
+    with pytest.raises(EarlyRejection) as rejection:
+        asyncio.run(
+            stream_validated(llm, wm._prompt_messages("prompt"), StreamValidator(WORDS, []))
+        )
+    assert "trout" in rejection.value.reason
+    assert rejection.value.words == ["bass"]
+    assert rejection.value.characters < 40
+    assert llm.chunks_sent < len(answer) // llm.chunk_size
+
+
+def test_rejected_answer_is_retried_with_the_reason(monkeypatch):
+    llm = FakeStreamingModel(
+        '{"words": ["bass", "bass", "carp", "sole"], "connection": "fish"}',
+        '{"words": ["bass", "pike", "carp", "sole"], "connection": "fish"}',
+    )
+    monkeypatch.setattr(wm, "_chat_model", lambda: llm)
+    state = {"remaining_words": WORDS, "invalid_groups": [], "session_id": "stream-retry"}
+
+    state = asyncio.run(wm.get_llm_recommendation(state))
+    assert state["recommendations"]["group"] == WORDS[:4]
+    assert len(llm.prompts) == 2
+    assert "appears twice" in llm.prompts[1]
@@ -0,0 +1,31 @@
+from wordplay_features import MIN_HIDDEN_LENGTH, WordplayIndex, load_categories
+
+CATEGORIES = {"body part": ("ear", "hip", "chin", "shin", "hand", "nose")}
+FILLER = ["red", "blue", "green", "pink", "oak", "elm", "ash", "fir"]
+
+
+def test_short_hidden_words_are_ignored():
+    words = ["heart", "spear", "shipment", "bearing"] + FILLER
+    index = WordplayIndex(words, frozenset(), CATEGORIES)
+    assert index.propose_groups(words, set()) == []
+
+
+def test_hidden_words_are_proposed():
+    hiding = ["chinos", "shinty", "handle", "noseband"]
+    words = hiding + FILLER
+    index = WordplayIndex(words, frozenset(), CATEGORIES)
+    top = index.propose_groups(words, set())[0]
+    assert sorted(top["words"]) == sorted(hiding)
+    assert top["reason"] == "Each word hides a body part"
+
+
+def test_anagrams_are_proposed():
+    anagrams = ["listen", "silent", "enlist", "tinsel"]
+    words = anagrams + FILLER
+    top = WordplayIndex(words, frozenset(), {}).propose_groups(words, set())[0]
+    assert sorted(top["words"]) == sorted(anagrams)
+
+
+def test_shipped_categories_hold_no_words_too_short_to_match():
+    for members in load_categories().values():
+        assert all(len(member) >= MIN_HIDDEN_LENGTH for member in members)
@@ -0,0 +1,40 @@
+import asyncio
+
+import workflow_manager as wm
+
+WORDS = [f"{letter}{i}" for letter in "abcd" for i in range(1, 5)]
+ONE_AWAY = [{"words": ["a1", "a2", "a3", "b1"], "error_type": "one-away"}]
+
+
+def test_constraints_are_kept_per_session_until_the_feedback_changes():
+    async def run():
+        first = await wm.get_constraints(WORDS, [], ONE_AWAY, "constraints")
+        assert await wm.get_constraints(WORDS, [], list(ONE_AWAY), "constraints") is first
+        rejected = ONE_AWAY + [{"words": ["c1", "c2", "c3", "d1"], "error_type": "not-correct"}]
+        changed = await wm.get_constraints(WORDS, [], rejected, "constraints")
+        assert changed is not first
+        assert not changed.is_feasible(["c1", "c2", "c3", "c4"])
+
+    wm._constraint_engines.pop("constraints", None)
+    asyncio.run(run())
+
+
+def test_setup_and_recommenders_hand_over_to_wordplay_first():
+    assert "get_wordplay_recommendation" in wm.RECOMMENDER_HANDOFFS
+    route = wm.route_after_recommender({"tool_to_use": "get_wordplay_recommendation"})
+    assert route == "get_wordplay_recommendation"
+    assert wm.route_after_recommender({"tool_to_use": "unknown"}) == "run_planner"
+
+
+def test_endgame_without_similarity_defers_unforced_splits():
+    state = {"remaining_words": WORDS[:8], "invalid_groups": [], "session_id": None}
+    assert wm.get_endgame_recommendation(state) is None
+    state["remaining_words"] = WORDS[:4]
+    assert wm.get_endgame_recommendation(state)["group"] == WORDS[:4]
+
+
+def test_a_recommender_that_gives_up_returns_to_the_planner():
+    state = {"tool_to_use": "get_embedvec_recommendation", "puzzle_status": "error"}
+    assert wm.route_after_recommender(state) == "run_planner"
+    state["puzzle_status"] = "active"
+    assert wm.route_after_recommender(state) == "get_embedvec_recommendation"
@@ -0,0 +1,67 @@
+import asyncio
+import glob
+import os
+
+import pytest
+
+import workflow_manager as wm
+import workflow_trace as wt
+from session_store import new_puzzle_state
+
+WORDS = [f"{letter}{i}" for letter in "abcd" for i in range(1, 5)]
+ANSWER = '{"words": ["a1", "a2", "a3", "a4"], "connection": "letter a"}'
+
+
+def live_model():
+    raise AssertionError("a replay built a live model")
+
+
+@pytest.fixture
+def recorded_trace(monkeypatch, tmp_path):
+    """Record an LLM recommendation with a stubbed chat model and return the trace events."""
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+    def chat_model():
+        return wt.traced_model("chat:fake", lambda: FakeListChatModel(responses=[ANSWER] * 3))
+
+    def embeddings_model():
+        return wt.traced_model("embeddings:fake", lambda: DeterministicFakeEmbedding(size=16))
+
+    monkeypatch.setattr(wm, "CHECKPOINT_DB", "memory")
+    monkeypatch.setattr(wm, "_checkpointer", None)
+    monkeypatch.setattr(wm, "_router", None)
+    monkeypatch.setattr(wm, "_chat_model", chat_model)
+    monkeypatch.setattr(wm, "_embeddings_model", embeddings_model)
+    monkeypatch.setattr(wt, "TRACE_DIR", str(tmp_path))
+
+    puzzle_state = new_puzzle_state("trace", WORDS)
+    workflow_state = wm.initialize_state_from_puzzle_state(puzzle_state)
+    wm.update_puzzle_state_from_workflow(puzzle_state, asyncio.run(wm.setup_puzzle(workflow_state)))
+    puzzle_state.active_recommender = "llm"
+    recommendation = asyncio.run(wm.get_recommendation_from_workflow(puzzle_state))
+    assert recommendation["group"] == WORDS[:4]
+
+    monkeypatch.setattr(wt, "TRACE_DIR", "")
+    monkeypatch.setattr(wm, "_chat_model", lambda: wt.traced_model("chat:fake", live_model))
+    monkeypatch.setattr(
+        wm, "_embeddings_model", lambda: wt.traced_model("embeddings:fake", live_model)
+    )
+    (path,) = glob.glob(os.path.join(tmp_path, "*get_recommendation_from_workflow*"))
+    return wt.load_trace(path)
+
+
+def test_replay_answers_from_the_trace(recorded_trace):
+    assert any(event["type"] == "call" for event in recorded_trace)
+
+    report = asyncio.run(wt.replay_trace(recorded_trace, "zero"))
+    assert report["matches"]
+    assert report["result"]["group"] == WORDS[:4]
+    assert (report["out_of_order"], report["unused_calls"]) == (0, 0)
+
+
+def test_diverging_replay_raises(recorded_trace):
+    events = [event for event in recorded_trace if event.get("method") != "astream"]
+
+    with pytest.raises(wt.TraceMismatchError, match="no astream response left for chat:fake"):
+        asyncio.run(wt.replay_trace(events, "zero"))
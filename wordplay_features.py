@@ -0,0 +1,213 @@
+"""
+Wordplay Features for Connection Puzzle Solver
+
+This module indexes puzzle words by lexical features that embeddings cannot see:
+shared prefixes and suffixes, letter multisets (anagrams), hidden category words,
+"word + letter" forms and compound-word partners from an offline word list. Groups
+of four words sharing a feature are proposed without any model call.
+"""
+
+import bisect
+import json
+import logging
+import os
+from functools import lru_cache
+from itertools import combinations
+from math import comb
+from typing import Any, Dict, FrozenSet, Iterable, List, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+DEFAULT_WORDLIST = os.path.join(DATA_DIR, "english_words.txt")
+DEFAULT_CATEGORIES = os.path.join(DATA_DIR, "wordplay_categories.json")
+
+# Shortest prefix/suffix and compound part considered meaningful
+MIN_AFFIX_LENGTH = 3
+MIN_PART_LENGTH = 3
+
+# Shortest category member counted as a hidden word; shorter ones ("ear", "hip")
+# turn up inside too many unrelated words, so the shipped lists leave them out
+MIN_HIDDEN_LENGTH = 4
+
+# Features shared by more words than this are too ambiguous to propose
+MAX_FEATURE_WORDS = 6
+
+# Base confidence of each feature kind, before accounting for ambiguity
+FEATURE_WEIGHTS = {
+    "anagram": 1.0,
+    "before": 0.9,
+    "after": 0.9,
+    "hidden": 0.6,
+    "plus_letter": 0.6,
+    "prefix": 0.4,
+    "suffix": 0.4,
+}
+
+Feature = Tuple[str, str]
+
+
+@lru_cache(maxsize=4)
+def load_dictionary(path: str = DEFAULT_WORDLIST) -> FrozenSet[str]:
+    """Load a word list with one lowercase word per line."""
+    with open(path, "r", encoding="utf-8") as file:
+        return frozenset(line.strip().lower() for line in file if line.strip())
+
+
+@lru_cache(maxsize=4)
+def load_categories(path: str = DEFAULT_CATEGORIES) -> Dict[str, Tuple[str, ...]]:
+    """Load the category word lists used to detect hidden words."""
+    with open(path, "r", encoding="utf-8") as file:
+        return {category: tuple(words) for category, words in json.load(file).items()}
+
+
+class _Trie:
+    """Character trie recording which puzzle words pass through each node."""
+
+    def __init__(self):
+        self.children: Dict[str, "_Trie"] = {}
+        self.words: Set[str] = set()
+
+    def insert(self, key: str, word: str) -> None:
+        node = self
+        for char in key:
+            node = node.children.setdefault(char, _Trie())
+            node.words.add(word)
+
+    def shared(self, min_depth: int, min_words: int = 4) -> Iterable[Tuple[str, Set[str]]]:
+        """Yield (path, words) for every node at min_depth or deeper shared by min_words words."""
+        stack = [("", self)]
+        while stack:
+            path, node = stack.pop()
+            for char, child in node.children.items():
+                if len(child.words) < min_words:
+                    continue
+                if len(path) + 1 >= min_depth:
+                    yield path + char, child.words
+                stack.append((path + char, child))
+
+
+class WordplayIndex:
+    """
+    Precomputed lexical features of the words of one puzzle.
+
+    The index is built once per puzzle; proposals for later rounds only filter the
+    features down to the remaining words.
+    """
+
+    def __init__(
+        self, words: List[str], dictionary: FrozenSet[str], categories: Dict[str, Tuple[str, ...]]
+    ):
+        self.words = list(words)
+        self.features: Dict[Feature, Set[str]] = {}
+
+        sorted_dictionary = sorted(dictionary)
+        reversed_dictionary = sorted(word[::-1] for word in dictionary)
+        prefixes, suffixes = _Trie(), _Trie()
+
+        for word in self.words:
+            prefixes.insert(word, word)
+            suffixes.insert(word[::-1], word)
+            self._add(("anagram", "".join(sorted(word))), word)
+
+            # Compound partners: word + part and part + word are dictionary words
+            for compound in _with_prefix(sorted_dictionary, word):
+                part = compound.removeprefix(word)
+                if len(part) >= MIN_PART_LENGTH and part in dictionary:
+                    self._add(("before", part), word)
+            for reversed_compound in _with_prefix(reversed_dictionary, word[::-1]):
+                part = reversed_compound.removeprefix(word[::-1])[::-1]
+                if len(part) >= MIN_PART_LENGTH and part in dictionary:
+                    self._add(("after", part), word)
+
+            # Words hiding a member of a category
+            for category, members in categories.items():
+                if any(
+                    len(member) >= MIN_HIDDEN_LENGTH and member in word and member != word
+                    for member in members
+                ):
+                    self._add(("hidden", category), word)
+
+            # Dictionary word plus one letter at either end
+            if len(word) > MIN_PART_LENGTH:
+                if word[:-1] in dictionary:
+                    self._add(("plus_letter", f"{word[-1]} at the end"), word)
+                if word[1:] in dictionary:
+                    self._add(("plus_letter", f"{word[0]} at the start"), word)
+
+        for prefix, members in prefixes.shared(MIN_AFFIX_LENGTH):
+            self.features[("prefix", prefix)] = set(members)
+        for suffix, members in suffixes.shared(MIN_AFFIX_LENGTH):
+            self.features[("suffix", suffix[::-1])] = set(members)
+
+        logger.info(f"Indexed {len(self.features)} wordplay features for {len(self.words)} words")
+
+    def _add(self, feature: Feature, word: str) -> None:
+        self.features.setdefault(feature, set()).add(word)
+
+    def propose_groups(
+        self, remaining_words: List[str], invalid_ids: Set[str]
+    ) -> List[Dict[str, Any]]:
+        """
+        Propose groups of four remaining words that share a feature, best first.
+
+        A feature shared by n remaining words yields every 4-word subset, each
+        scored by the feature weight divided by the number of subsets.
+        """
+        remaining = set(remaining_words)
+        proposals: Dict[str, Dict[str, Any]] = {}
+
+        for (kind, key), members in self.features.items():
+            live = sorted(members & remaining)
+            if not 4 <= len(live) <= MAX_FEATURE_WORDS:
+                continue
+            weight = FEATURE_WEIGHTS[kind]
+            if kind in ("prefix", "suffix"):
+                weight = min(weight + 0.1 * (len(key) - MIN_AFFIX_LENGTH), 0.8)
+            score = weight / comb(len(live), 4)
+
+            for group in combinations(live, 4):
+                group_id = "_".join(group)
+                if group_id in invalid_ids:
+                    continue
+                if group_id not in proposals or proposals[group_id]["score"] < score:
+                    proposals[group_id] = {
+                        "words": list(group),
+                        "score": score,
+                        "reason": describe_feature(kind, key),
+                        "id": group_id,
+                    }
+
+        return sorted(proposals.values(), key=lambda group: group["score"], reverse=True)
+
+
+def _with_prefix(sorted_words: List[str], prefix: str) -> Iterable[str]:
+    """Yield the words of a sorted list that start with a prefix."""
+    start = bisect.bisect_left(sorted_words, prefix)
+    for word in sorted_words[start:]:
+        if not word.startswith(prefix):
+            break
+        yield word
+
+
+def describe_feature(kind: str, key: str) -> str:
+    """Return a human-readable connection reason for a feature."""
+    if kind == "anagram":
+        return "Anagrams of each other"
+    if kind == "before":
+        return f'Words that come before "{key}" ({key} compounds)'
+    if kind == "after":
+        return f'Words that come after "{key}" ({key} compounds)'
+    if kind == "hidden":
+        return f"Each word hides a {key}"
+    if kind == "plus_letter":
+        return f"Words formed by adding {key} of another word"
+    if kind == "prefix":
+        return f'Words starting with "{key}"'
+    return f'Words ending with "{key}"'
+
+
+def build_wordplay_index(words: List[str], wordlist_path: str = "") -> WordplayIndex:
+    """Build the wordplay index of a puzzle from the bundled or a custom word list."""
+    dictionary = load_dictionary(wordlist_path or DEFAULT_WORDLIST)
+    return WordplayIndex(words, dictionary, load_categories())
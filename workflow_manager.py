@@ -8,15 +8,29 @@ handling the flow between different tools and processing steps.
 import logging
 import asyncio
 import json
-import numpy as np
-from typing import Dict, Any, Callable, List, Optional, Tuple
+from typing import TYPE_CHECKING, Dict, Any, Callable, List, Mapping, Optional, Sequence, Tuple
 import os
+import time
 
-from langchain_core.messages import HumanMessage
-from langchain_openai.chat_models import ChatOpenAI
-from langchain_openai.embeddings import OpenAIEmbeddings
-from langgraph.checkpoint.memory import MemorySaver
-from langgraph.graph import StateGraph, END
+from recommender_router import (
+    RecommenderRouter, RecommenderStats, candidate_margin, parse_policy_spec
+)
+from stream_validation import EarlyRejection, StreamValidator, stream_validated
+from wordplay_features import WordplayIndex, build_wordplay_index
+from workflow_trace import traced, traced_model
+
+# LangChain, LangGraph, OpenAI and NumPy are imported on first use, so routes and
+# workers that never run a model do not pay for loading the LLM stack
+if TYPE_CHECKING:
+    from langchain_openai.chat_models import ChatOpenAI
+    from langchain_openai.embeddings import OpenAIEmbeddings
+    from langgraph.graph import StateGraph
+
+    from candidate_index import CandidateIndex
+    from constraint_engine import ConstraintEngine
+    from embedding_codec import QuantizedEmbeddings
+    from embedding_sources import EmbeddingEnsemble
+    from puzzle_record import PuzzleRecord
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
@@ -28,6 +42,59 @@ EMBEDDING_MODEL = "text-embedding-3-small"
 MAX_ERRORS = 3
 RETRY_LIMIT = 5
 
+# Immediate retries of an LLM answer aborted mid-stream by early validation
+STREAM_RETRIES = 2
+
+# Inputs per embeddings request (the OpenAI limit is 2048) and number of batch
+# requests in flight at once during bulk setup
+EMBEDDING_BATCH_SIZE = 2048
+EMBEDDING_CONCURRENCY = 4
+
+# Storage of puzzle embeddings ("float32", "float16" or "int8" with per-vector
+# scales) and the number of leading dimensions kept (0 keeps all of them; only
+# meaningful for models trained to be truncated, such as text-embedding-3)
+EMBEDDING_STORAGE = os.environ.get("EMBEDDING_STORAGE", "float16")
+EMBEDDING_DIMENSIONS = int(os.environ.get("EMBEDDING_DIMENSIONS", "0"))
+
+# Optional ensemble of embedding sources with their weights, for example
+# EMBEDDING_ENSEMBLE="openai:text-embedding-3-small=0.6,char_ngrams=0.2,anagram=0.2".
+# When empty, candidate groups are scored with EMBEDDING_MODEL alone.
+EMBEDDING_ENSEMBLE = os.environ.get("EMBEDDING_ENSEMBLE", "")
+_embedding_ensemble: Optional["EmbeddingEnsemble"] = None
+
+# Offline word list for wordplay detection (defaults to the bundled list) and the
+# minimum score a wordplay group needs to be recommended without a model call
+WORDPLAY_WORDLIST = os.environ.get("WORDPLAY_WORDLIST", "")
+WORDPLAY_MIN_SCORE = 0.5
+
+# Per-session wordplay feature indexes, keyed by session_id
+_wordplay_indexes: Dict[str, WordplayIndex] = {}
+
+# Durable checkpoint database shared by all workflow runs; set CHECKPOINT_DB=memory
+# to keep checkpoints in process instead
+CHECKPOINT_DB = os.environ.get("CHECKPOINT_DB", "checkpoints.sqlite")
+_checkpointer = None
+
+# Per-session incremental candidate indexes, keyed by session_id
+_candidate_indexes: Dict[str, "CandidateIndex"] = {}
+
+# Per-session constraint engine of the latest feedback, with the feedback it encodes
+_constraint_engines: Dict[str, Tuple[Tuple, "ConstraintEngine"]] = {}
+
+# Thresholds of the embedding/LLM routing policy, for example
+# ROUTING_POLICY="skip_llm_margin=0.05,mistake_cost=20", and an optional
+# evaluate_solver.py report seeding the per-recommender statistics
+ROUTING_POLICY = os.environ.get("ROUTING_POLICY", "")
+ROUTER_STATS = os.environ.get("ROUTER_STATS", "")
+_router: Optional[RecommenderRouter] = None
+
+# Remaining word count at or below which recommendations come from the local
+# endgame solver instead of the workflow (0 disables it)
+ENDGAME_WORDS = int(os.environ.get("ENDGAME_WORDS", "8"))
+
+# LLM prompts list the feasible groups explicitly once this few remain
+FEASIBLE_PROMPT_LIMIT = 20
+
 # Define state type structure
 class PuzzleState(dict):
     """Type definition for the puzzle state."""
@@ -41,7 +108,51 @@ class PuzzleState(dict):
     active_recommender: str
     tool_to_use: str
     recommendations: Dict[str, Any]
-    word_embeddings: Dict[str, List[float]]
+    word_embeddings: Mapping[str, Sequence[float]]
+    session_id: str
+
+
+def _chat_model() -> "ChatOpenAI":
+    """Create the chat model, importing LangChain on first use; traces record or replay it."""
+    def create() -> "ChatOpenAI":
+        from langchain_openai.chat_models import ChatOpenAI
+
+        return ChatOpenAI(model=OPENAI_MODEL, stream_usage=True)
+
+    return traced_model(f"chat:{OPENAI_MODEL}", create)
+
+
+def _embeddings_model() -> "OpenAIEmbeddings":
+    """Create the embeddings model, importing LangChain on first use; traces record or replay it."""
+    def create() -> "OpenAIEmbeddings":
+        from langchain_openai.embeddings import OpenAIEmbeddings
+
+        return OpenAIEmbeddings(model=EMBEDDING_MODEL, chunk_size=EMBEDDING_BATCH_SIZE)
+
+    return traced_model(f"embeddings:{EMBEDDING_MODEL}", create)
+
+
+def _prompt_messages(prompt: str) -> List[Any]:
+    """Wrap a prompt in the message list passed to the chat model."""
+    from langchain_core.messages import HumanMessage
+    
+    return [HumanMessage(content=prompt)]
+
+
+def preload() -> None:
+    """
+    Import the LLM stack ahead of the first request.
+    
+    Lazy imports keep worker start-up fast; calling this at start-up instead moves
+    the import cost out of the first request that needs a model.
+    """
+    import numpy  # noqa: F401
+    import langchain_openai  # noqa: F401
+    import langgraph.graph  # noqa: F401
+    
+    import candidate_index  # noqa: F401
+    import checkpoint_store  # noqa: F401
+    import embedding_sources  # noqa: F401
 
 
 async def setup_puzzle(state: Dict[str, Any]) -> Dict[str, Any]:
@@ -62,7 +173,7 @@ async def setup_puzzle(state: Dict[str, Any]) -> Dict[str, Any]:
         
     # Initialize embeddings
     try:
-        embeddings_model = OpenAIEmbeddings(model=EMBEDDING_MODEL)
+        embeddings_model = _embeddings_model()
         word_list = state.get("remaining_words", [])
         
         # Generate embeddings for each word
@@ -70,12 +181,9 @@ async def setup_puzzle(state: Dict[str, Any]) -> Dict[str, Any]:
         word_embeddings_list = await embeddings_model.aembed_documents(word_list)
         
         # Store embeddings in state
-        state["word_embeddings"] = {word: embedding for word, embedding in zip(word_list, word_embeddings_list)}
-        
-        # Set status
-        state["puzzle_status"] = "active"
-        state["tool_status"] = "setup_complete"
-        state["active_recommender"] = "embedding"
+        await _complete_setup(
+            state, {word: embedding for word, embedding in zip(word_list, word_embeddings_list)}
+        )
         logger.info("Puzzle setup complete")
         
     except Exception as e:
@@ -86,6 +194,98 @@ async def setup_puzzle(state: Dict[str, Any]) -> Dict[str, Any]:
     return state
 
 
+async def _complete_setup(state: Dict[str, Any], word_embeddings: Dict[str, List[float]]) -> None:
+    """Store a puzzle's embeddings compactly, prime its session indexes and mark it active."""
+    word_list = state.get("remaining_words", [])
+    word_embeddings = quantize_embeddings(word_embeddings)
+    state["word_embeddings"] = word_embeddings
+    
+    # Prime the session's candidate and wordplay indexes for the new puzzle
+    session_id = state.get("session_id")
+    if session_id is not None:
+        _wordplay_indexes[session_id] = build_wordplay_index(word_list, WORDPLAY_WORDLIST)
+        _candidate_indexes[session_id] = await build_candidate_index(word_list, word_embeddings)
+        save_session_embeddings(session_id, word_embeddings)
+    
+    # Set status; recommendations start with the local wordplay features, which
+    # cost no model call and hand over to the embeddings when not confident
+    state["puzzle_status"] = "active"
+    state["tool_status"] = "setup_complete"
+    state["active_recommender"] = "wordplay"
+    state["tool_to_use"] = "get_wordplay_recommendation"
+
+
+async def setup_puzzles_batch(states: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Initialize many puzzles with a single embedding pass.
+    
+    This function deduplicates the words of all puzzles, embeds the unique words in
+    chunks of EMBEDDING_BATCH_SIZE (at most EMBEDDING_CONCURRENCY requests at once),
+    then fans the vectors out to each puzzle state. It returns throughput statistics.
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    
+    unique_words = list(dict.fromkeys(
+        word for state in states for word in state.get("remaining_words", [])
+    ))
+    chunks = [
+        unique_words[i:i + EMBEDDING_BATCH_SIZE]
+        for i in range(0, len(unique_words), EMBEDDING_BATCH_SIZE)
+    ]
+    logger.info(
+        f"Setting up {len(states)} puzzles: "
+        f"{len(unique_words)} unique words in {len(chunks)} requests"
+    )
+    
+    embeddings_model = _embeddings_model()
+    semaphore = asyncio.Semaphore(EMBEDDING_CONCURRENCY)
+    
+    async def embed_chunk(chunk: List[str]) -> List[List[float]]:
+        async with semaphore:
+            return await embeddings_model.aembed_documents(chunk)
+    
+    vectors: Dict[str, List[float]] = {}
+    try:
+        for chunk, chunk_vectors in zip(chunks, await asyncio.gather(*map(embed_chunk, chunks))):
+            vectors.update(zip(chunk, chunk_vectors))
+    except Exception as e:
+        logger.error(f"Error during batch puzzle setup: {e}")
+    
+    for state in states:
+        word_list = state.get("remaining_words", [])
+        if not word_list or any(word not in vectors for word in word_list):
+            state["puzzle_status"] = "error"
+            state["tool_status"] = "setup_failed"
+            continue
+        await _complete_setup(state, {word: vectors[word] for word in word_list})
+    
+    elapsed = loop.time() - started
+    total_words = sum(len(state.get("remaining_words", [])) for state in states)
+    stats = {
+        "puzzles": len(states),
+        "total_words": total_words,
+        "unique_words": len(unique_words),
+        "requests": len(chunks),
+        "seconds": round(elapsed, 3),
+        "words_per_second": round(total_words / elapsed, 1) if elapsed > 0 else None
+    }
+    logger.info(f"Batch setup complete: {stats}")
+    return stats
+
+
+def quantize_embeddings(embeddings: Mapping[str, Sequence[float]]) -> "QuantizedEmbeddings":
+    """Convert word vectors to the compact storage configured by EMBEDDING_STORAGE."""
+    from embedding_codec import QuantizedEmbeddings
+    
+    compact = QuantizedEmbeddings.encode(embeddings, EMBEDDING_STORAGE, EMBEDDING_DIMENSIONS)
+    logger.info(
+        f"Stored {len(compact)} embeddings as {compact.storage} x {compact.dimensions} "
+        f"({compact.nbytes} bytes)"
+    )
+    return compact
+
+
 async def get_embedvec_recommendation(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     Generate recommendations based on word embedding similarity.
@@ -93,26 +293,42 @@ async def get_embedvec_recommendation(state: Dict[str, Any]) -> Dict[str, Any]:
     This function analyzes word embeddings to find potentially related groups.
     """
     logger.info("Generating embedding-based recommendations...")
+    started = time.perf_counter()
     
     remaining_words = state.get("remaining_words", [])
     word_embeddings = state.get("word_embeddings", {})
     invalid_groups = state.get("invalid_groups", [])
+    session_id = state.get("session_id")
     
     if not remaining_words or len(remaining_words) < 4:
         state["puzzle_status"] = "insufficient_words"
         return state
         
-    if not word_embeddings:
+    if not word_embeddings and session_id is not None and session_id not in _candidate_indexes:
+        # Reuse the embeddings persisted at setup, e.g. after a worker restart
+        word_embeddings = load_session_embeddings(session_id, remaining_words)
+        
+    if not word_embeddings and session_id not in _candidate_indexes:
         state["puzzle_status"] = "error"
         state["tool_status"] = "embeddings_missing"
         return state
         
     try:
         # Get candidate groups based on embedding similarity
-        candidate_groups = await get_candidate_groups(remaining_words, word_embeddings, invalid_groups)
+        candidate_groups = await get_candidate_groups(
+            remaining_words, word_embeddings, invalid_groups,
+            session_id=session_id, solved_groups=solved_groups_of(state)
+        )
         
         if not candidate_groups:
-            state["active_recommender"] = "llm"
+            state["tool_to_use"] = "get_llm_recommendation"
+            return state
+        
+        # Escalate to the LLM before naming the group when the local signals say so
+        margin = candidate_margin(candidate_groups)
+        decision = get_router().route(margin, len(remaining_words), state.get("mistake_count", 0))
+        if decision["recommender"] == "llm":
+            # Hand over for this recommendation only; the next one is routed again
             state["tool_to_use"] = "get_llm_recommendation"
             return state
             
@@ -120,13 +336,13 @@ async def get_embedvec_recommendation(state: Dict[str, Any]) -> Dict[str, Any]:
         top_group = candidate_groups[0]["words"]
         
         # Validate with LLM to get connection reason
-        llm = ChatOpenAI(model=OPENAI_MODEL)
+        llm = _chat_model()
         connection_prompt = f"""
         These four words appear to be related: {', '.join(top_group)}
         What is the connection between them? Provide a concise, specific explanation.
         """
         
-        response = await llm.ainvoke([HumanMessage(content=connection_prompt)])
+        response = await llm.ainvoke(_prompt_messages(connection_prompt))
         connection_reason = response.content.strip()
         
         # Update state
@@ -137,17 +353,74 @@ async def get_embedvec_recommendation(state: Dict[str, Any]) -> Dict[str, Any]:
         }
         state["active_recommender"] = "embedding"
         state["tool_to_use"] = "apply_recommendation"
+        get_router().stats.record_latency("embedding", time.perf_counter() - started)
         
         logger.info(f"Embedding recommendation: {top_group} - {connection_reason}")
         
     except Exception as e:
         logger.error(f"Error in embedding recommendation: {e}")
-        state["active_recommender"] = "llm"
         state["tool_to_use"] = "get_llm_recommendation"
         
     return state
 
 
+async def get_wordplay_recommendation(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Generate recommendations from lexical wordplay features.
+    
+    This function looks for groups sharing a prefix, suffix, anagram, hidden word or
+    compound partner, and falls back to embedding recommendations when none is
+    confident enough.
+    """
+    logger.info("Generating wordplay-based recommendations...")
+    
+    remaining_words = state.get("remaining_words", [])
+    invalid_groups = state.get("invalid_groups", [])
+    session_id = state.get("session_id")
+    
+    if not remaining_words or len(remaining_words) < 4:
+        state["puzzle_status"] = "insufficient_words"
+        return state
+    
+    try:
+        index = _wordplay_indexes.get(session_id) if session_id is not None else None
+        if index is None or not set(remaining_words) <= set(index.words):
+            index = build_wordplay_index(remaining_words, WORDPLAY_WORDLIST)
+            if session_id is not None:
+                _wordplay_indexes[session_id] = index
+        
+        invalid_ids = {"_".join(sorted(group.get("words", []))) for group in invalid_groups}
+        proposals = index.propose_groups(remaining_words, invalid_ids)
+        if invalid_groups:
+            constraints = await build_constraints(state)
+            if not constraints.contradictory:
+                proposals = [
+                    proposal for proposal in proposals
+                    if constraints.is_feasible(proposal["words"])
+                ]
+        
+        if proposals and proposals[0]["score"] >= WORDPLAY_MIN_SCORE:
+            top_group = proposals[0]
+            state["recommendations"] = {
+                "group": top_group["words"],
+                "reason": top_group["reason"],
+                "source": "wordplay"
+            }
+            state["active_recommender"] = "wordplay"
+            state["tool_to_use"] = "apply_recommendation"
+            logger.info(f"Wordplay recommendation: {top_group['words']} - {top_group['reason']}")
+            return state
+        
+        logger.info("No confident wordplay group found")
+        
+    except Exception as e:
+        logger.error(f"Error in wordplay recommendation: {e}")
+    
+    state["active_recommender"] = "embedding"
+    state["tool_to_use"] = "get_embedvec_recommendation"
+    return state
+
+
 async def get_llm_recommendation(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     Generate recommendations using the LLM.
@@ -155,6 +428,7 @@ async def get_llm_recommendation(state: Dict[str, Any]) -> Dict[str, Any]:
     This function uses the LLM to find groups of related words and their connections.
     """
     logger.info("Generating LLM-based recommendations...")
+    started = time.perf_counter()
     
     remaining_words = state.get("remaining_words", [])
     invalid_groups = state.get("invalid_groups", [])
@@ -170,6 +444,9 @@ async def get_llm_recommendation(state: Dict[str, Any]) -> Dict[str, Any]:
         for group in invalid_groups:
             words_str = ", ".join(group.get("words", []))
             invalid_groups_str += f"- {words_str}\n"
+        
+        constraints = await build_constraints(state)
+        constraints_str = constraints.describe(FEASIBLE_PROMPT_LIMIT)
             
         # Create LLM prompt
         prompt = f"""
@@ -182,17 +459,33 @@ async def get_llm_recommendation(state: Dict[str, Any]) -> Dict[str, Any]:
         Invalid groups already tried:
         {invalid_groups_str if invalid_groups_str else "None yet."}
         
+        Constraints from the feedback so far:
+        {constraints_str if constraints_str else "None yet."}
+        
         Find ONE group of exactly 4 words that are related to each other from the remaining words.
         Respond with a JSON object with two keys:
         1. "words": a list of exactly 4 words
         2. "connection": a concise explanation of how they are connected
         """
         
-        llm = ChatOpenAI(model=OPENAI_MODEL)
-        response = await llm.ainvoke([HumanMessage(content=prompt)])
+        # Stream the answer and cut it off at the first invalid word, retrying
+        # straight away with the reason appended to the prompt
+        llm = _chat_model()
+        correction = ""
+        for _ in range(STREAM_RETRIES + 1):
+            validator = StreamValidator(remaining_words, invalid_groups, constraints)
+            try:
+                messages = _prompt_messages(prompt + correction)
+                content = await stream_validated(llm, messages, validator)
+                break
+            except EarlyRejection as rejection:
+                last_reason = rejection.reason
+                correction = f"""
+        Your previous answer was rejected because {last_reason}. Choose a different group.
+        """
+        else:
+            raise ValueError(f"LLM answers kept failing validation: {last_reason}")
         
-        # Extract JSON response
-        content = response.content
         # Find JSON content (between { and })
         json_start = content.find('{')
         json_end = content.rfind('}') + 1
@@ -211,6 +504,9 @@ async def get_llm_recommendation(state: Dict[str, Any]) -> Dict[str, Any]:
                 
             if len(recommended_words) != 4:
                 raise ValueError("Recommendation must contain exactly 4 words")
+            
+            if not constraints.contradictory and not constraints.is_feasible(recommended_words):
+                raise ValueError("Recommendation contradicts earlier feedback")
                 
             # Update state
             state["recommendations"] = {
@@ -221,6 +517,7 @@ async def get_llm_recommendation(state: Dict[str, Any]) -> Dict[str, Any]:
             state["active_recommender"] = "llm"
             state["tool_to_use"] = "apply_recommendation"
             state["retry_count"] = 0  # Reset retry count on success
+            get_router().stats.record_latency("llm", time.perf_counter() - started)
             
             logger.info(f"LLM recommendation: {recommended_words} - {connection}")
             
@@ -287,6 +584,15 @@ async def one_away_analyzer(state: Dict[str, Any]) -> Dict[str, Any]:
     error_words = latest_error.get("words", [])
     
     try:
+        # Only feasible corrections (3 of the error words plus one other) are offered
+        constraints = await build_constraints(state)
+        corrections = [", ".join(group) for group in constraints.groups_sharing(error_words, 3)]
+        corrections_str = ""
+        if corrections and len(corrections) <= FEASIBLE_PROMPT_LIMIT:
+            corrections_str = "The corrected group must be one of:\n" + "\n".join(
+                f"- {correction}" for correction in corrections
+            )
+        
         # Ask LLM to suggest a correction
         prompt = f"""
         In the New York Times Connection puzzle, this group was marked as "one-away" (one word away from being correct):
@@ -296,14 +602,16 @@ async def one_away_analyzer(state: Dict[str, Any]) -> Dict[str, Any]:
         
         Remaining words: {', '.join(remaining_words)}
         
+        {corrections_str}
+        
         Identify which 3 words from the original group form a theme, and which word from the remaining words completes the group.
         Respond with a JSON object with two keys:
         1. "words": a list of exactly 4 words (3 from original group + 1 from remaining)
         2. "connection": a concise explanation of how they are connected
         """
         
-        llm = ChatOpenAI(model=OPENAI_MODEL)
-        response = await llm.ainvoke([HumanMessage(content=prompt)])
+        llm = _chat_model()
+        response = await llm.ainvoke(_prompt_messages(prompt))
         
         # Extract JSON response
         content = response.content
@@ -324,6 +632,9 @@ async def one_away_analyzer(state: Dict[str, Any]) -> Dict[str, Any]:
                 
             if len(recommended_words) != 4:
                 raise ValueError("Recommendation must contain exactly 4 words")
+            
+            if not constraints.contradictory and not constraints.is_feasible(recommended_words):
+                raise ValueError("Recommendation contradicts earlier feedback")
                 
             # Update state
             state["recommendations"] = {
@@ -383,99 +694,200 @@ async def apply_recommendation(state: Dict[str, Any]) -> Dict[str, Any]:
 async def get_candidate_groups(
     words: List[str], 
     embeddings: Dict[str, List[float]], 
-    invalid_groups: List[Dict[str, Any]]
+    invalid_groups: List[Dict[str, Any]],
+    session_id: Optional[str] = None,
+    solved_groups: Optional[List[List[str]]] = None
 ) -> List[Dict[str, Any]]:
     """
     Generate candidate groups based on embedding similarity.
     
     This function finds groups of similar words by analyzing embedding similarity.
+    When a session_id is given, the session's candidate index is kept between calls
+    and only updated for the words solved and groups invalidated since the last call.
+    Only groups still feasible under the feedback constraints are returned; when
+    none of the index's groups is, the feasible groups are ranked directly.
     """
     logger.info(f"Generating candidate groups from {len(words)} words...")
     
-    # Calculate similarity matrix
-    similarity_matrix = {}
-    for word1 in words:
-        similarity_matrix[word1] = {}
-        embedding1 = embeddings.get(word1)
-        if not embedding1:
-            continue
-            
-        for word2 in words:
-            if word1 == word2:
-                continue
-                
-            embedding2 = embeddings.get(word2)
-            if not embedding2:
-                continue
-                
-            # Calculate cosine similarity
-            similarity = np.dot(embedding1, embedding2) / (np.linalg.norm(embedding1) * np.linalg.norm(embedding2))
-            similarity_matrix[word1][word2] = similarity
-    
-    # For each word, find top 3 most similar words
-    candidate_groups = []
-    for word in words:
-        if word not in similarity_matrix:
-            continue
-            
-        similar_words = sorted(
-            similarity_matrix[word].items(), 
-            key=lambda x: x[1], 
-            reverse=True
-        )[:3]
-        
-        group_words = [word] + [w for w, _ in similar_words]
-        
-        # Calculate group metric (average similarity between all pairs)
-        group_metric = 0
-        pair_count = 0
-        
-        for i in range(len(group_words)):
-            for j in range(i + 1, len(group_words)):
-                w1, w2 = group_words[i], group_words[j]
-                if w1 in similarity_matrix and w2 in similarity_matrix[w1]:
-                    group_metric += similarity_matrix[w1][w2]
-                    pair_count += 1
-                    
-        if pair_count > 0:
-            group_metric /= pair_count
-            
-            # Create a unique identifier for the group (sorted words)
-            group_id = "_".join(sorted(group_words))
-            
-            # Check if this group has been marked invalid
-            is_invalid = False
-            for invalid_group in invalid_groups:
-                invalid_words = set(invalid_group.get("words", []))
-                if set(group_words) == invalid_words:
-                    is_invalid = True
-                    break
-                    
-            if not is_invalid:
-                candidate_groups.append({
-                    "words": group_words,
-                    "metric": group_metric,
-                    "id": group_id
-                })
-    
-    # Remove duplicates based on group ID
-    unique_groups = {}
-    for group in candidate_groups:
-        if group["id"] not in unique_groups or group["metric"] > unique_groups[group["id"]]["metric"]:
-            unique_groups[group["id"]] = group
-    
-    # Sort by metric
-    sorted_groups = sorted(
-        unique_groups.values(), 
-        key=lambda x: x["metric"], 
-        reverse=True
-    )
+    index = _candidate_indexes.get(session_id) if session_id is not None else None
+    
+    # Words without an embedding cannot be indexed, so they never force a rebuild
+    indexed = index.positions if index is not None else {}
+    indexable_words = [
+        word for word in words
+        if EMBEDDING_ENSEMBLE or word in indexed or word in embeddings
+    ]
+    
+    if index is None or not index.sync(indexable_words, invalid_groups):
+        # Build the similarity matrix and candidate heap from scratch
+        index = await build_candidate_index(words, embeddings)
+        index.invalidate_groups(invalid_groups)
+        if session_id is not None:
+            _candidate_indexes[session_id] = index
+    
+    sorted_groups = index.ranked_groups()
+    if not invalid_groups:
+        # Without feedback every group is feasible
+        logger.info(f"Generated {len(sorted_groups)} candidate groups")
+        return sorted_groups
+    
+    constraints = await get_constraints(words, solved_groups or [], invalid_groups, session_id)
+    if not constraints.contradictory:
+        sorted_groups = [
+            group for group in sorted_groups if constraints.is_feasible(group["words"])
+        ]
+        if not sorted_groups:
+            feasible = [constraints.unmask(group) for group in constraints.groups]
+            sorted_groups = index.score_groups(feasible)
     
     logger.info(f"Generated {len(sorted_groups)} candidate groups")
     return sorted_groups
 
 
-async def run_planner(state: Dict[str, Any], llm: Optional[ChatOpenAI] = None) -> Dict[str, Any]:
+def get_embedding_ensemble() -> "EmbeddingEnsemble":
+    """Return the shared embedding ensemble configured by EMBEDDING_ENSEMBLE."""
+    from embedding_sources import EmbeddingEnsemble, parse_ensemble_spec
+    
+    global _embedding_ensemble
+    if _embedding_ensemble is None:
+        _embedding_ensemble = EmbeddingEnsemble(parse_ensemble_spec(EMBEDDING_ENSEMBLE))
+    return _embedding_ensemble
+
+
+async def build_candidate_index(
+    words: List[str], embeddings: Dict[str, List[float]]
+) -> "CandidateIndex":
+    """
+    Build a candidate index for a word list.
+    
+    In ensemble mode the similarity matrix is the weighted combination of every
+    configured source, computed in one vectorized pass over the cached per-source
+    matrices; otherwise it is the cosine similarity of the given embeddings, computed
+    on their compact codes when they are quantized.
+    """
+    from candidate_index import CandidateIndex
+    
+    if not EMBEDDING_ENSEMBLE:
+        return CandidateIndex.from_embeddings(words, embeddings)
+    
+    ensemble = get_embedding_ensemble()
+    if not EMBEDDING_DIMENSIONS:
+        # Truncated vectors would not match the full ones the ensemble fetches itself
+        ensemble.seed(f"openai:{EMBEDDING_MODEL}", embeddings)
+    await ensemble.prepare(words)
+    return CandidateIndex(words, ensemble.similarity(words))
+
+
+def solved_groups_of(state: Dict[str, Any]) -> List[List[str]]:
+    """Return the word lists of the groups solved so far."""
+    return [
+        group.get("words", [])
+        for groups in state.get("correct_groups", {}).values()
+        for group in groups
+    ]
+
+
+async def get_constraints(
+    words: List[str],
+    solved_groups: List[List[str]],
+    invalid_groups: List[Dict[str, Any]],
+    session_id: Optional[str] = None
+) -> "ConstraintEngine":
+    """
+    Return the constraint engine for the feedback on a set of remaining words.
+    
+    The engine is built in a worker thread, since propagation is CPU-bound, and
+    kept per session: it is rebuilt only when the words or the feedback change,
+    not on every recommender that consults it.
+    """
+    from constraint_engine import ConstraintEngine
+    
+    key = (
+        tuple(words),
+        tuple(tuple(group) for group in solved_groups),
+        tuple(
+            (tuple(group.get("words", [])), group.get("error_type", ""))
+            for group in invalid_groups
+        )
+    )
+    cached = _constraint_engines.get(session_id) if session_id is not None else None
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    engine = await asyncio.to_thread(ConstraintEngine, words, solved_groups, invalid_groups)
+    if session_id is not None:
+        _constraint_engines[session_id] = (key, engine)
+    return engine
+
+
+async def build_constraints(state: Dict[str, Any]) -> "ConstraintEngine":
+    """Encode the feedback recorded in a state as constraints over its remaining words."""
+    return await get_constraints(
+        state.get("remaining_words", []),
+        solved_groups_of(state),
+        state.get("invalid_groups", []),
+        state.get("session_id")
+    )
+
+
+def get_endgame_recommendation(state: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Recommend a group without any model call once few words remain.
+    
+    This function enumerates the splits of the remaining words consistent with the
+    feedback so far and ranks them with the session's similarity matrix, or the
+    state's embeddings. It returns None above ENDGAME_WORDS words, when no split
+    is consistent, or when there is nothing to rank unforced splits by, so that the
+    regular workflow recommends instead.
+    """
+    remaining_words = state.get("remaining_words", [])
+    if not remaining_words or len(remaining_words) > ENDGAME_WORDS:
+        return None
+    
+    from endgame_solver import solve_endgame
+    
+    result = solve_endgame(
+        remaining_words,
+        solved_groups_of(state),
+        state.get("invalid_groups", []),
+        _endgame_similarity(state.get("session_id"), state.get("word_embeddings", {}))
+    )
+    if result is None:
+        return None
+    return {"group": result["group"], "reason": result["reason"], "source": "endgame"}
+
+
+def _endgame_similarity(
+    session_id: Optional[str], embeddings: Dict[str, List[float]]
+) -> Optional[Callable[[str, str], float]]:
+    """Return a word similarity function from the session index or the given embeddings."""
+    index = _candidate_indexes.get(session_id) if session_id is not None else None
+    if index is None and embeddings:
+        from candidate_index import CandidateIndex
+        
+        index = CandidateIndex.from_embeddings(list(embeddings), embeddings)
+    if index is None:
+        return None
+    
+    def similarity(a: str, b: str) -> float:
+        if a not in index.positions or b not in index.positions:
+            return 0.0
+        return float(index.similarity[index.positions[a], index.positions[b]])
+    
+    return similarity
+
+
+def get_router() -> RecommenderRouter:
+    """Return the shared recommender router configured by ROUTING_POLICY and ROUTER_STATS."""
+    global _router
+    if _router is None:
+        stats = RecommenderStats()
+        if ROUTER_STATS:
+            stats.load_report(ROUTER_STATS)
+        _router = RecommenderRouter(parse_policy_spec(ROUTING_POLICY), stats)
+    return _router
+
+
+async def run_planner(state: Dict[str, Any], llm: Optional["ChatOpenAI"] = None) -> Dict[str, Any]:
     """
     Plan the next steps for solving the puzzle.
     
@@ -488,13 +900,14 @@ async def run_planner(state: Dict[str, Any], llm: Optional[ChatOpenAI] = None) -
     
     # Initialize LLM if not provided
     if llm is None:
-        llm = ChatOpenAI(model=OPENAI_MODEL)
+        llm = _chat_model()
     
     # Prepare input for the LLM
     instructions = """
     You are a planner for a Connection Puzzle solver. Based on the current state,
     decide which tool should be used next. Options are:
     - setup_puzzle: Initial puzzle setup
+    - get_wordplay_recommendation: Get recommendation from wordplay features (no model call)
     - get_embedvec_recommendation: Get recommendation using embedding similarity
     - get_llm_recommendation: Get recommendation using LLM
     - get_manual_recommendation: Get recommendation from human
@@ -511,7 +924,7 @@ async def run_planner(state: Dict[str, Any], llm: Optional[ChatOpenAI] = None) -
     
     try:
         # Call the LLM to determine the next action
-        response = await llm.ainvoke([HumanMessage(content=prompt)])
+        response = await llm.ainvoke(_prompt_messages(prompt))
         
         # Parse the response and update the state
         try:
@@ -523,6 +936,8 @@ async def run_planner(state: Dict[str, Any], llm: Optional[ChatOpenAI] = None) -
                 state["tool_to_use"] = "ABORT"
             elif "setup_puzzle" in content:
                 state["tool_to_use"] = "setup_puzzle"
+            elif "get_wordplay_recommendation" in content:
+                state["tool_to_use"] = "get_wordplay_recommendation"
             elif "get_embedvec_recommendation" in content:
                 state["tool_to_use"] = "get_embedvec_recommendation"
             elif "get_llm_recommendation" in content:
@@ -549,6 +964,35 @@ async def run_planner(state: Dict[str, Any], llm: Optional[ChatOpenAI] = None) -
     return state
 
 
+def route_after_recommender(state: Dict[str, Any]) -> str:
+    """
+    Decide where setup or a recommender node hands over.
+    
+    A finished setup goes to the wordplay recommender, and a recommender that passes
+    the request on (wordplay to embedding, embedding to LLM when the router
+    escalates) goes straight to the next recommender, so the planner neither spends
+    a model call on it nor overrides the routing decision. Everything else returns
+    to the planner, including a node that gave up (missing embeddings, too few
+    words) and left tool_to_use pointing at itself.
+    """
+    tool = state.get("tool_to_use")
+    if tool in RECOMMENDER_HANDOFFS and state.get("puzzle_status") not in STOPPED_STATUSES:
+        return tool
+    return "run_planner"
+
+
+# Puzzle statuses set by a node that could not recommend
+STOPPED_STATUSES = ("error", "insufficient_words")
+
+
+RECOMMENDER_HANDOFFS = {
+    "get_wordplay_recommendation": "get_wordplay_recommendation",
+    "get_embedvec_recommendation": "get_embedvec_recommendation",
+    "get_llm_recommendation": "get_llm_recommendation",
+    "run_planner": "run_planner"
+}
+
+
 def determine_next_action(state: Dict[str, Any]) -> str:
     """
     Determine the next action to take based on the tool_to_use field.
@@ -558,6 +1002,8 @@ def determine_next_action(state: Dict[str, Any]) -> str:
     - Raises error if tool is ABORT
     - Returns END constant if tool is END
     """
+    from langgraph.graph import END
+    
     tool = state.get("tool_to_use")
     
     if tool == "ABORT":
@@ -573,7 +1019,7 @@ def determine_next_action(state: Dict[str, Any]) -> str:
     return tool
 
 
-def create_workflow_graph() -> StateGraph:
+def create_workflow_graph() -> "StateGraph":
     """
     Create a workflow graph for solving puzzles.
     
@@ -582,6 +1028,8 @@ def create_workflow_graph() -> StateGraph:
     - Adds conditional edges based on the next action
     - Sets run_planner as the entry point and uses a memory checkpoint
     """
+    from langgraph.graph import END, StateGraph
+    
     # Initialize the workflow graph with a memory checkpoint
     workflow = StateGraph(PuzzleState)
     
@@ -591,6 +1039,7 @@ def create_workflow_graph() -> StateGraph:
     
     # Add nodes for each tool/step
     workflow.add_node("setup_puzzle", setup_puzzle)
+    workflow.add_node("get_wordplay_recommendation", get_wordplay_recommendation)
     workflow.add_node("get_embedvec_recommendation", get_embedvec_recommendation)
     workflow.add_node("get_llm_recommendation", get_llm_recommendation)
     workflow.add_node("get_manual_recommendation", get_manual_recommendation)
@@ -603,17 +1052,27 @@ def create_workflow_graph() -> StateGraph:
         determine_next_action,
         {
             "setup_puzzle": "setup_puzzle",
+            "get_wordplay_recommendation": "get_wordplay_recommendation",
             "get_embedvec_recommendation": "get_embedvec_recommendation",
             "get_llm_recommendation": "get_llm_recommendation",
             "get_manual_recommendation": "get_manual_recommendation",
             "one_away_analyzer": "one_away_analyzer",
-            "apply_recommendation": "apply_recommendation"
+            "apply_recommendation": "apply_recommendation",
+            END: END
         }
     )
     
-    # Connect all tool nodes back to the planner
-    workflow.add_edge("setup_puzzle", "run_planner")
-    workflow.add_edge("get_embedvec_recommendation", "run_planner")
+    # Setup and recommenders hand over to the next recommender or back to the planner
+    workflow.add_conditional_edges(
+        "get_wordplay_recommendation", route_after_recommender, RECOMMENDER_HANDOFFS
+    )
+    workflow.add_conditional_edges(
+        "get_embedvec_recommendation", route_after_recommender, RECOMMENDER_HANDOFFS
+    )
+    
+    workflow.add_conditional_edges("setup_puzzle", route_after_recommender, RECOMMENDER_HANDOFFS)
+    
+    # Connect all other tool nodes back to the planner
     workflow.add_edge("get_llm_recommendation", "run_planner")
     workflow.add_edge("get_manual_recommendation", "run_planner")
     workflow.add_edge("one_away_analyzer", "run_planner")
@@ -625,15 +1084,17 @@ def create_workflow_graph() -> StateGraph:
     return workflow
 
 
-def create_webui_workflow_graph() -> StateGraph:
+def create_webui_workflow_graph() -> "StateGraph":
     """
     Create a simplified workflow graph for a web interface.
     
     Implementation addresses US005:
     - Defines nodes for key puzzle-solving steps
     - Excludes the setup_puzzle node
-    - Sets run_planner as the entry point and uses a memory checkpoint
+    - Enters at the preselected tool in tool_to_use, defaulting to run_planner
     """
+    from langgraph.graph import END, StateGraph
+    
     # Initialize the workflow graph with a memory checkpoint
     workflow = StateGraph(PuzzleState)
     
@@ -642,6 +1103,7 @@ def create_webui_workflow_graph() -> StateGraph:
     workflow.add_node("run_planner", run_planner)
     
     # Add nodes for web UI relevant steps (excluding setup_puzzle)
+    workflow.add_node("get_wordplay_recommendation", get_wordplay_recommendation)
     workflow.add_node("get_embedvec_recommendation", get_embedvec_recommendation)
     workflow.add_node("get_llm_recommendation", get_llm_recommendation)
     workflow.add_node("get_manual_recommendation", get_manual_recommendation)
@@ -653,30 +1115,97 @@ def create_webui_workflow_graph() -> StateGraph:
         "run_planner",
         determine_next_action,
         {
+            "get_wordplay_recommendation": "get_wordplay_recommendation",
             "get_embedvec_recommendation": "get_embedvec_recommendation",
             "get_llm_recommendation": "get_llm_recommendation",
             "get_manual_recommendation": "get_manual_recommendation",
             "one_away_analyzer": "one_away_analyzer",
-            "apply_recommendation": "apply_recommendation"
+            "apply_recommendation": "apply_recommendation",
+            END: END
         }
     )
     
-    # Connect all tool nodes back to the planner
-    workflow.add_edge("get_embedvec_recommendation", "run_planner")
+    # Setup and recommenders hand over to the next recommender or back to the planner
+    workflow.add_conditional_edges(
+        "get_wordplay_recommendation", route_after_recommender, RECOMMENDER_HANDOFFS
+    )
+    workflow.add_conditional_edges(
+        "get_embedvec_recommendation", route_after_recommender, RECOMMENDER_HANDOFFS
+    )
+    
+    # Connect all other tool nodes back to the planner
     workflow.add_edge("get_llm_recommendation", "run_planner")
     workflow.add_edge("get_manual_recommendation", "run_planner")
     workflow.add_edge("one_away_analyzer", "run_planner")
     workflow.add_edge("apply_recommendation", "run_planner")
     
-    # Set the entry point to the planner
-    workflow.set_entry_point("run_planner")
+    # Enter at the tool preselected by the active recommender, or at the planner
+    workflow.set_conditional_entry_point(
+        determine_next_action,
+        {
+            "run_planner": "run_planner",
+            "get_wordplay_recommendation": "get_wordplay_recommendation",
+            "get_embedvec_recommendation": "get_embedvec_recommendation",
+            "get_llm_recommendation": "get_llm_recommendation",
+            "one_away_analyzer": "one_away_analyzer"
+        }
+    )
     
     return workflow
 
 
+def get_checkpointer():
+    """
+    Return the checkpointer shared by all workflow runs.
+    
+    This is a SQLite-backed checkpointer at CHECKPOINT_DB, or an in-process
+    MemorySaver when CHECKPOINT_DB is "memory".
+    """
+    global _checkpointer
+    if _checkpointer is None:
+        from langgraph.checkpoint.memory import MemorySaver
+        from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+        from checkpoint_store import SQLiteCheckpointSaver
+        
+        if CHECKPOINT_DB == "memory":
+            # Checkpoints never leave the process, so quantized embeddings can be pickled
+            _checkpointer = MemorySaver(serde=JsonPlusSerializer(pickle_fallback=True))
+        else:
+            _checkpointer = SQLiteCheckpointSaver(CHECKPOINT_DB)
+    return _checkpointer
+
+
+def flush_checkpoints() -> None:
+    """Write any batched checkpoints to disk."""
+    if hasattr(_checkpointer, "flush"):
+        _checkpointer.flush()
+
+
+def save_session_embeddings(session_id: str, embeddings: "QuantizedEmbeddings") -> None:
+    """Persist a session's word embeddings so a restarted worker does not re-embed."""
+    checkpointer = get_checkpointer()
+    if hasattr(checkpointer, "save_embeddings"):
+        checkpointer.save_embeddings(session_id, embeddings)
+
+
+def load_session_embeddings(session_id: str, words: List[str]) -> Mapping[str, Sequence[float]]:
+    """Return the persisted word embeddings of a session, if any."""
+    checkpointer = get_checkpointer()
+    if hasattr(checkpointer, "load_embeddings"):
+        return checkpointer.load_embeddings(session_id, words)
+    return {}
+
+
+def _thread_config(thread_id: str) -> Dict[str, Any]:
+    """Return the run config selecting a checkpoint thread."""
+    return {"configurable": {"thread_id": thread_id}}
+
+
+@traced
 async def run_workflow(
     initial_state: Dict[str, Any], 
-    workflow_graph: Optional[StateGraph] = None
+    workflow_graph: Optional["StateGraph"] = None,
+    thread_id: Optional[str] = None
 ) -> Dict[str, Any]:
     """
     Execute a workflow to solve puzzles.
@@ -685,6 +1214,9 @@ async def run_workflow(
     - Processes workflow graph asynchronously
     - Handles human-in-the-loop inputs for setup and responses
     - Updates workflow state based on user inputs and recommendations
+    
+    Checkpoints are stored under thread_id (the session_id by default), so an
+    interrupted run can be continued with resume_workflow.
     """
     # Use the default workflow if none is provided
     if workflow_graph is None:
@@ -692,12 +1224,15 @@ async def run_workflow(
     
     logger.info("Starting workflow execution with initial state: %s", initial_state)
     
+    if thread_id is None:
+        thread_id = initial_state.get("session_id", "default")
+    
     # Create a compiled version of the workflow
-    compiled_workflow = workflow_graph.compile(checkpointer=MemorySaver())
+    compiled_workflow = workflow_graph.compile(checkpointer=get_checkpointer())
     
     try:
         # Execute the workflow asynchronously
-        final_state = await compiled_workflow.arun(initial_state)
+        final_state = await compiled_workflow.ainvoke(initial_state, _thread_config(thread_id))
         logger.info("Workflow completed with final state: %s", final_state)
         return final_state
     except Exception as e:
@@ -707,93 +1242,171 @@ async def run_workflow(
             "error": str(e),
             "puzzle_status": "failed"
         }
+    finally:
+        flush_checkpoints()
+
+
+async def resume_workflow(
+    thread_id: str,
+    workflow_graph: Optional["StateGraph"] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Resume a workflow run from its latest checkpoint.
+    
+    This function continues an in-flight run after a restart from the stored state,
+    without repeating setup or the model calls already made. A finished run returns
+    its final state; an unknown thread returns None.
+    """
+    if workflow_graph is None:
+        workflow_graph = create_workflow_graph()
+    
+    compiled_workflow = workflow_graph.compile(checkpointer=get_checkpointer())
+    config = _thread_config(thread_id)
+    
+    snapshot = await compiled_workflow.aget_state(config)
+    if not snapshot.values:
+        return None
+    if not snapshot.next:
+        return snapshot.values
+    
+    logger.info("Resuming workflow %s at %s", thread_id, snapshot.next)
+    try:
+        return await compiled_workflow.ainvoke(None, config)
+    finally:
+        flush_checkpoints()
 
 
-def initialize_state_from_puzzle_state(puzzle_state: Dict[str, Any]) -> Dict[str, Any]:
+def initialize_state_from_puzzle_state(puzzle_state: "PuzzleRecord") -> Dict[str, Any]:
     """
     Convert the web UI puzzle state into a workflow state.
     
-    This helper function converts the global puzzle_state from the web UI into
-    the format expected by the workflow manager.
-    """
-    return {
-        "puzzle_status": puzzle_state.get("status", "Ready"),
-        "tool_status": "ready",
-        "mistake_count": 0,
-        "retry_count": 0,
-        "remaining_words": puzzle_state.get("remaining_words", []),
-        "correct_groups": puzzle_state.get("correct_groups", {
-            "yellow": [],
-            "green": [],
-            "blue": [],
-            "purple": []
-        }),
-        "invalid_groups": puzzle_state.get("invalid_groups", []),
-        "active_recommender": puzzle_state.get("active_recommender", "default"),
-        "tool_to_use": "setup_puzzle",
-        "recommendations": {},
-        "word_embeddings": {}
-    }
+    This helper function expands the compact PuzzleRecord of a web UI session into
+    the dict state the workflow graph runs on.
+    """
+    return puzzle_state.to_workflow_state()
 
 
-def update_puzzle_state_from_workflow(puzzle_state: Dict[str, Any], workflow_state: Dict[str, Any]) -> Dict[str, Any]:
+def update_puzzle_state_from_workflow(
+    puzzle_state: "PuzzleRecord", workflow_state: Dict[str, Any]
+) -> "PuzzleRecord":
     """
     Update the web UI puzzle state based on workflow state.
     
-    This helper function updates the global puzzle_state based on the results of
-    the workflow execution.
+    This helper function folds the results of a workflow execution back into the
+    session's PuzzleRecord.
     """
-    # Update remaining words
-    puzzle_state["remaining_words"] = workflow_state.get("remaining_words", puzzle_state.get("remaining_words", []))
-    
-    # Update correct groups
-    puzzle_state["correct_groups"] = workflow_state.get("correct_groups", puzzle_state.get("correct_groups", {
-        "yellow": [],
-        "green": [],
-        "blue": [],
-        "purple": []
-    }))
-    
-    # Update invalid groups
-    puzzle_state["invalid_groups"] = workflow_state.get("invalid_groups", puzzle_state.get("invalid_groups", []))
+    puzzle_state.update_from_workflow(workflow_state)
+    return puzzle_state
+
+
+def apply_feedback(
+    puzzle_state: "PuzzleRecord",
+    group: List[str],
+    color: str = "",
+    response: str = "",
+    reason: str = "",
+    source: Optional[str] = None,
+    record_outcome: bool = True
+) -> "PuzzleRecord":
+    """
+    Apply feedback on a recommended group to the web UI puzzle state.
+    
+    A color marks the group correct and removes its words from the remaining words;
+    "one-away" and "not-correct" record the group as invalid, and "not-correct"
+    counts as a mistake. One-away analysis is left to the caller, since it needs a
+    model call. The outcome is credited to the recommender that produced the group
+    (source, by default the active recommender) in the routing statistics, unless
+    record_outcome is False, e.g. for a group revealed rather than recommended.
+    A group with words outside the puzzle raises ValueError.
+    """
+    correct = color in ["yellow", "green", "blue", "purple"]
     
-    # Update active recommender
-    puzzle_state["active_recommender"] = workflow_state.get("active_recommender", puzzle_state.get("active_recommender", "default"))
+    if correct:
+        # Handle correct group
+        puzzle_state.solve_group(color, group, reason)
+        
+    elif response == "one-away":
+        # Handle one-away error
+        puzzle_state.reject_group(group, reason, "one-away")
+        
+    elif response == "not-correct":
+        # Handle invalid group
+        puzzle_state.reject_group(group, reason, "not-correct")
+        puzzle_state.mistake_count += 1
+        
+        # Check if we've reached the error limit
+        if puzzle_state.mistake_count >= MAX_ERRORS:
+            logger.info(f"Maximum errors reached: {puzzle_state.mistake_count}")
     
-    # Update status
-    puzzle_state["status"] = workflow_state.get("puzzle_status", puzzle_state.get("status", "Ready"))
+    # Credit the outcome only once the group was accepted as words of the puzzle
+    if record_outcome and (correct or response in ["one-away", "not-correct"]):
+        get_router().stats.record_outcome(source or puzzle_state.active_recommender, correct)
     
+    puzzle_state.status = f"Feedback processed: {response if response else color}"
     return puzzle_state
 
 
-async def get_recommendation_from_workflow(puzzle_state: Dict[str, Any]) -> Dict[str, Any]:
+def _restore_candidate_index(puzzle_state: "PuzzleRecord") -> None:
+    """
+    Rebuild a session's candidate index from the embeddings kept in its record.
+    
+    This covers a worker that never saw the session's setup, or that holds an index
+    for an older puzzle of the same session. An index that is only behind the record
+    is brought up to date instead; one whose words no longer match is rebuilt.
+    """
+    index = _candidate_indexes.get(puzzle_state.session_id)
+    remaining_words = puzzle_state.remaining_words
+    invalid_groups = puzzle_state.invalid_groups
+    if index is not None and index.sync(remaining_words, invalid_groups):
+        return
+    if puzzle_state.embeddings is None or EMBEDDING_ENSEMBLE:
+        # Leave the rebuild to the embedding recommender rather than keep a stale index
+        _candidate_indexes.pop(puzzle_state.session_id, None)
+        return
+    from candidate_index import CandidateIndex
+    
+    index = CandidateIndex.from_embeddings(list(puzzle_state.index.words), puzzle_state.embeddings)
+    index.remove_words(set(index.words) - set(remaining_words))
+    index.invalidate_groups(invalid_groups)
+    _candidate_indexes[puzzle_state.session_id] = index
+
+
+@traced
+async def get_recommendation_from_workflow(puzzle_state: "PuzzleRecord") -> Dict[str, Any]:
     """
     Generate a recommendation using the workflow manager.
     
     This function initializes a workflow state from the puzzle state,
     runs the workflow for one step to get a recommendation, and returns it.
+    In the endgame the recommendation is computed locally instead.
     """
     # Initialize workflow state from puzzle state
     workflow_state = initialize_state_from_puzzle_state(puzzle_state)
     
+    _restore_candidate_index(puzzle_state)
+    endgame = get_endgame_recommendation(workflow_state)
+    if endgame is not None:
+        return endgame
+    
     # Create a webui workflow graph (skips setup steps)
     workflow_graph = create_webui_workflow_graph()
     
-    # Define a custom entry point for recommendation
-    if puzzle_state.get("active_recommender") == "embedding":
-        workflow_state["tool_to_use"] = "get_embedvec_recommendation"
-    elif puzzle_state.get("active_recommender") == "llm":
-        workflow_state["tool_to_use"] = "get_llm_recommendation"
+    # Define a custom entry point for recommendation. The recommenders are tried
+    # cheapest first on every recommendation: wordplay hands over to the embeddings,
+    # which ask the router whether to escalate to the LLM.
+    if puzzle_state.active_recommender in ("wordplay", "embedding", "llm"):
+        workflow_state["tool_to_use"] = "get_wordplay_recommendation"
     else:
         # Default to run_planner to decide
         workflow_state["tool_to_use"] = "run_planner"
     
     # Execute the workflow for one step to get a recommendation
-    compiled_workflow = workflow_graph.compile(checkpointer=MemorySaver())
+    compiled_workflow = workflow_graph.compile(checkpointer=get_checkpointer())
+    thread_id = f"{workflow_state['session_id']}:webui"
     
     try:
         # Execute the workflow with a limit of 1 step
-        final_state = await compiled_workflow.arun(workflow_state)
+        final_state = await compiled_workflow.ainvoke(workflow_state, _thread_config(thread_id))
         
         # Extract the recommendation
         recommendation = final_state.get("recommendations", {})
@@ -810,19 +1423,29 @@ async def get_recommendation_from_workflow(puzzle_state: Dict[str, Any]) -> Dict
             "reason": f"Error generating recommendation: {str(e)}",
             "source": "error"
         }
+    finally:
+        flush_checkpoints()
 
 
-async def analyze_one_away(puzzle_state: Dict[str, Any]) -> Dict[str, Any]:
+@traced
+async def analyze_one_away(puzzle_state: "PuzzleRecord") -> Dict[str, Any]:
     """
     Analyze a one-away error using the workflow manager.
     
     This function initializes a workflow state from the puzzle state,
-    runs the one_away_analyzer, and returns the recommendation.
+    runs the one_away_analyzer, and returns the recommendation. In the endgame
+    the one-away feedback is resolved locally instead.
     """
     # Initialize workflow state from puzzle state
     workflow_state = initialize_state_from_puzzle_state(puzzle_state)
+    
+    endgame = get_endgame_recommendation(workflow_state)
+    if endgame is not None:
+        return endgame
     workflow_state["tool_to_use"] = "one_away_analyzer"
     
+    from langgraph.graph import StateGraph
+    
     # Create a simplified workflow just for one-away analysis
     workflow = StateGraph(PuzzleState)
     
@@ -830,11 +1453,12 @@ async def analyze_one_away(puzzle_state: Dict[str, Any]) -> Dict[str, Any]:
     workflow.set_entry_point("one_away_analyzer")
     
     # Execute the workflow
-    compiled_workflow = workflow.compile(checkpointer=MemorySaver())
+    compiled_workflow = workflow.compile(checkpointer=get_checkpointer())
+    thread_id = f"{workflow_state['session_id']}:one_away"
     
     try:
         # Execute the workflow
-        final_state = await compiled_workflow.arun(workflow_state)
+        final_state = await compiled_workflow.ainvoke(workflow_state, _thread_config(thread_id))
         
         # Extract the recommendation
         recommendation = final_state.get("recommendations", {})
@@ -851,6 +1475,8 @@ async def analyze_one_away(puzzle_state: Dict[str, Any]) -> Dict[str, Any]:
             "reason": f"Error analyzing one-away error: {str(e)}",
             "source": "error"
         }
+    finally:
+        flush_checkpoints()
 
 
 if __name__ == "__main__":
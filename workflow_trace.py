@@ -0,0 +1,761 @@
+"""
+Workflow Trace Recording and Replay for Connection Puzzle Solver
+
+This module records what a workflow run did so that it can be replayed offline.
+While WORKFLOW_TRACE_DIR is set, every call of a traced entry point (run_workflow,
+get_recommendation_from_workflow, analyze_one_away) writes one trace file holding:
+
+- the entry point's arguments, the settings and router statistics in effect, and
+  its result;
+- every request to a chat or embeddings model with its response and timing
+  (streamed answers keep the arrival time of each chunk);
+- the input and duration of every workflow node.
+
+Traces are gzip-compressed JSON lines, one event per line; embedding vectors are
+stored as base64 float32.
+
+A replay re-runs the entry point with the recorded arguments. The models answer
+from the trace, with their original latency or none at all, so CPU-side overhead
+can be profiled and regressions bisected without network calls:
+
+    python workflow_trace.py show trace.jsonl.gz
+    python workflow_trace.py replay trace.jsonl.gz [--latency zero] [--repeat 5] [--profile]
+"""
+
+import abc
+import argparse
+import asyncio
+import base64
+import functools
+import gzip
+import hashlib
+import inspect
+import json
+import logging
+import os
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Directory receiving one trace file per traced call; empty disables recording
+TRACE_DIR = os.environ.get("WORKFLOW_TRACE_DIR", "")
+
+TRACE_VERSION = 1
+
+# workflow_manager settings recorded with a trace and restored on replay
+TRACE_SETTINGS = [
+    "OPENAI_MODEL",
+    "EMBEDDING_MODEL",
+    "EMBEDDING_ENSEMBLE",
+    "EMBEDDING_STORAGE",
+    "EMBEDDING_DIMENSIONS",
+    "MAX_ERRORS",
+    "RETRY_LIMIT",
+    "STREAM_RETRIES",
+    "WORDPLAY_WORDLIST",
+    "WORDPLAY_MIN_SCORE",
+    "ENDGAME_WORDS",
+    "FEASIBLE_PROMPT_LIMIT",
+]
+
+_active_trace: ContextVar[Optional["_TraceRun"]] = ContextVar("workflow_trace", default=None)
+_active_node_recorder: ContextVar[Optional[Any]] = ContextVar("workflow_trace_nodes", default=None)
+_hook_registered = False
+
+
+class TraceMismatchError(LookupError):
+    """Raised when a replayed run makes a model call the trace has no response for."""
+
+
+# Encoding
+
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode("ascii")
+
+
+def _encode_floats(vectors: Any) -> Dict[str, Any]:
+    import numpy as np
+
+    matrix = np.asarray(vectors, dtype=np.float32)
+    return {"shape": list(matrix.shape), "float32": _b64(matrix.tobytes())}
+
+
+def _decode_floats(data: Dict[str, Any]) -> List[Any]:
+    import numpy as np
+
+    return (
+        np.frombuffer(base64.b64decode(data["float32"]), dtype=np.float32)
+        .reshape(data["shape"])
+        .tolist()
+    )
+
+
+def encode_value(value: Any, embeddings: bool = True) -> Any:
+    """
+    Convert a value to JSON.
+
+    Puzzle records and quantized embeddings are tagged so that decode_value can
+    rebuild them; without embeddings, quantized embeddings are only described.
+    Other objects are replaced by their repr.
+    """
+    from embedding_codec import QuantizedEmbeddings
+    from puzzle_record import PuzzleRecord
+
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, PuzzleRecord):
+        return {"__puzzle_record__": _b64(value.to_bytes(include_embeddings=embeddings))}
+    if isinstance(value, QuantizedEmbeddings):
+        return {"__quantized_embeddings__": _b64(value.to_bytes())} if embeddings else repr(value)
+    if isinstance(value, dict):
+        return {str(key): encode_value(item, embeddings) for key, item in value.items()}
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return [encode_value(item, embeddings) for item in value]
+    return repr(value)
+
+
+def decode_value(value: Any) -> Any:
+    """Rebuild a value converted by encode_value."""
+    if isinstance(value, dict):
+        if set(value) == {"__puzzle_record__"}:
+            from puzzle_record import PuzzleRecord
+
+            return PuzzleRecord.from_bytes(base64.b64decode(value["__puzzle_record__"]))
+        if set(value) == {"__quantized_embeddings__"}:
+            from embedding_codec import QuantizedEmbeddings
+
+            return QuantizedEmbeddings.from_bytes(
+                base64.b64decode(value["__quantized_embeddings__"])
+            )
+        return {key: decode_value(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [decode_value(item) for item in value]
+    return value
+
+
+def _recordable(value: Any) -> bool:
+    """Check whether an entry point argument survives encode_value unchanged in kind."""
+    from embedding_codec import QuantizedEmbeddings
+    from puzzle_record import PuzzleRecord
+
+    return value is None or isinstance(
+        value, (str, int, float, bool, dict, list, tuple, PuzzleRecord, QuantizedEmbeddings)
+    )
+
+
+def _message_dicts(messages: Any) -> List[Dict[str, Any]]:
+    """Describe the input of a chat model call as role/content pairs."""
+    if isinstance(messages, str):
+        return [{"role": "human", "content": messages}]
+    return [
+        {"role": getattr(message, "type", "human"), "content": getattr(message, "content", message)}
+        for message in messages
+    ]
+
+
+def request_key(kind: str, method: str, request: Dict[str, Any]) -> str:
+    """Identify a model request by its model, method and payload."""
+    payload = json.dumps([kind, method, request], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def _current_node() -> Optional[str]:
+    """Return the workflow node running in the current context, if any."""
+    from langchain_core.runnables.config import var_child_runnable_config
+
+    config = var_child_runnable_config.get() or {}
+    return config.get("metadata", {}).get("langgraph_node")
+
+
+# Recording and replay
+
+
+@functools.lru_cache(maxsize=1)
+def _node_recorder_class():
+    """Define the callback handler, importing LangChain on first use."""
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class _NodeRecorder(BaseCallbackHandler):
+        """LangChain callback handler adding the input and duration of each node to a trace."""
+
+        def __init__(self, trace: "_TraceRun"):
+            self.trace = trace
+            self._starts: Dict[Any, tuple] = {}
+
+        def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+            node = (metadata or {}).get("langgraph_node")
+            if node is not None and kwargs.get("name") == node and not node.startswith("__"):
+                self._starts[run_id] = (
+                    node,
+                    self.trace.offset(),
+                    encode_value(inputs, embeddings=False),
+                )
+
+        def on_chain_end(self, outputs, *, run_id, **kwargs):
+            if run_id in self._starts:
+                node, started, inputs = self._starts.pop(run_id)
+                self.trace.add(
+                    {
+                        "type": "node",
+                        "node": node,
+                        "started": started,
+                        "seconds": round(self.trace.offset() - started, 6),
+                        "input": inputs,
+                    }
+                )
+
+        on_chain_error = on_chain_end
+
+    return _NodeRecorder
+
+
+class _TraceRun(abc.ABC):
+    """Events of one recorded or replayed call of an entry point."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.events: List[Dict[str, Any]] = []
+
+    def offset(self) -> float:
+        return round(time.perf_counter() - self.started, 6)
+
+    def add(self, event: Dict[str, Any]) -> None:
+        self.events.append(event)
+
+    @abc.abstractmethod
+    def model(self, kind: str, create: Callable[[], Any]) -> Any:
+        """Return the model of a kind to use during this run, created by create if needed."""
+
+    def node_seconds(self) -> Dict[str, float]:
+        seconds: Dict[str, float] = defaultdict(float)
+        for event in self.events:
+            if event["type"] == "node":
+                seconds[event["node"]] += event["seconds"]
+        return dict(seconds)
+
+    @contextmanager
+    def active(self) -> Iterator[None]:
+        """Make this the trace of the current context and of the graph runs started in it."""
+        global _hook_registered
+        if not _hook_registered:
+            from langchain_core.tracers.context import register_configure_hook
+
+            register_configure_hook(_active_node_recorder, inheritable=True)
+            _hook_registered = True
+        trace_token = _active_trace.set(self)
+        nodes_token = _active_node_recorder.set(_node_recorder_class()(self))
+        try:
+            yield
+        finally:
+            _active_node_recorder.reset(nodes_token)
+            _active_trace.reset(trace_token)
+
+
+class TraceRecorder(_TraceRun):
+    """Record the calls of one entry point, then write them to a trace file."""
+
+    def __init__(self, entry: str, arguments: Dict[str, Any]):
+        import workflow_manager as wm
+
+        super().__init__()
+        self.entry = entry
+        router = wm.get_router()
+        self.add(
+            {
+                "type": "header",
+                "version": TRACE_VERSION,
+                "entry": entry,
+                "created": time.time(),
+                "arguments": {
+                    name: encode_value(value) if _recordable(value) else None
+                    for name, value in arguments.items()
+                },
+                "settings": {name: getattr(wm, name) for name in TRACE_SETTINGS},
+                "router": {"policy": router.policy.as_dict(), "stats": router.stats.to_dict()},
+            }
+        )
+
+    def model(self, kind: str, create: Callable[[], Any]) -> Any:
+        if kind.startswith("embeddings:"):
+            return _RecordingEmbeddings(create(), kind, self)
+        return _RecordingChatModel(create(), kind, self)
+
+    def record_call(
+        self,
+        kind: str,
+        method: str,
+        request: Dict[str, Any],
+        response: Dict[str, Any],
+        started: float,
+        seconds: float,
+    ) -> None:
+        self.add(
+            {
+                "type": "call",
+                "kind": kind,
+                "method": method,
+                "key": request_key(kind, method, request),
+                "node": _current_node(),
+                "started": started,
+                "seconds": round(seconds, 6),
+                "request": request,
+                "response": response,
+            }
+        )
+
+    def finish(self, result: Any = None, error: Optional[BaseException] = None) -> None:
+        self.add(
+            {
+                "type": "result",
+                "seconds": self.offset(),
+                "result": encode_value(result),
+                "error": None if error is None else repr(error),
+            }
+        )
+
+    def save(self, directory: str) -> str:
+        """Write the trace as gzip-compressed JSON lines and return its path."""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{time.time_ns()}-{os.getpid()}-{self.entry}.jsonl.gz")
+        with gzip.open(path, "wt", encoding="utf-8") as file:
+            for event in self.events:
+                file.write(json.dumps(event, separators=(",", ":"), default=str))
+                file.write("\n")
+        return path
+
+
+class _RecordingChatModel:
+    """Chat model proxy adding every request and response to a trace."""
+
+    def __init__(self, model: Any, kind: str, trace: TraceRecorder):
+        self._model = model
+        self._kind = kind
+        self._trace = trace
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._model, name)
+
+    async def ainvoke(self, messages: Any, *args: Any, **kwargs: Any) -> Any:
+        started, clock = self._trace.offset(), time.perf_counter()
+        response = await self._model.ainvoke(messages, *args, **kwargs)
+        self._trace.record_call(
+            self._kind,
+            "ainvoke",
+            {"messages": _message_dicts(messages)},
+            {"content": response.content, "usage": getattr(response, "usage_metadata", None)},
+            started,
+            time.perf_counter() - clock,
+        )
+        return response
+
+    async def astream(self, messages: Any, *args: Any, **kwargs: Any) -> AsyncIterator[Any]:
+        """Stream the answer, recording each chunk when it arrives and an early close."""
+        started, clock = self._trace.offset(), time.perf_counter()
+        chunks: List[List[Any]] = []
+        usage = None
+        stream = self._model.astream(messages, *args, **kwargs)
+        try:
+            async for chunk in stream:
+                content = chunk.content if isinstance(chunk.content, str) else ""
+                chunks.append([round(time.perf_counter() - clock, 6), content])
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                yield chunk
+        finally:
+            await stream.aclose()
+            self._trace.record_call(
+                self._kind,
+                "astream",
+                {"messages": _message_dicts(messages)},
+                {"chunks": chunks, "usage": usage},
+                started,
+                time.perf_counter() - clock,
+            )
+
+
+class _RecordingEmbeddings:
+    """Embeddings model proxy adding every request and response to a trace."""
+
+    def __init__(self, model: Any, kind: str, trace: TraceRecorder):
+        self._model = model
+        self._kind = kind
+        self._trace = trace
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._model, name)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        started, clock = self._trace.offset(), time.perf_counter()
+        vectors = await self._model.aembed_documents(texts)
+        self._trace.record_call(
+            self._kind,
+            "aembed_documents",
+            {"texts": list(texts)},
+            {"vectors": _encode_floats(vectors)},
+            started,
+            time.perf_counter() - clock,
+        )
+        return vectors
+
+    async def aembed_query(self, text: str) -> List[float]:
+        started, clock = self._trace.offset(), time.perf_counter()
+        vector = await self._model.aembed_query(text)
+        self._trace.record_call(
+            self._kind,
+            "aembed_query",
+            {"text": text},
+            {"vectors": _encode_floats([vector])},
+            started,
+            time.perf_counter() - clock,
+        )
+        return vector
+
+
+class TraceReplayer(_TraceRun):
+    """
+    Answer model calls from the recorded responses of a trace.
+
+    A request is matched to the recorded call with the same model, method and
+    payload. A request the trace does not contain, e.g. because a prompt changed,
+    takes the next unused response of the same model and method and is counted in
+    out_of_order. A request with no response left raises TraceMismatchError; it is
+    also kept in missing, since the workflow may catch the error and carry on.
+    """
+
+    def __init__(self, events: List[Dict[str, Any]], latency: str = "original"):
+        if latency not in ("original", "zero"):
+            raise ValueError(f"Unknown replay latency: {latency}")
+        super().__init__()
+        self.latency = latency
+        self.out_of_order = 0
+        self.missing: List[str] = []
+        self._calls = [event for event in events if event["type"] == "call"]
+        self._used = [False] * len(self._calls)
+        self._by_key: Dict[str, Deque[int]] = defaultdict(deque)
+        for position, call in enumerate(self._calls):
+            self._by_key[call["key"]].append(position)
+
+    @property
+    def unused(self) -> int:
+        return self._used.count(False)
+
+    def model(self, kind: str, create: Callable[[], Any]) -> Any:
+        if kind.startswith("embeddings:"):
+            return _ReplayEmbeddings(self, kind)
+        return _replay_chat_model_class()(replayer=self, kind=kind)
+
+    def take(self, kind: str, method: str, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Return the recorded call answering a request."""
+        queue = self._by_key.get(request_key(kind, method, request), deque())
+        while queue and self._used[queue[0]]:
+            queue.popleft()
+        if queue:
+            position = queue.popleft()
+        else:
+            position = next(
+                (
+                    i
+                    for i, call in enumerate(self._calls)
+                    if not self._used[i] and call["kind"] == kind and call["method"] == method
+                ),
+                None,
+            )
+            if position is None:
+                self.missing.append(f"The trace has no {method} response left for {kind}")
+                raise TraceMismatchError(self.missing[-1])
+            self.out_of_order += 1
+            logger.warning(
+                f"Request to {kind} is not in the trace; replaying the next {method} response"
+            )
+        self._used[position] = True
+        return self._calls[position]
+
+    async def wait(self, seconds: float) -> None:
+        """Sleep for a recorded duration, unless replaying without latency."""
+        if self.latency == "original" and seconds > 0:
+            await asyncio.sleep(seconds)
+
+    def wait_blocking(self, seconds: float) -> None:
+        """Counterpart of wait for synchronous model calls."""
+        if self.latency == "original" and seconds > 0:
+            time.sleep(seconds)
+
+
+@functools.lru_cache(maxsize=1)
+def _replay_chat_model_class():
+    """Define the replay chat model, importing LangChain on first use."""
+    from langchain_core.language_models.chat_models import BaseChatModel
+    from langchain_core.messages import AIMessage, AIMessageChunk
+    from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+    class _ReplayChatModel(BaseChatModel):
+        """
+        Chat model answering from a trace.
+
+        It is a real LangChain chat model, so callbacks and message handling cost
+        the same as with the live model. Synchronous calls are answered from the
+        recorded ainvoke responses as well.
+        """
+
+        replayer: Any
+        kind: str
+
+        @property
+        def _llm_type(self) -> str:
+            return "trace-replay"
+
+        def _recorded(self, messages) -> Dict[str, Any]:
+            return self.replayer.take(self.kind, "ainvoke", {"messages": _message_dicts(messages)})
+
+        @staticmethod
+        def _result(call: Dict[str, Any]) -> ChatResult:
+            response = call["response"]
+            message = AIMessage(content=response["content"], usage_metadata=response.get("usage"))
+            return ChatResult(generations=[ChatGeneration(message=message)])
+
+        def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+            call = self._recorded(messages)
+            self.replayer.wait_blocking(call["seconds"])
+            return self._result(call)
+
+        async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+            call = self._recorded(messages)
+            await self.replayer.wait(call["seconds"])
+            return self._result(call)
+
+        async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+            call = self.replayer.take(self.kind, "astream", {"messages": _message_dicts(messages)})
+            response = call["response"]
+            chunks = response["chunks"] or [[0.0, ""]]
+            elapsed = 0.0
+            for position, (offset, content) in enumerate(chunks):
+                await self.replayer.wait(offset - elapsed)
+                elapsed = offset
+                usage = response.get("usage") if position == len(chunks) - 1 else None
+                yield ChatGenerationChunk(
+                    message=AIMessageChunk(content=content, usage_metadata=usage)
+                )
+
+    return _ReplayChatModel
+
+
+class _ReplayEmbeddings:
+    """Embeddings model answering from a trace."""
+
+    def __init__(self, replayer: TraceReplayer, kind: str):
+        self.replayer = replayer
+        self.kind = kind
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        call = self.replayer.take(self.kind, "aembed_documents", {"texts": list(texts)})
+        await self.replayer.wait(call["seconds"])
+        return _decode_floats(call["response"]["vectors"])
+
+    async def aembed_query(self, text: str) -> List[float]:
+        call = self.replayer.take(self.kind, "aembed_query", {"text": text})
+        await self.replayer.wait(call["seconds"])
+        return _decode_floats(call["response"]["vectors"])[0]
+
+
+# Hooks used by workflow_manager and embedding_sources
+
+
+def traced_model(kind: str, create: Callable[[], Any]) -> Any:
+    """
+    Return the model built by create, or its stand-in when a trace is active.
+
+    While recording, the model's requests and responses are added to the trace.
+    While replaying, the model is never built and the trace answers instead.
+    """
+    trace = _active_trace.get()
+    return create() if trace is None else trace.model(kind, create)
+
+
+def traced(function: Callable[..., Any]) -> Callable[..., Any]:
+    """Record a trace of every call of an async entry point while TRACE_DIR is set."""
+    signature = inspect.signature(function)
+
+    @functools.wraps(function)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        if not TRACE_DIR or _active_trace.get() is not None:
+            return await function(*args, **kwargs)
+
+        recorder = TraceRecorder(function.__name__, dict(signature.bind(*args, **kwargs).arguments))
+        result, error = None, None
+        try:
+            with recorder.active():
+                result = await function(*args, **kwargs)
+            return result
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            recorder.finish(result, error)
+            try:
+                path = await asyncio.to_thread(recorder.save, TRACE_DIR)
+                logger.info(f"Wrote workflow trace {path} ({recorder.offset():.3f}s)")
+            except OSError as e:
+                logger.error(f"Could not write workflow trace: {e}")
+
+    return wrapper
+
+
+# Replay
+
+
+def load_trace(path: str) -> List[Dict[str, Any]]:
+    """Read the events of a trace file."""
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        events = [json.loads(line) for line in file if line.strip()]
+    if not events or events[0].get("type") != "header" or events[0].get("version") != TRACE_VERSION:
+        raise ValueError(f"Not a workflow trace: {path}")
+    return events
+
+
+async def replay_trace(events: List[Dict[str, Any]], latency: str = "original") -> Dict[str, Any]:
+    """
+    Re-run the entry point of a trace against its recorded model responses.
+
+    The recorded settings and router statistics are restored first, and the session
+    indexes are cleared so every replay starts alike. Checkpoints go to the
+    configured checkpointer, so replays belong in a process of their own (the CLI
+    uses in-memory checkpoints). Ensemble vectors that were already cached when
+    the trace was recorded were never requested, so the trace has no response for
+    them.
+
+    Returns the wall time, per-node time, whether the result matches the recorded
+    one and how many recorded calls were matched out of order or never made. Raises
+    TraceMismatchError when the run made a model call the trace could not answer.
+    """
+    import workflow_manager as wm
+    from recommender_router import RecommenderRouter, RecommenderStats, RoutingPolicy
+
+    header = events[0]
+    for name, value in header["settings"].items():
+        setattr(wm, name, value)
+    wm._router = RecommenderRouter(
+        RoutingPolicy(**header["router"]["policy"]),
+        RecommenderStats.from_dict(header["router"]["stats"]),
+    )
+    wm._candidate_indexes.clear()
+    wm._wordplay_indexes.clear()
+    wm._constraint_engines.clear()
+
+    function = getattr(wm, header["entry"])
+    arguments = {name: decode_value(value) for name, value in header["arguments"].items()}
+    replayer = TraceReplayer(events, latency)
+    with replayer.active():
+        result = await function(**arguments)
+    seconds = replayer.offset()
+    if replayer.missing:
+        raise TraceMismatchError(f"Replay diverged from the trace: {replayer.missing[0]}")
+
+    recorded = next((event for event in events if event["type"] == "result"), {})
+    recorder_nodes: Dict[str, float] = defaultdict(float)
+    for event in events:
+        if event["type"] == "node":
+            recorder_nodes[event["node"]] += event["seconds"]
+    return {
+        "entry": header["entry"],
+        "seconds": seconds,
+        "recorded_seconds": recorded.get("seconds"),
+        "matches": encode_value(result) == recorded.get("result"),
+        "nodes": replayer.node_seconds(),
+        "recorded_nodes": dict(recorder_nodes),
+        "out_of_order": replayer.out_of_order,
+        "unused_calls": replayer.unused,
+        "result": encode_value(result, embeddings=False),
+    }
+
+
+def format_trace(events: List[Dict[str, Any]]) -> str:
+    """Describe the timeline of a trace as text."""
+    header = events[0]
+    created = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(header["created"]))
+    lines = [f"{header['entry']} recorded {created}"]
+    timeline = sorted(events[1:], key=lambda event: event.get("started", event.get("seconds", 0.0)))
+    for event in timeline:
+        if event["type"] == "node":
+            lines.append(
+                f"  {event['started']:>9.3f}s  node  {event['node']:<30} {event['seconds']:>8.3f}s"
+            )
+        elif event["type"] == "call":
+            lines.append(
+                f"  {event['started']:>9.3f}s  call  {event['kind'] + ' ' + event['method']:<30} "
+                f"{event['seconds']:>8.3f}s  in {event['node'] or 'outside_graph'}"
+            )
+        elif event["type"] == "result":
+            status = "failed: " + event["error"] if event["error"] else "done"
+            lines.append(f"  {event['seconds']:>9.3f}s  {status}")
+    return "\n".join(lines)
+
+
+def format_replay(report: Dict[str, Any]) -> str:
+    """Compare the node times of a replay with the recorded ones."""
+    lines = [
+        f"{report['entry']}: {report['seconds']:.3f}s replayed, "
+        f"{report['recorded_seconds']:.3f}s recorded, "
+        f"result {'matches' if report['matches'] else 'differs'}, "
+        f"{report['out_of_order']} calls out of order, {report['unused_calls']} unused"
+    ]
+    for node in sorted(set(report["nodes"]) | set(report["recorded_nodes"])):
+        lines.append(
+            f"  {node:<30} {report['nodes'].get(node, 0.0):>8.3f}s  "
+            f"(recorded {report['recorded_nodes'].get(node, 0.0):.3f}s)"
+        )
+    return "\n".join(lines)
+
+
+async def _replay_command(args: argparse.Namespace) -> None:
+    import workflow_manager as wm
+
+    wm.CHECKPOINT_DB = "memory"
+    events = load_trace(args.trace)
+    for _ in range(args.repeat):
+        print(format_replay(await replay_trace(events, args.latency)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Inspect or replay a workflow trace")
+    commands = parser.add_subparsers(dest="command", required=True)
+    show = commands.add_parser("show", help="print the timeline of a trace")
+    show.add_argument("trace")
+    replay = commands.add_parser("replay", help="re-run a trace against its recorded responses")
+    replay.add_argument("trace")
+    replay.add_argument(
+        "--latency",
+        choices=["original", "zero"],
+        default="original",
+        help="wait as long as the recorded model calls, or not at all",
+    )
+    replay.add_argument("--repeat", type=int, default=1, help="number of replays")
+    replay.add_argument(
+        "--profile", action="store_true", help="print a cProfile summary of the replays"
+    )
+    args = parser.parse_args()
+
+    if args.command == "show":
+        print(format_trace(load_trace(args.trace)))
+        return
+
+    if not args.profile:
+        asyncio.run(_replay_command(args))
+        return
+
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    profiler.runcall(asyncio.run, _replay_command(args))
+    pstats.Stats(profiler).sort_stats("cumulative").print_stats(30)
+
+
+if __name__ == "__main__":
+    # Run the module as imported by workflow_manager, so both see the same active trace
+    import workflow_trace
+
+    workflow_trace.main()